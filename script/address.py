@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Canonical in-memory form of a Starknet address: the felt as 32 big-endian bytes.
+# Fixed-width bytes compare, sort and hash as plain memory, so padded
+# (0x00992a...) and unpadded (0x992a...) spellings of one account are equal.
+ADDRESS_DTYPE = np.dtype("S32")
+
+_HEX_BODY = r"0[xX][0-9a-fA-F]{1,64}"
+
+
+def valid_addresses(values) -> np.ndarray:
+    """Boolean mask of values that are well-formed felt hex strings"""
+    series = pd.Series(values, dtype="string").str.strip()
+    return series.str.fullmatch(_HEX_BODY).fillna(False).to_numpy(dtype=bool)
+
+
+def parse_addresses(values) -> np.ndarray:
+    """
+    Parse hex address strings into a fixed-width S32 array in one vectorized pass.
+
+    Raises ValueError listing the first malformed rows.
+    """
+    series = pd.Series(values, dtype="string").str.strip()
+    valid = series.str.fullmatch(_HEX_BODY).fillna(False).to_numpy(dtype=bool)
+    if not valid.all():
+        bad = np.flatnonzero(~valid)
+        examples = ", ".join(f"row {i}: {series.iloc[i]!r}" for i in bad[:5])
+        raise ValueError(f"{len(bad)} invalid addresses ({examples})")
+    if len(series) == 0:
+        return np.empty(0, dtype=ADDRESS_DTYPE)
+
+    padded = series.str[2:].str.zfill(64)
+    raw = bytes.fromhex("".join(padded.tolist()))
+    return np.frombuffer(raw, dtype=ADDRESS_DTYPE).copy()
+
+
+def format_addresses(addresses: np.ndarray) -> np.ndarray:
+    """Canonical 0x + 64 hex digits strings for an S32 address array"""
+    if len(addresses) == 0:
+        return np.empty(0, dtype=object)
+    hex_digits = np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE).tobytes().hex().encode()
+    return np.char.add("0x", np.frombuffer(hex_digits, dtype="S64").astype(str)).astype(object)
+
+
+def canonical_addresses(values) -> np.ndarray:
+    """Normalize address strings to their canonical 66-character spelling"""
+    return format_addresses(parse_addresses(values))
+
+
+def unique_addresses(addresses: np.ndarray) -> np.ndarray:
+    """Sorted distinct addresses"""
+    return np.unique(addresses)
+
+
+def address_codes(addresses: np.ndarray):
+    """
+    Factorize addresses into dense integer codes, for group-bys and joins.
+    Returns (sorted distinct addresses, code of each input row).
+    """
+    uniques, codes = np.unique(addresses, return_inverse=True)
+    return uniques, codes.reshape(-1)
+
+
+def factorize_addresses(addresses: np.ndarray):
+    """
+    Hash-based address_codes: (distinct addresses in first-seen order, code of each row).
+
+    Each address is folded into a 64-bit key and factorized in O(n). The result is
+    checked against the full 32 bytes and falls back to the sort-based path on the
+    (practically impossible) event of a key collision, so it is always exact.
+    """
+    addresses = np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE)
+    words = addresses.view(">u8").reshape(-1, 4).astype(np.uint64)
+    keys = words[:, 0] ^ (words[:, 1] * np.uint64(0x9E3779B97F4A7C15))
+    keys ^= words[:, 2] * np.uint64(0xC2B2AE3D27D4EB4F)
+    keys ^= words[:, 3] * np.uint64(0x165667B19E3779F9)
+    codes, _ = pd.factorize(keys)
+    first = np.zeros(codes.max() + 1 if len(codes) else 0, dtype=np.int64)
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    uniques = addresses[first]
+    if not np.array_equal(uniques[codes], addresses):
+        return address_codes(addresses)
+    return uniques, codes
+
+
+def isin_addresses(addresses: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Boolean mask of `addresses` present in `other`"""
+    return np.isin(addresses, other)
@@ -0,0 +1,123 @@
+"""
+Exact token allocation: largest-remainder (Hamilton) apportionment of a budget
+with per-address bounds. Every step is a vectorized numpy pass and the leftover
+units are picked with a partial partition (introselect, O(n)) instead of a full sort. Ties are broken
+by row order, so the same input always gives the same output.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def weights_from_points(
+    points,
+    weighting: str = "linear",
+    tiers: Optional[Sequence[Tuple[float, float]]] = None,
+) -> np.ndarray:
+    """
+    Allocation weights from points (negative points count as 0).
+
+    weighting: "linear" (points), "sqrt" or "log" (log1p(points)) to flatten whales.
+    tiers: [(min_points, weight), ...]; each address gets the weight of the
+    highest tier it reaches, 0 below the first one. Overrides `weighting`.
+    """
+    points = np.asarray(points)
+    if np.issubdtype(points.dtype, np.integer) and not tiers and weighting == "linear":
+        # Integer points keep the exact integer apportionment path
+        return np.clip(points, 0, None).astype(np.int64)
+    points = np.clip(points.astype(np.float64), 0, None)
+    if tiers:
+        thresholds, tier_weights = map(np.asarray, zip(*sorted(tiers)))
+        tier = np.searchsorted(thresholds, points, side="right") - 1
+        return np.where(tier >= 0, tier_weights[np.maximum(tier, 0)], 0.0)
+    if weighting == "linear":
+        return points
+    if weighting == "sqrt":
+        return np.sqrt(points)
+    if weighting == "log":
+        return np.log1p(points)
+    raise ValueError(f"Unknown weighting {weighting!r} (expected linear, sqrt or log)")
+
+
+def _top_indices(keys: np.ndarray, count: int) -> np.ndarray:
+    """Indices of the `count` largest keys, ties resolved by lowest index, in O(n)"""
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    if count >= len(keys):
+        return np.arange(len(keys))
+    threshold = np.partition(keys, len(keys) - count)[len(keys) - count]
+    above = np.flatnonzero(keys > threshold)
+    ties = np.flatnonzero(keys == threshold)[:count - len(above)]
+    return np.concatenate([above, ties])
+
+
+def _quotas(weights: np.ndarray, budget: int):
+    """(floor, remainder key) of each weight's share of `budget`, exact for integer weights"""
+    total_weight = weights.sum()
+    if np.issubdtype(weights.dtype, np.integer) and weights.max(initial=0) <= (2 ** 62) // max(budget, 1):
+        scaled = weights * budget
+        return scaled // total_weight, scaled % total_weight
+    quotas = weights / total_weight * budget
+    floors = np.floor(quotas)
+    return floors.astype(np.int64), quotas - floors
+
+
+def allocate(
+    weights,
+    total_tokens: int,
+    min_tokens: int = 0,
+    max_tokens: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Split exactly `total_tokens` between addresses in proportion to `weights`,
+    each address getting between `min_tokens` and `max_tokens`.
+
+    Everyone first gets `min_tokens`; the rest is apportioned by weight with
+    Hamilton's method. Shares above `max_tokens` are capped and the excess is
+    re-apportioned between the uncapped addresses (water filling). With all
+    weights at 0 the rest is split evenly.
+
+    Raises ValueError when the budget cannot be met within the bounds.
+    """
+    weights = np.asarray(weights)
+    if not np.issubdtype(weights.dtype, np.integer):
+        weights = weights.astype(np.float64)
+    if (weights < 0).any() or not np.isfinite(weights).all():
+        raise ValueError("Weights must be finite and non-negative")
+
+    count = len(weights)
+    budget = total_tokens - count * min_tokens
+    if budget < 0:
+        raise ValueError(f"{total_tokens} tokens cannot give {min_tokens} to each of {count} addresses")
+    capacity = None if max_tokens is None else max_tokens - min_tokens
+    if capacity is not None and budget > capacity * count:
+        raise ValueError(f"{total_tokens} tokens exceed {max_tokens} for each of {count} addresses")
+
+    if count == 0 or budget == 0:
+        return np.full(count, min_tokens, dtype=np.int64)
+
+    # Water filling: cap the addresses whose share exceeds the capacity, re-apportion the rest
+    capped = np.zeros(count, dtype=bool)
+    while not capped.all():
+        free_budget = budget - (capacity * int(capped.sum()) if capacity is not None else 0)
+        free_weights = np.where(capped, 0, weights)
+        if free_weights.sum() == 0:
+            free_weights = (~capped).astype(np.int64)
+        floors, remainders = _quotas(free_weights, free_budget)
+        if capacity is None:
+            break
+        over = ~capped & (floors + (remainders > 0) > capacity)
+        if not over.any():
+            break
+        capped |= over
+
+    if capped.all():
+        return np.full(count, max_tokens, dtype=np.int64)
+    extra = np.where(capped, capacity if capacity is not None else 0, floors).astype(np.int64)
+
+    # Hamilton: the largest remainders get one more unit each, never past the cap
+    full = capped if capacity is None else capped | (extra >= capacity)
+    keys = np.where(full, -1, remainders)
+    extra[_top_indices(keys, int(budget - extra.sum()))] += 1
+    return extra + min_tokens
@@ -0,0 +1,137 @@
+import argparse
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from registry import load_registry
+
+BASE_UNITS_TYPE = pa.decimal128(38, 0)
+MAX_DIGITS = 38
+SLICE_ROWS = 1 << 20
+
+
+def balance_pattern(decimals: int, unit: Optional[str] = None) -> str:
+    """
+    RE2 pattern of a well-formed balance: optional thousands separators, at most
+    `decimals` significant fraction digits (trailing zeros are free) and an
+    optional unit suffix (only `unit` when given).
+    """
+    whole = r"(?:\d{1,3}(?:,\d{3})+|\d+)"
+    fraction = rf"(?:\.\d{{1,{decimals}}}0*)?" if decimals else r"(?:\.0+)?"
+    suffix = rf"(?:\s+{re.escape(unit)})?" if unit is not None else r"(?:\s+[A-Za-z0-9_-]+)?"
+    return rf"^\s*{whole}{fraction}{suffix}\s*$"
+
+
+def _parse_text(text: pa.StringArray, decimals: int, pattern: str) -> Tuple[pa.Array, np.ndarray]:
+    valid = pc.fill_null(pc.match_substring_regex(text, pattern), False)
+    number = pc.list_element(pc.split_pattern(pc.utf8_trim_whitespace(text), " ", max_splits=1), 0)
+    number = pc.replace_substring(number, ",", "")
+    # Drop the free trailing fraction zeros so the cast never sees more than 38 digits
+    dot = pc.find_substring(number, ".")
+    number = pc.if_else(pc.greater_equal(dot, 0), pc.utf8_rtrim(pc.utf8_rtrim(number, "0"), "."), number)
+
+    # Whole digits beyond 38 - decimals would overflow decimal128(38, decimals)
+    length = pc.utf8_length(number)
+    leading_zeros = pc.subtract(length, pc.utf8_length(pc.utf8_ltrim(number, "0")))
+    whole_digits = pc.subtract(pc.if_else(pc.greater_equal(dot, 0), dot, length), leading_zeros)
+    valid = pc.and_(valid, pc.fill_null(pc.less_equal(whole_digits, MAX_DIGITS - decimals), False))
+
+    scaled = pc.cast(pc.if_else(valid, number, "0"), pa.decimal128(MAX_DIGITS, decimals))
+    valid_mask = valid.to_numpy(zero_copy_only=False)
+    amounts = pa.Array.from_buffers(
+        BASE_UNITS_TYPE, len(scaled), [pa.array(valid_mask).buffers()[1], scaled.buffers()[1]]
+    )
+    return amounts, valid_mask
+
+
+def parse_balances(
+    values,
+    decimals: int,
+    unit: Optional[str] = None,
+) -> Tuple[pa.Array, np.ndarray]:
+    """
+    Parse formatted balances such as "4,654,563.401296305707602528 LORDS",
+    "5,000 STRK" or "281" into exact integer base units (amount * 10**decimals).
+
+    Every step is an Arrow compute kernel over a whole column slice (regex
+    validation, separator removal, string to decimal cast), so there is no float
+    and no per-row Python code. The number is cast to decimal128(38, decimals),
+    whose integer representation already is the base-unit amount, and that
+    buffer is reinterpreted as decimal128(38, 0). Kernels release the GIL, so
+    large inputs are split into slices parsed on every core.
+
+    A row is invalid when it does not match `balance_pattern`, needs more than
+    38 digits in base units, or is null.
+
+    Returns (decimal128(38, 0) array, null on invalid rows; boolean mask of valid rows).
+    """
+    try:
+        text = pa.array(values, from_pandas=True)
+    except (OverflowError, pa.ArrowException):
+        # Python ints beyond 64 bits
+        text = pa.array(pd.Series(values, dtype=object).astype(str))
+    if not pa.types.is_string(text.type):
+        text = pc.cast(text, pa.string())
+    pattern = balance_pattern(decimals, unit)
+
+    slices = [text.slice(start, SLICE_ROWS) for start in range(0, max(len(text), 1), SLICE_ROWS)]
+    if len(slices) == 1:
+        return _parse_text(text, decimals, pattern)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(lambda part: _parse_text(part, decimals, pattern), slices))
+    return (
+        pa.concat_arrays([amounts for amounts, _ in results]),
+        np.concatenate([valid for _, valid in results]),
+    )
+
+
+def to_ints(amounts: pa.Array) -> np.ndarray:
+    """Object array of Python ints (None for invalid rows), exact at any size"""
+    return np.array([None if a is None else int(a) for a in amounts.to_pylist()], dtype=object)
+
+
+def parse_balance_column(df: pd.DataFrame, decimals: int, unit: Optional[str] = None, column: str = 'quantity') -> pd.DataFrame:
+    """
+    Replace `column` by exact integer base units. Raises ValueError listing the
+    first malformed rows.
+    """
+    amounts, valid = parse_balances(df[column], decimals, unit)
+    if not valid.all():
+        bad = np.flatnonzero(~valid)
+        examples = ", ".join(f"row {i}: {df[column].iloc[i]!r}" for i in bad[:5])
+        raise ValueError(f"{len(bad)} invalid balances ({examples})")
+    return df.assign(**{column: to_ints(amounts)})
+
+
+def collection_decimals(collection: str, registry=None) -> Tuple[int, Optional[str]]:
+    """(decimals, symbol) of a registry collection; NFTs count whole tokens"""
+    info = (registry or load_registry()).get(collection)
+    if info is None or info["type"] != "token":
+        return 0, None
+    return int(info["decimals"]), info.get("symbol")
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a scraped token balance file into base units")
+    parser.add_argument("csv_file")
+    parser.add_argument("--decimals", type=int, default=None, help="Default: from the collection registry")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv_file, dtype=str)
+    collection = df['collection'].iloc[0]
+    decimals, symbol = collection_decimals(collection)
+    if args.decimals is not None:
+        decimals = args.decimals
+
+    amounts, valid = parse_balances(df['quantity'], decimals, symbol)
+    print(f"{collection}: {int(valid.sum())}/{len(df)} valid balances ({decimals} decimals)")
+    for i in np.flatnonzero(~valid)[:10]:
+        print(f"Invalid row {i}: {df['quantity'].iloc[i]!r}")
+    print(f"Total base units: {pc.sum(amounts).as_py()}")
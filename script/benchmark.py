@@ -0,0 +1,325 @@
+"""
+Benchmarks with a measured baseline for the fetchers and the CSV tools.
+
+- Fetchers run against the local mock JSON-RPC node (ownerOf/totalSupply and
+  Transfer events with configurable latency), so throughput is measured offline.
+- CSV tools run on synthetic holder snapshots (address,quantity,collection,
+  expiration_timestamp) of 10k, 1M or 10M rows, timing every stage of the
+  airdrop workflow: filter, timestamp update, merge, transform, overlap
+  analysis and drop stats.
+
+Results are written as JSON, and --compare prints the speedup of every
+benchmark against a previous results file:
+
+    python benchmark.py --sizes 10k,1m --output before.json
+    python benchmark.py --sizes 10k,1m --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from starknet_py.contract import Contract
+from starknet_py.net.full_node_client import FullNodeClient
+
+import filter_0
+import merge_tokens_nfts
+import number_of_drops
+import sepolia
+import update_expiration_timestamp
+from address import ADDRESS_DTYPE, format_addresses
+from check_unique_addresses import count_unique_addresses
+from clients import AbiCache, client_session, load_contract, make_client
+from mock_node import MockStarknetNode
+from rpc_engine import RequestEngine
+from starknet_rpc import StarknetRpc, u256_calldata
+from transfer_events import fetch_transfers
+
+CONTRACT_ADDRESS = "0x07ae27a31bb6526e3de9cf02f081f6ce0615ac12a6d7b85ee58b8ad7947a2809"
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+GENERATE_CHUNK_ROWS = 1_000_000
+
+
+async def _owner_scan(url: str, supply: int, batch_size: int) -> dict:
+    async with StarknetRpc(url, engine=RequestEngine(), batch_size=batch_size) as rpc:
+        calldata = [u256_calldata(token_id) for token_id in range(supply)]
+        # batch_size 1 means one HTTP request per call, the pre-batching behaviour
+        rpc.batch_supported = batch_size > 1
+        start = time.perf_counter()
+        results = await rpc.call_many(CONTRACT_ADDRESS, "ownerOf", calldata)
+        elapsed = time.perf_counter() - start
+        errors = sum(isinstance(result, Exception) for result in results)
+        return {
+            "batch_size": batch_size,
+            "seconds": round(elapsed, 3),
+            "tokens_per_second": round(supply / elapsed, 1),
+            "http_requests": rpc.http_requests,
+            "errors": errors,
+            "final_window": rpc.engine.window.size,
+        }
+
+
+async def bench_owner_scan(supply: int = 5000, latency: float = 0.05, batch_sizes=(1, 50, 200)) -> dict:
+    """
+    Times a full ownerOf scan against the local mock node, once per call and
+    once per JSON-RPC batch size.
+    """
+    node = MockStarknetNode(
+        supply=supply,
+        holders=max(1, supply // 10),
+        latency=latency,
+        latency_per_call=0.00005,
+        max_concurrency=64,
+    )
+    url = await node.start()
+    try:
+        runs = [await _owner_scan(url, supply, batch_size) for batch_size in batch_sizes]
+    finally:
+        await node.stop()
+    return {"benchmark": "owner_scan", "supply": supply, "latency": latency, "runs": runs}
+
+
+async def bench_client_setup(latency: float = 0.05) -> dict:
+    """
+    Times contract setup and the first call with a fresh client per call versus
+    the shared session + on-disk ABI cache, against the local mock node.
+    """
+    node = MockStarknetNode(latency=latency)
+    url = await node.start()
+    runs = {}
+    try:
+        # Before: new FullNodeClient (own session per request) and Contract.from_address every run
+        start = time.perf_counter()
+        client = FullNodeClient(node_url=url)
+        contract = await Contract.from_address(address=CONTRACT_ADDRESS, provider=client)
+        setup = time.perf_counter() - start
+        await contract.functions["ownerOf"].call(1)
+        runs["uncached"] = {"setup_seconds": round(setup, 4), "first_call_seconds": round(time.perf_counter() - start - setup, 4)}
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = AbiCache(Path(cache_dir))
+            async with client_session() as session:
+                await load_contract(make_client(url, session), CONTRACT_ADDRESS, cache)
+
+            # After: shared keep-alive session and ABI served from the cache
+            async with client_session() as session:
+                start = time.perf_counter()
+                contract = await load_contract(make_client(url, session), CONTRACT_ADDRESS, AbiCache(Path(cache_dir)))
+                setup = time.perf_counter() - start
+                await contract.functions["ownerOf"].call(1)
+                runs["cached"] = {"setup_seconds": round(setup, 4), "first_call_seconds": round(time.perf_counter() - start - setup, 4)}
+    finally:
+        await node.stop()
+    return {"benchmark": "client_setup", "latency": latency, "runs": runs}
+
+
+async def bench_event_scan(supply: int = 5000, latency: float = 0.05, parallel_ranges=(1, 4, 16)) -> dict:
+    """
+    Times rebuilding ownership from Transfer events against the local mock node,
+    with the block range split into 1, 4 and 16 parallel page streams.
+    """
+    node = MockStarknetNode(supply=supply, holders=max(1, supply // 10), latency=latency, max_concurrency=64)
+    url = await node.start()
+    runs = []
+    try:
+        for ranges in parallel_ranges:
+            async with StarknetRpc(url, engine=RequestEngine()) as rpc:
+                start = time.perf_counter()
+                transfers = await fetch_transfers(rpc, CONTRACT_ADDRESS, parallel_ranges=ranges)
+                elapsed = time.perf_counter() - start
+                runs.append({
+                    "parallel_ranges": ranges,
+                    "seconds": round(elapsed, 3),
+                    "events": len(transfers),
+                    "events_per_second": round(len(transfers) / elapsed, 1),
+                    "http_requests": rpc.http_requests,
+                })
+    finally:
+        await node.stop()
+    return {"benchmark": "event_scan", "supply": supply, "latency": latency, "runs": runs}
+
+
+# Synthetic snapshots
+
+def synthetic_addresses(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Random S32 addresses below 2**251, like real contract addresses"""
+    raw = rng.integers(0, 256, size=(count, 32), dtype=np.uint8)
+    raw[:, 0] &= 0x07
+    return raw.view(ADDRESS_DTYPE).reshape(-1)
+
+
+def generate_snapshot(path: Path, holders: np.ndarray, rows: int, collection: str, rng: np.random.Generator,
+                      column: str = "quantity"):
+    """
+    Writes a CSV snapshot of `rows` rows drawn from the `holders` pool, in chunks
+    so 10M-row files never sit in memory as strings. `column` is 'quantity'
+    (holder snapshot) or 'points' (playtest leaderboard, as read by sepolia).
+    """
+    with pa_csv.CSVWriter(path, pa.schema([
+        ("address", pa.string()), (column, pa.int64()),
+        ("collection", pa.string()), ("expiration_timestamp", pa.int64()),
+    ])) as writer:
+        for start in range(0, rows, GENERATE_CHUNK_ROWS):
+            count = min(GENERATE_CHUNK_ROWS, rows - start)
+            addresses = holders[rng.integers(0, len(holders), count)]
+            writer.write_table(pa.table({
+                "address": pa.array(format_addresses(addresses), type=pa.string()),
+                column: rng.geometric(0.3, count).astype(np.int64),
+                "collection": pa.array(np.full(count, collection)),
+                "expiration_timestamp": np.full(count, 1733656248, dtype=np.int64),
+            }))
+
+
+def generate_dataset(folder: Path, rows: int, collections: int = 4, seed: int = 0) -> dict:
+    """
+    Holder snapshots of `rows` rows in total, split over `collections` files that
+    draw from one shared holder pool (so collections overlap), with 0x0 / 0x1
+    rows for the filter stage; plus a points file of `rows` rows for transform.
+    """
+    rng = np.random.default_rng(seed)
+    holders = synthetic_addresses(max(1, int(rows * 0.6)), rng)
+    holders[:2] = np.array([bytes(32), bytes(31) + b"\x01"], dtype=ADDRESS_DTYPE)  # 0x0 and 0x1
+    (folder / "holders").mkdir(parents=True, exist_ok=True)
+    (folder / "points").mkdir(exist_ok=True)
+    per_file = -(-rows // collections)
+    for i in range(collections):
+        generate_snapshot(folder / "holders" / f"collection_{i}.csv", holders, min(per_file, rows - i * per_file),
+                          f"collection_{i}", rng)
+    generate_snapshot(folder / "points" / "playtest.csv", holders, rows, "playtest", rng, column="points")
+    return {"rows": rows, "collections": collections, "holder_pool": len(holders)}
+
+
+def _stage(name: str, rows: int, func, *args, **kwargs) -> dict:
+    # Tools print per-file summaries; keep them out of the benchmark output
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    run = {"stage": name, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed, 1)}
+    # A stage whose files failed is not a valid timing
+    errors = getattr(report, "errors", [])
+    if errors:
+        run["errors"] = [str(error) for error in errors]
+    return run
+
+
+def bench_csv_stages(rows: int, workers=None, seed: int = 0) -> dict:
+    """
+    Times every CSV tool of the airdrop workflow, in workflow order, on a
+    synthetic dataset of `rows` holder rows. Tools that write to the working
+    directory run inside the temporary folder.
+    """
+    with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp):
+        folder = Path(tmp)
+        start = time.perf_counter()
+        dataset = generate_dataset(folder, rows, seed=seed)
+        generate_seconds = time.perf_counter() - start
+        holders = folder / "holders"
+        stages = [
+            _stage("filter", rows, filter_0.remove_addresses, holders, max_workers=workers),
+            _stage("timestamp", rows, update_expiration_timestamp.update_timestamps, holders, 1733656248,
+                   max_workers=workers),
+            _stage("merge", rows, merge_tokens_nfts.merge_csvs, holders),
+            _stage("merge_aggregate", rows, merge_tokens_nfts.merge_csvs, holders, aggregate="sum"),
+            _stage("transform", rows, sepolia.transform_csv_files, folder / "points", total_tokens=rows,
+                   min_tokens=0, max_workers=workers),
+            _stage("overlap", rows, count_unique_addresses, holders, max_workers=workers),
+            _stage("drops", rows, number_of_drops.analyze_airdrops, holders, max_workers=workers),
+            _stage("drops_hll", rows, number_of_drops.analyze_airdrops, holders, max_workers=workers,
+                   distinct="hll"),
+        ]
+    return {
+        "benchmark": "csv_stages",
+        **dataset,
+        "workers": workers,
+        "generate_seconds": round(generate_seconds, 3),
+        "runs": stages,
+    }
+
+
+# Results
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "created_at": int(time.time()),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+        "cpus": os.cpu_count(),
+        "platform": platform.platform(),
+    }
+
+
+def _timings(results: dict) -> dict:
+    """(benchmark, size, run) -> seconds, for comparing two results files"""
+    timings = {}
+    for result in results["results"]:
+        size = result.get("rows", result.get("supply", "-"))
+        for run in result["runs"] if isinstance(result["runs"], list) else [
+            {"stage": name, "seconds": value["setup_seconds"]} for name, value in result["runs"].items()
+        ]:
+            label = run.get("stage", run.get("batch_size", run.get("parallel_ranges")))
+            timings[(result["benchmark"], size, str(label))] = run["seconds"]
+    return timings
+
+
+def compare(results: dict, baseline: dict):
+    """Prints the speedup of every run present in both results files"""
+    before, after = _timings(baseline), _timings(results)
+    print(f"\n{'benchmark':<14}{'size':>10}  {'run':<16}{'before':>10}{'after':>10}{'speedup':>9}")
+    for key in sorted(set(before) & set(after), key=str):
+        benchmark, size, label = key
+        speedup = before[key] / after[key] if after[key] else float("inf")
+        print(f"{benchmark:<14}{size:>10}  {label:<16}{before[key]:>10.3f}{after[key]:>10.3f}{speedup:>8.2f}x")
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetcher and CSV tool benchmarks (offline)")
+    parser.add_argument("--suite", choices=["fetchers", "csv", "all"], default="all")
+    parser.add_argument("--supply", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--sizes", default="10k,1m", help=f"Comma separated, from {', '.join(SIZES)}")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes of the CSV tools")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    results = {**environment(), "results": []}
+
+    def record(result: dict):
+        results["results"].append(result)
+        print(json.dumps(result, indent=4))
+
+    if args.suite in ("fetchers", "all"):
+        record(asyncio.run(bench_owner_scan(args.supply, args.latency)))
+        record(asyncio.run(bench_client_setup(args.latency)))
+        record(asyncio.run(bench_event_scan(args.supply, args.latency)))
+    if args.suite in ("csv", "all"):
+        for size in args.sizes.lower().split(","):
+            record(bench_csv_stages(SIZES[size], args.workers))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text()))
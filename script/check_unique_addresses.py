@@ -1,57 +1,137 @@
 import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
-def count_unique_addresses(folder_path):
+from address import ADDRESS_DTYPE, factorize_addresses, format_addresses
+from parallel import map_files
+from snapshot_format import read_addresses, snapshot_files
+
+def build_membership_index(addresses_by_file):
+    """
+    Build an address -> collection bitmask index in a single vectorized pass.
+
+    Parameters:
+    addresses_by_file (dict): collection name -> array of distinct S32 addresses
+
+    Returns:
+    tuple: (collection names, distinct addresses, bitmasks) where bitmasks is a
+    (addresses, ceil(collections / 64)) uint64 array with bit i set when the
+    address appears in collection i
+    """
+    names = list(addresses_by_file)
+    arrays = [addresses_by_file[name] for name in names]
+    bounds = np.cumsum([0] + [len(a) for a in arrays])
+
+    # One hash factorization over every (address, collection) pair
+    stacked = np.concatenate(arrays) if arrays else np.empty(0, dtype=ADDRESS_DTYPE)
+    addresses, codes = factorize_addresses(stacked)
+
+    masks = np.zeros((len(addresses), max(1, (len(names) + 63) // 64)), dtype=np.uint64)
+    for i in range(len(names)):
+        # Addresses are distinct within a collection, so a plain fancy OR is safe
+        masks[codes[bounds[i]:bounds[i + 1]], i >> 6] |= np.uint64(1 << (i & 63))
+    return names, addresses, masks
+
+def overlap_report(names, masks):
+    """
+    Overlap statistics computed from the bitmask index.
+
+    Only the distinct collection combinations are expanded, so the cost is driven
+    by the number of combinations rather than the number of addresses.
+
+    Returns:
+    tuple: (overlap matrix DataFrame, UpSet-style combination counts DataFrame,
+    Series of number of addresses by number of collections they appear in)
+    """
+    # Distinct bitmasks = exclusive intersections (UpSet bars)
+    combo_counts = pd.DataFrame(masks).value_counts(sort=False)
+    combos = np.array(combo_counts.index.tolist(), dtype=np.uint64).reshape(-1, masks.shape[1])
+    combo_counts = combo_counts.to_numpy()
+    bits = np.arange(len(names))
+    membership = ((combos[:, bits >> 6] >> (bits & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+    # Pairwise overlaps: membership^T . diag(count) . membership
+    # (float64 BLAS product, exact for counts below 2**53)
+    weighted = membership * combo_counts[:, None].astype(np.float64)
+    matrix = np.rint(weighted.T @ membership.astype(np.float64)).astype(np.int64)
+    overlap_matrix = pd.DataFrame(matrix, index=names, columns=names)
+
+    # UpSet layout: one indicator column per collection, one row per combination
+    degrees = membership.sum(axis=1)
+    upset = pd.DataFrame(membership, columns=names)
+    upset['degree'] = degrees
+    upset['addresses'] = combo_counts
+    upset = upset.sort_values(['addresses', 'degree'], ascending=[False, False], ignore_index=True)
+
+    collections_per_address = (
+        pd.Series(combo_counts).groupby(degrees).sum().rename_axis('collections').rename('addresses')
+    )
+    return overlap_matrix, upset, collections_per_address
+
+def distinct_file_addresses(file):
+    """Distinct S32 addresses of one snapshot file"""
+    file_addresses, _ = factorize_addresses(read_addresses(file))
+    return file_addresses
+
+def count_unique_addresses(folder_path, top_combinations=20, max_workers=None, memory_budget=None):
     """
-    Read all CSV files in the specified folder and count unique addresses
+    Read all snapshot files (Parquet or CSV) in the specified folder and count unique addresses
     with detailed information about overlap.
-    
+
     Parameters:
-    folder_path (str): Path to the folder containing CSV files
-    
+    folder_path (str): Path to the folder containing snapshot files
+    top_combinations (int): Number of collection combinations to print
+    max_workers (int): Worker processes reading the files (default: one per CPU)
+    memory_budget (int): Bytes the files read at once may use
+
     Returns:
-    tuple: (number of unique addresses, set of unique addresses)
+    tuple: (number of unique addresses, set of unique canonical addresses)
+
+    Addresses are compared in their canonical 32-byte form, so padded and
+    unpadded spellings of one account count once.
     """
     folder = Path(folder_path)
-    
+
     # Dictionary to store addresses by file
     addresses_by_file = {}
-    
-    # Set to store all unique addresses across all files
-    all_addresses = set()
-    
-    # First pass: collect addresses from each file
-    for file in folder.glob('*.csv'):
-        try:
-            df = pd.read_csv(file, usecols=['address'])
-            file_addresses = set(df['address'].unique())
-            
-            addresses_by_file[file.stem] = file_addresses
-            all_addresses.update(file_addresses)
-            
-            print(f"Processed {file.name}: Found {len(file_addresses)} unique addresses")
-            
-        except Exception as e:
-            print(f"Error processing {file.name}: {str(e)}")
-    
+
+    # First pass: collect the distinct addresses of each file, one file per worker process
+    report = map_files(distinct_file_addresses, snapshot_files(folder), max_workers=max_workers,
+                       memory_budget=memory_budget)
+    for file, file_addresses in report.results.items():
+        addresses_by_file[file.stem] = file_addresses
+
+        print(f"Processed {file.name}: Found {len(file_addresses)} unique addresses")
+    report.print_summary()
+
+    names, all_addresses, masks = build_membership_index(addresses_by_file)
+    overlap_matrix, upset, collections_per_address = overlap_report(names, masks)
+
     # Calculate overlap statistics
     print("\nOverlap Analysis:")
-    for file1, addresses1 in addresses_by_file.items():
-        for file2, addresses2 in addresses_by_file.items():
-            if file1 < file2:  # Avoid comparing a file with itself and duplicate comparisons
-                overlap = len(addresses1.intersection(addresses2))
-                if overlap > 0:
-                    print(f"{file1} and {file2} share {overlap} addresses")
-    
+    for i, file1 in enumerate(names):
+        for file2 in names[i + 1:]:
+            overlap = overlap_matrix.at[file1, file2]
+            if overlap > 0:
+                print(f"{file1} and {file2} share {overlap} addresses")
+
+    print("\nAddresses by exact collection combination:")
+    for _, row in upset.head(top_combinations).iterrows():
+        print(f"{row['addresses']:>10}  {' & '.join(name for name in names if row[name])}")
+
+    print("\nAddresses by number of collections they appear in:")
+    for degree, count in collections_per_address.items():
+        print(f"{degree:>3} collection(s): {count} addresses")
+
     total_individual = sum(len(addrs) for addrs in addresses_by_file.values())
     print(f"\nSum of individual file unique addresses: {total_individual}")
     print(f"Total unique addresses across all files: {len(all_addresses)}")
     print(f"Difference (overlap): {total_individual - len(all_addresses)}")
-    
-    return len(all_addresses), all_addresses
+
+    return len(all_addresses), set(format_addresses(all_addresses))
 
 # Example usage
 if __name__ == "__main__":
     folder_path = "./output/all/all_braavos_argent"
-    count, addresses = count_unique_addresses(folder_path)
\ No newline at end of file
+    count, addresses = count_unique_addresses(folder_path)
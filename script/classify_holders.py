@@ -0,0 +1,323 @@
+"""
+Tells player accounts apart from contracts (AMM pools, vaults, bridges...)
+among the holders of a snapshot.
+
+Every address is looked up once with batched starknet_getClassHashAt calls and
+its class hash is mapped to a kind:
+
+    account      a known account class (account_classes.json: Argent, Braavos,
+                 Cartridge controller... labelled by wallet) or any class that
+                 implements the SRC6 / legacy IAccount interface, probed once per
+                 unknown class hash
+    contract     any other deployed class
+    undeployed   nothing deployed at the address yet (counterfactual account)
+    unknown      the lookup failed (throttled, node error)
+
+Address -> class hash and class hash -> kind are kept in a SQLite cache, so a
+repeat airdrop only queries the new addresses (undeployed and unknown ones are
+looked up again).
+
+    python classify_holders.py ./holders --output classes.csv --blocklist contracts.csv
+    python filter_0.py ./holders --blocklist contracts.csv
+
+Run `python mock_node.py` and pass --rpc-url http://127.0.0.1:5050/ to try it offline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from starknet_py.hash.selector import get_selector_from_name
+from starknet_py.net.client_errors import ClientError
+
+from address import format_addresses
+from clients import client_session, make_rpc
+from rpc_engine import AimdWindow, RequestEngine, is_throttle_error
+from snapshot_format import read_addresses, snapshot_files
+from starknet_rpc import StarknetRpc
+
+DEFAULT_ACCOUNT_CLASSES = Path(__file__).parent / "account_classes.json"
+DEFAULT_CACHE = "holder_classes.db"
+
+# SRC5 interface ids of accounts: SRC6 (Cairo 1), IAccount of the Cairo 0 OpenZeppelin and Argent accounts
+ISRC6_ID = 0x2CECCEF7F994940B3962A6C67E0BA4FCD37DF7D131417C604F91E03CAECC1CD
+LEGACY_ACCOUNT_IDS = (0xA66BD575, 0x3943F10F)
+CONTRACT_NOT_FOUND = 20
+
+# Addresses looked up (and cached) per round, so an interrupted run keeps its progress
+LOOKUP_CHUNK_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS class_hashes (
+    address TEXT PRIMARY KEY,
+    class_hash TEXT NOT NULL,
+    checked_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS classes (
+    class_hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT
+);
+"""
+
+
+def load_account_classes(path=DEFAULT_ACCOUNT_CLASSES) -> Dict[str, str]:
+    """Known account class hash -> wallet label, from {"argent": [class hashes], ...} ("_" keys are comments)"""
+    with open(path) as f:
+        labels = json.load(f)
+    return {
+        hex(int(class_hash, 16)): label
+        for label, class_hashes in labels.items() if not label.startswith('_')
+        for class_hash in class_hashes
+    }
+
+
+class ClassCache:
+    """
+    On-disk (SQLite) cache of the class hash of every classified address and of
+    the kind (account / contract) of every class hash seen.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE):
+        self.path = path
+        # Parallel pipeline sources each open their own connection on the same file
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.executescript(SCHEMA)
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (address TEXT PRIMARY KEY)")
+
+    def close(self):
+        self.db.close()
+
+    def class_hashes(self, addresses: Sequence[str]) -> Dict[str, str]:
+        """Cached class hash of the given addresses (one indexed join, not one query each)"""
+        with self.db:
+            self.db.execute("DELETE FROM wanted")
+            self.db.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((address,) for address in addresses))
+        return dict(self.db.execute(
+            "SELECT class_hashes.address, class_hash FROM class_hashes JOIN wanted USING (address)"
+        ))
+
+    def put_class_hashes(self, rows: Sequence[Tuple[str, str]]):
+        checked_at = int(time.time())
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO class_hashes VALUES (?, ?, ?)",
+                ((address, class_hash, checked_at) for address, class_hash in rows),
+            )
+
+    def kinds(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """class hash -> (kind, label)"""
+        return {class_hash: (kind, label) for class_hash, kind, label in self.db.execute("SELECT * FROM classes")}
+
+    def put_kinds(self, kinds: Dict[str, Tuple[str, Optional[str]]]):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO classes VALUES (?, ?, ?)",
+                ((class_hash, kind, label) for class_hash, (kind, label) in kinds.items()),
+            )
+
+
+async def fetch_class_hashes(rpc: StarknetRpc, addresses: Sequence[str]) -> List:
+    """
+    Class hash of every address (batched getClassHashAt calls), None when nothing
+    is deployed there, or the error the lookup failed with.
+    """
+    results = await rpc.batch([
+        ("starknet_getClassHashAt", {"block_id": "latest", "contract_address": address}) for address in addresses
+    ])
+    class_hashes = []
+    for result in results:
+        if isinstance(result, ClientError) and str(result.code) == str(CONTRACT_NOT_FOUND):
+            class_hashes.append(None)
+        elif isinstance(result, Exception):
+            class_hashes.append(result)
+        else:
+            class_hashes.append(hex(int(result, 16)))
+    return class_hashes
+
+
+async def probe_accounts(rpc: StarknetRpc, samples: Dict[str, str]) -> Dict[str, Optional[bool]]:
+    """
+    Whether each class hash is an account class, from one deployed address of
+    that class: any supports_interface(SRC6) / supportsInterface(IAccount) that
+    answers true. A class without SRC5 reverts, which means contract; None when
+    a probe failed for another reason (throttling...) and nothing answered true.
+    """
+    probes = [("supports_interface", ISRC6_ID)] + [("supportsInterface", id_) for id_ in LEGACY_ACCOUNT_IDS]
+    calls = [
+        (
+            "starknet_call",
+            {
+                "request": {
+                    "contract_address": address,
+                    "entry_point_selector": hex(get_selector_from_name(function_name)),
+                    "calldata": [hex(interface_id)],
+                },
+                "block_id": "latest",
+            },
+        )
+        for address in samples.values()
+        for function_name, interface_id in probes
+    ]
+    results = await rpc.batch(calls)
+    accounts = {}
+    for index, class_hash in enumerate(samples):
+        answers = results[index * len(probes):(index + 1) * len(probes)]
+        if any(not isinstance(answer, Exception) and answer and int(answer[0], 16) != 0 for answer in answers):
+            accounts[class_hash] = True
+        elif any(
+            isinstance(answer, Exception) and (not isinstance(answer, ClientError) or is_throttle_error(answer))
+            for answer in answers
+        ):
+            accounts[class_hash] = None
+        else:
+            accounts[class_hash] = False
+    return accounts
+
+
+async def classify_addresses(
+    rpc: StarknetRpc,
+    addresses: Sequence[str],
+    cache: ClassCache,
+    account_classes: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    Classifies canonical addresses, querying only the ones not in the cache.
+
+    Returns:
+    DataFrame: address, class_hash, kind, label (one row per distinct address)
+    """
+    account_classes = load_account_classes() if account_classes is None else account_classes
+    addresses = list(dict.fromkeys(addresses))
+    class_of = cache.class_hashes(addresses)
+    pending = [address for address in addresses if address not in class_of]
+    failed = set()
+    print(f"{len(addresses) - len(pending)} of {len(addresses)} addresses cached, looking up {len(pending)}")
+
+    for start in range(0, len(pending), LOOKUP_CHUNK_SIZE):
+        chunk = pending[start:start + LOOKUP_CHUNK_SIZE]
+        found = []
+        for address, class_hash in zip(chunk, await fetch_class_hashes(rpc, chunk)):
+            if isinstance(class_hash, Exception):
+                failed.add(address)
+            elif class_hash is not None:
+                found.append((address, class_hash))
+        cache.put_class_hashes(found)
+        class_of.update(found)
+        print(f"Looked up {min(start + LOOKUP_CHUNK_SIZE, len(pending))}/{len(pending)} addresses")
+
+    # Known wallet classes first (so edits to account_classes.json apply to cached
+    # addresses too), then one probe per class hash never seen before
+    kinds = {**cache.kinds(), **{class_hash: ("account", label) for class_hash, label in account_classes.items()}}
+    samples = {}
+    for address, class_hash in class_of.items():
+        if class_hash not in kinds:
+            samples.setdefault(class_hash, address)
+    if samples:
+        new_kinds = {}
+        for class_hash, account in (await probe_accounts(rpc, samples)).items():
+            if account is not None:
+                new_kinds[class_hash] = ("account", "src6") if account else ("contract", None)
+        cache.put_kinds(new_kinds)
+        kinds.update(new_kinds)
+        print(f"Probed {len(samples)} new class hashes: {sum(kind == 'account' for kind, _ in new_kinds.values())} account classes")
+
+    rows = []
+    for address in addresses:
+        class_hash = class_of.get(address)
+        if class_hash is not None:
+            kind, label = kinds.get(class_hash, ("unknown", None))
+        else:
+            kind, label = ("unknown" if address in failed else "undeployed"), None
+        rows.append((address, class_hash, kind, label))
+    classes = pd.DataFrame(rows, columns=['address', 'class_hash', 'kind', 'label'])
+    for kind, count in classes['kind'].value_counts().items():
+        rpc.metrics.inc("addresses_classified_total", int(count), kind=kind)
+    return classes
+
+
+async def classify(
+    addresses: Sequence[str],
+    rpc_url: str,
+    cache_path: str = DEFAULT_CACHE,
+    account_classes_path=DEFAULT_ACCOUNT_CLASSES,
+    max_in_flight: int = 64,
+) -> pd.DataFrame:
+    """classify_addresses with its own connection pool, engine and cache connection"""
+    cache = ClassCache(cache_path)
+    try:
+        async with client_session(max_in_flight) as session:
+            rpc = make_rpc(rpc_url, session, RequestEngine(window=AimdWindow(maximum=max_in_flight)))
+            return await classify_addresses(rpc, addresses, cache, load_account_classes(account_classes_path))
+    finally:
+        cache.close()
+
+
+def _write_csv(df: pd.DataFrame, path: Path):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def classify_files(
+    paths: Sequence,
+    rpc_url: str,
+    cache_path: str = DEFAULT_CACHE,
+    output_file: str = "holder_classes.csv",
+    blocklist_file: Optional[str] = None,
+    drop_kinds: Sequence[str] = ("contract",),
+    max_in_flight: int = 64,
+) -> pd.DataFrame:
+    """
+    Classifies the holders of snapshot files (or folders of them).
+
+    Args:
+    output_file (str): CSV of every distinct address with its class hash, kind and label
+    blocklist_file (str): Optional address,reason CSV of the `drop_kinds` addresses,
+        ready for filter_0 --blocklist / the pipeline filter stage
+    """
+    files = [file for path in map(Path, paths) for file in (snapshot_files(path) if path.is_dir() else [path])]
+    addresses = pd.unique(pd.Series(
+        [address for file in files for address in format_addresses(read_addresses(file))], dtype=object
+    ))
+    print(f"{len(addresses)} distinct holders in {len(files)} files")
+
+    classes = asyncio.run(classify(list(addresses), rpc_url, cache_path, max_in_flight=max_in_flight))
+    _write_csv(classes, Path(output_file))
+    print(f"Wrote {len(classes)} classified addresses to {output_file}: "
+          + ", ".join(f"{count} {kind}" for kind, count in classes['kind'].value_counts().items()))
+
+    if blocklist_file:
+        dropped = classes[classes['kind'].isin(list(drop_kinds))]
+        _write_csv(dropped[['address', 'kind']].rename(columns={'kind': 'reason'}), Path(blocklist_file))
+        print(f"Wrote {len(dropped)} addresses to exclude to {blocklist_file}")
+    return classes
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify snapshot holders as accounts or contracts")
+    parser.add_argument("paths", nargs="+", help="Snapshot files or folders")
+    parser.add_argument("--rpc-url", default=os.environ.get("RPC_URL", "https://starknet-mainnet.public.blastapi.io/"))
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--output", default="holder_classes.csv")
+    parser.add_argument("--blocklist", default=None, help="Write the addresses to drop as a filter blocklist")
+    parser.add_argument("--drop", action="append", default=None, help="Kinds to drop (default: contract)")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    classify_files(
+        args.paths,
+        args.rpc_url,
+        args.cache,
+        args.output,
+        args.blocklist,
+        args.drop or ["contract"],
+        args.max_in_flight,
+    )
@@ -0,0 +1,100 @@
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from aiohttp import ClientSession, TCPConnector
+from starknet_py.contract import Contract
+from starknet_py.net.full_node_client import FullNodeClient
+
+from rpc_engine import RequestEngine
+from starknet_rpc import StarknetRpc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".abi_cache"
+
+
+@asynccontextmanager
+async def client_session(max_connections: int = 64, keepalive_timeout: float = 60) -> AsyncIterator[ClientSession]:
+    """One keep-alive connection pool to share between every client of a run"""
+    connector = TCPConnector(limit=max_connections, keepalive_timeout=keepalive_timeout)
+    async with ClientSession(connector=connector) as session:
+        yield session
+
+
+def make_client(url: str, session: ClientSession) -> FullNodeClient:
+    return FullNodeClient(node_url=url, session=session)
+
+
+def make_rpc(url: str, session: ClientSession, engine: Optional[RequestEngine] = None) -> StarknetRpc:
+    return StarknetRpc(url, session=session, engine=engine or RequestEngine())
+
+
+class AbiCache:
+    """
+    Persistent ABI cache. ABIs are stored once per class hash (content addressed)
+    under `abis/<class_hash>.json`, and `class_hashes.json` maps contract addresses
+    to their class hash.
+    """
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.abi_dir = self.cache_dir / "abis"
+        self.index_file = self.cache_dir / "class_hashes.json"
+        self.abi_dir.mkdir(parents=True, exist_ok=True)
+        self.class_hashes = json.loads(self.index_file.read_text()) if self.index_file.exists() else {}
+
+    def get(self, address: str) -> Optional[dict]:
+        class_hash = self.class_hashes.get(address)
+        if class_hash is None:
+            return None
+        abi_file = self.abi_dir / f"{class_hash}.json"
+        return json.loads(abi_file.read_text()) if abi_file.exists() else None
+
+    def put(self, address: str, class_hash: str, abi: list, cairo_version: int):
+        abi_file = self.abi_dir / f"{class_hash}.json"
+        if not abi_file.exists():
+            abi_file.write_text(json.dumps({"abi": abi, "cairo_version": cairo_version}))
+        self.class_hashes[address] = class_hash
+        tmp_file = self.index_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps(self.class_hashes, indent=4))
+        tmp_file.replace(self.index_file)
+
+
+async def load_contract(
+    client: FullNodeClient,
+    address: str,
+    cache: Optional[AbiCache] = None,
+    revalidate: bool = True,
+) -> Contract:
+    """
+    Contract.from_address with a persistent ABI cache. One cheap
+    starknet_getClassHashAt call checks the contract was not upgraded
+    (replace_class) since the ABI was cached; revalidate=False skips it and
+    builds the contract without any network call.
+    """
+    cache = cache or AbiCache()
+    address = hex(int(address, 16))
+    start = time.perf_counter()
+
+    cached = cache.get(address)
+    if cached is not None and revalidate:
+        class_hash = hex(await client.get_class_hash_at(address))
+        if class_hash != cache.class_hashes[address]:
+            cached = None
+
+    if cached is not None:
+        contract = Contract(
+            address=address, abi=cached["abi"], provider=client, cairo_version=cached["cairo_version"]
+        )
+        logger.debug(f"ABI of {address} loaded from cache in {time.perf_counter() - start:.3f}s")
+        return contract
+
+    class_hash = hex(await client.get_class_hash_at(address))
+    contract = await Contract.from_address(address=address, provider=client)
+    cache.put(address, class_hash, contract.data.abi, contract.data.cairo_version)
+    logger.debug(f"ABI of {address} fetched from the network in {time.perf_counter() - start:.3f}s")
+    return contract
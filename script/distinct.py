@@ -0,0 +1,159 @@
+"""
+Distinct counting of canonical (S32) addresses in bounded memory.
+
+AddressSet is exact: an open-addressing hash table of int32 slots pointing into
+a dense array of the distinct addresses and their hashes (40 bytes per distinct
+address plus 8-16 bytes of slots, versus ~150 bytes for a Python set of hex
+strings). HyperLogLog is approximate, with a fixed-size register array chosen
+from the target relative error. Both take
+whole chunks at once (vectorized inserts) and merge, so per-file counters can
+be combined in a reduce step.
+"""
+
+import math
+
+import numpy as np
+
+from address import ADDRESS_DTYPE
+
+
+def address_hashes(addresses: np.ndarray) -> np.ndarray:
+    """Well-mixed 64-bit hash of every address (all 32 bytes, splitmix64 finalizer)"""
+    words = np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE).view(">u8").reshape(-1, 4).astype(np.uint64)
+    h = words[:, 0] ^ (words[:, 1] * np.uint64(0x9E3779B97F4A7C15))
+    h ^= words[:, 2] * np.uint64(0xC2B2AE3D27D4EB4F)
+    h ^= words[:, 3] * np.uint64(0x165667B19E3779F9)
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return h
+
+
+class AddressSet:
+    """Exact set of S32 addresses with vectorized chunk inserts (linear probing)"""
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.size = 0
+        self.values = np.empty(capacity, dtype=ADDRESS_DTYPE)
+        self._hashes = np.empty(capacity, dtype=np.uint64)
+        self._slots = np.full(1 << max(4, (2 * capacity - 1).bit_length()), -1, dtype=np.int32)
+
+    def __len__(self):
+        return self.size
+
+    def addresses(self) -> np.ndarray:
+        """Distinct addresses, in insertion order"""
+        return self.values[:self.size]
+
+    def add(self, addresses: np.ndarray):
+        """Adds a chunk of S32 addresses (duplicates and known addresses are ignored)"""
+        addresses = np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE)
+        if self.size + len(addresses) > len(self._slots) // 2:
+            self._grow(self.size + len(addresses))
+        self._insert(addresses, address_hashes(addresses))
+
+    def update(self, other: "AddressSet"):
+        self.add(other.addresses())
+
+    def __getstate__(self):
+        # Drop the spare capacity before the set is pickled back from a worker
+        state = dict(self.__dict__)
+        state['values'], state['_hashes'] = self.values[:self.size].copy(), self._hashes[:self.size].copy()
+        return state
+
+    def _insert(self, keys: np.ndarray, hashes: np.ndarray):
+        # Every round probes one slot per pending key
+        mask = len(self._slots) - 1
+        slots = (hashes & np.uint64(mask)).astype(np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            occupant = self._slots[slots[pending]]
+            empty = occupant < 0
+            found = ~empty
+            found[found] = self._hashes[occupant[found]] == hashes[pending[found]]
+            found[found] = self.values[occupant[found]] == keys[pending[found]]
+
+            # Claim empty slots, first key per slot wins (reverse scatter of
+            # temporary marks); the others probe on
+            claim = np.flatnonzero(empty)
+            marks = -2 - np.arange(len(claim), dtype=np.int32)
+            claimed = slots[pending[claim]]
+            self._slots[claimed[::-1]] = marks[::-1]
+            won = self._slots[claimed] == marks
+            winners = pending[claim[won]]
+            self._reserve(self.size + len(winners))
+            self.values[self.size:self.size + len(winners)] = keys[winners]
+            self._hashes[self.size:self.size + len(winners)] = hashes[winners]
+            self._slots[slots[winners]] = np.arange(self.size, self.size + len(winners), dtype=np.int32)
+            self.size += len(winners)
+
+            # Collisions probe the next slot; claim losers re-check theirs, which
+            # now holds either their own duplicate or a different address
+            found[claim[won]] = True
+            collided = ~empty & ~found
+            slots[pending[collided]] = (slots[pending[collided]] + 1) & mask
+            pending = pending[~found]
+
+    def _reserve(self, size: int):
+        if size > len(self.values):
+            capacity = max(size, 2 * len(self.values))
+            self.values = np.concatenate([self.values[:self.size], np.empty(capacity - self.size, dtype=ADDRESS_DTYPE)])
+            self._hashes = np.concatenate([self._hashes[:self.size], np.empty(capacity - self.size, dtype=np.uint64)])
+
+    def _grow(self, size: int):
+        self._slots = np.full(1 << (4 * size - 1).bit_length(), -1, dtype=np.int32)
+        existing, self.size = self.addresses().copy(), 0
+        self._insert(existing, self._hashes[:len(existing)].copy())
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count with relative standard error ~`error`
+    (2**p one-byte registers with 1.04 / sqrt(2**p) <= error).
+    """
+
+    def __init__(self, error: float = 0.01):
+        self.p = min(18, max(4, math.ceil(2 * math.log2(1.04 / error))))
+        self.registers = np.zeros(1 << self.p, dtype=np.uint8)
+
+    def __len__(self):
+        return round(self.estimate())
+
+    def add(self, addresses: np.ndarray):
+        hashes = address_hashes(addresses)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # rank = leading zeros of the remaining 64 - p bits, plus one
+        rank = np.ones(len(hashes), dtype=np.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            zero = (rest >> np.uint64(64 - shift)) == 0
+            rank += (zero * shift).astype(np.uint8)
+            rest = np.where(zero, rest << np.uint64(shift), rest)
+        np.minimum(rank, 64 - self.p + 1, out=rank)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            return m * math.log(m / zeros)
+        return float(estimate)
+
+
+def distinct_counter(mode: str = "exact", error: float = 0.01):
+    """AddressSet for mode 'exact', HyperLogLog for 'hll'"""
+    if mode == "exact":
+        return AddressSet()
+    if mode == "hll":
+        return HyperLogLog(error)
+    raise ValueError(f"Unknown distinct mode {mode!r} (expected exact or hll)")
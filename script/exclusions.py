@@ -0,0 +1,183 @@
+"""
+Exclusion lists for the filter stage: exchange hot wallets, bridge and LP
+contracts, sybil clusters... (hundreds of thousands of addresses).
+
+Blocklists and allowlists are loaded once into sorted S32 arrays and every row
+of a distribution is looked up with one vectorized searchsorted, so filtering
+is O(n log m) with no Python loop over rows. An optional Bloom filter in front
+skips the binary search for the (usual) rows that are on no list. Each removed
+row gets a reason: the `reason` column of its list, else the list file name.
+
+    exchanges.csv       address,reason        (reason column optional)
+    sybils.txt          one address per line, # comments allowed
+    bridges.parquet     address column (fixed_size_binary(32) or hex strings)
+
+An address on an allowlist is never removed by a blocklist.
+"""
+
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from address import ADDRESS_DTYPE, parse_addresses, valid_addresses
+from distinct import address_hashes
+from snapshot_format import address_values
+
+# Addresses every airdrop drops (previously filter_0's hard-coded list)
+RESERVED_ADDRESSES = {'reserved address': ['0x0', '0x1']}
+MALFORMED = "malformed address"
+
+
+class BloomFilter:
+    """Bit array with k hash positions per address (double hashing of address_hashes)"""
+
+    def __init__(self, capacity: int, error: float = 0.01):
+        bits = max(64, math.ceil(-max(1, capacity) * math.log(error) / math.log(2) ** 2))
+        self.bits = 1 << (bits - 1).bit_length()
+        self.k = max(1, round(self.bits / max(1, capacity) * math.log(2)))
+        self.array = np.zeros(self.bits // 8, dtype=np.uint8)
+
+    def _positions(self, addresses: np.ndarray) -> np.ndarray:
+        hashes = address_hashes(addresses)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.k, dtype=np.uint64)
+        return ((h1[:, None] + steps * h2[:, None]) & np.uint64(self.bits - 1)).astype(np.int64)
+
+    def add(self, addresses: np.ndarray):
+        positions = self._positions(addresses).ravel()
+        np.bitwise_or.at(self.array, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+    def might_contain(self, addresses: np.ndarray) -> np.ndarray:
+        """False means certainly absent; True may be a false positive (~`error`)"""
+        positions = self._positions(addresses)
+        return ((self.array[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).all(axis=1)
+
+
+def _prefixes(addresses: np.ndarray) -> np.ndarray:
+    # First 8 bytes as an integer: sorts like the S32 bytes, compares much faster
+    return np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE).view(">u8")[::4].astype(np.uint64)
+
+
+def _sorted_lookup(keys: np.ndarray, addresses: np.ndarray, prefixes: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Index of every address in the sorted `keys`, -1 when absent. The binary
+    search runs on the 64-bit prefixes; only rows whose prefix is shared by
+    several keys (small addresses such as 0x0, 0x1) search the full 32 bytes.
+    """
+    if len(keys) == 0 or len(addresses) == 0:
+        return np.full(len(addresses), -1, dtype=np.int64)
+    prefixes = _prefixes(keys) if prefixes is None else prefixes
+    wanted = _prefixes(addresses)
+    low = np.searchsorted(prefixes, wanted, side='left')
+    high = np.searchsorted(prefixes, wanted, side='right')
+    index = np.minimum(low, len(keys) - 1)
+    shared = high - low > 1
+    if shared.any():
+        index[shared] = np.minimum(np.searchsorted(keys, addresses[shared]), len(keys) - 1)
+    return np.where(keys[index] == addresses, index, -1)
+
+
+def read_address_list(file) -> pd.DataFrame:
+    """
+    (address as S32, reason or None) rows of one list file: CSV with an
+    `address` column, text with one address per line, or Parquet.
+    Malformed entries raise, a broken list should never filter silently.
+    """
+    file = Path(file)
+    if file.suffix == '.parquet':
+        table = pq.read_table(file)
+        column = table.column('address')
+        addresses = address_values(column) if pa.types.is_fixed_size_binary(column.type) else parse_addresses(
+            column.to_pandas()
+        )
+        reasons = table.column('reason').to_pandas() if 'reason' in table.column_names else None
+    elif file.suffix == '.csv':
+        df = pd.read_csv(file, dtype=str, keep_default_na=False, skipinitialspace=True)
+        df.columns = [col.strip().lower() for col in df.columns]
+        addresses = parse_addresses(df['address'])
+        reasons = df['reason'] if 'reason' in df.columns else None
+    else:
+        lines = pd.Series(file.read_text().splitlines(), dtype=str).str.split('#').str[0].str.strip()
+        addresses = parse_addresses(lines[lines != ''])
+        reasons = None
+    if reasons is None:
+        reasons = pd.Series(file.stem, index=range(len(addresses)))
+    reasons = pd.Series(reasons).reset_index(drop=True).replace('', file.stem).fillna(file.stem)
+    return pd.DataFrame({'address': addresses, 'reason': reasons})
+
+
+class ExclusionList:
+    """
+    Sorted blocklist (one reason per address) and allowlist of canonical addresses.
+
+    Args:
+    blocked (DataFrame): address (S32), reason; the first reason of a repeated address wins
+    allowed (array): S32 addresses that are always kept
+    bloom_error (float): False positive rate of the Bloom prefilter, None to disable it
+    """
+
+    def __init__(self, blocked: pd.DataFrame, allowed: Optional[np.ndarray] = None, bloom_error: Optional[float] = 0.01):
+        addresses = np.asarray(blocked['address'].to_numpy(), dtype=ADDRESS_DTYPE)
+        reason_codes, reasons = pd.factorize(blocked['reason'])
+        self.reasons = list(reasons) + ([MALFORMED] if MALFORMED not in list(reasons) else [])
+        self.malformed = self.reasons.index(MALFORMED)
+        self.keys, first = np.unique(addresses, return_index=True)
+        self.key_reasons = reason_codes[first].astype(np.int32)
+        self.prefixes = _prefixes(self.keys)
+        self.allowed = np.unique(np.asarray(allowed, dtype=ADDRESS_DTYPE)) if allowed is not None else np.empty(
+            0, dtype=ADDRESS_DTYPE
+        )
+        self.bloom = None
+        if bloom_error is not None and len(self.keys):
+            self.bloom = BloomFilter(len(self.keys), bloom_error)
+            self.bloom.add(self.keys)
+
+    @classmethod
+    def from_files(
+        cls,
+        blocklists: Iterable = (),
+        allowlists: Iterable = (),
+        extra: Optional[Dict[str, List[str]]] = None,
+        bloom_error: Optional[float] = 0.01,
+    ) -> "ExclusionList":
+        """
+        Loads list files (see read_address_list). `extra` maps a reason to inline
+        addresses and defaults to RESERVED_ADDRESSES (0x0 and 0x1).
+        """
+        extra = RESERVED_ADDRESSES if extra is None else extra
+        frames = [pd.DataFrame({'address': parse_addresses(values), 'reason': reason}) for reason, values in extra.items()]
+        frames += [read_address_list(file) for file in blocklists]
+        blocked = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({'address': [], 'reason': []})
+        allowed = [read_address_list(file)['address'].to_numpy() for file in allowlists]
+        allowed = np.concatenate(allowed).astype(ADDRESS_DTYPE) if allowed else None
+        exclusions = cls(blocked, allowed, bloom_error)
+        print(f"Loaded {len(exclusions.keys)} blocked and {len(exclusions.allowed)} allowed addresses")
+        return exclusions
+
+    def __len__(self):
+        return len(self.keys)
+
+    def match(self, addresses: np.ndarray) -> np.ndarray:
+        """Reason code of every S32 address, -1 for addresses to keep"""
+        addresses = np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE)
+        codes = np.full(len(addresses), -1, dtype=np.int32)
+        candidates = self.bloom.might_contain(addresses) if self.bloom is not None else np.ones(len(addresses), bool)
+        index = _sorted_lookup(self.keys, addresses[candidates], self.prefixes)
+        hit = index >= 0
+        if len(self.allowed) and hit.any():
+            hit[hit] = _sorted_lookup(self.allowed, addresses[candidates][hit]) < 0
+        codes[np.flatnonzero(candidates)[hit]] = self.key_reasons[index[hit]]
+        return codes
+
+    def classify(self, values) -> pd.Categorical:
+        """Removal reason of every address string (malformed ones included), NaN for rows to keep"""
+        valid = valid_addresses(values)
+        codes = np.full(len(valid), self.malformed, dtype=np.int32)
+        codes[valid] = self.match(parse_addresses(pd.Series(values)[valid]))
+        return pd.Categorical.from_codes(codes, categories=self.reasons)
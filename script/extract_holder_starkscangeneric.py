@@ -1,10 +1,47 @@
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
 from playwright.sync_api import sync_playwright
+import argparse
+import asyncio
 import time
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 import pandas as pd
 from datetime import datetime, timedelta
 
+from registry import load_registry
+
+# Returns [row count, rows past `start`] where each row is [address, quantity text]
+# (null when the row has no address link or quantity cell)
+EXTRACT_NEW_ROWS_JS = """
+(start) => {
+    const rows = document.querySelectorAll("table tbody tr");
+    const extracted = [];
+    for (let i = start; i < rows.length; i++) {
+        const link = rows[i].querySelector("td:nth-child(2) a");
+        const quantity = rows[i].querySelector("td:nth-child(3)");
+        if (!link || !quantity) {
+            extracted.push(null);
+            continue;
+        }
+        extracted.push([link.getAttribute("href").split("/").pop(), quantity.innerText.trim()]);
+    }
+    return [rows.length, extracted];
+}
+"""
+
+# Requests the async scraper never lets through
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "segment.io",
+    "segment.com",
+    "hotjar.com",
+    "mixpanel.com",
+    "sentry.io",
+    "doubleclick.net",
+)
+
 @dataclass
 class NFTHolder:
     """Data class for NFT holder information"""
@@ -29,70 +66,46 @@ class StarkScanHoldersScraper:
     def _extract_holders_from_page(self, page, collection_name: str) -> List[NFTHolder]:
         """Extract holders data from current page until limit is reached"""
         holders = []
+        seen_addresses = set()
+        # High-water mark: number of table rows already extracted
+        rows_seen = 0
         
         # Wait for the table to be loaded and ensure data is present
         page.wait_for_selector("table tbody tr", timeout=30000)
         
-        # Scroll to load data until we hit the limit
-        last_height = 0
         while len(holders) < self.holder_limit:
-            # Scroll to bottom
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(2)  # Wait for data to load
-            
-            # Calculate new scroll height
-            new_height = page.evaluate("document.body.scrollHeight")
-            
-            # Break if no more content loaded
-            if new_height == last_height:
-                break
-                
-            last_height = new_height
-            
-            # Get all rows from the table
-            rows = page.query_selector_all("table tbody tr")
+            # Only rows past the high-water mark are read, in a single round trip
+            rows_seen, new_rows = page.evaluate(EXTRACT_NEW_ROWS_JS, rows_seen)
+            print(f"Processing {len(new_rows)} new rows ({rows_seen} total)...")
             
-            # Clear holders list and process all visible rows
-            holders.clear()  # Clear to avoid duplicates
-            print(f"Processing {len(rows)} rows...")
-            
-            for row in rows:
-                try:                
-                    # Get first column and extract full address from tooltip
-                    address_element = row.query_selector("td:nth-child(2)")
-                    if not address_element:
-                        continue
-                    href_element = address_element.query_selector("a")
-                    if not href_element:
-                        continue
-                    
-                    href = href_element.get_attribute("href")
-                    address = href.split('/')[-1]
-                    
-                    # Extract quantity
-                    quantity_element = row.query_selector("td:nth-child(3)")
-                    if not quantity_element:
-                        continue
-                        
-                    quantity_text = quantity_element.inner_text().strip()
-                    
-                    holders.append(NFTHolder(
-                        address=address,
-                        quantity=quantity_text,
-                        collection=collection_name
-                    ))
-                    
-                    # Check if we've hit the limit
-                    if len(holders) >= self.holder_limit:
-                        print(f"Reached holder limit of {self.holder_limit}")
-                        break
-                        
-                except Exception as e:
-                    print(f"Error processing row: {str(e)}")
+            for row in new_rows:
+                if row is None:
                     continue
+                address, quantity_text = row
+                # Guard against rows re-rendered by the table
+                if address in seen_addresses:
+                    continue
+                seen_addresses.add(address)
+                holders.append(NFTHolder(
+                    address=address,
+                    quantity=quantity_text,
+                    collection=collection_name
+                ))
+                
+                # Check if we've hit the limit
+                if len(holders) >= self.holder_limit:
+                    print(f"Reached holder limit of {self.holder_limit}")
+                    break
             
             if len(holders) >= self.holder_limit:
                 break
+            
+            # Scroll to bottom and stop when no more content is loaded
+            last_height = page.evaluate("document.body.scrollHeight")
+            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            time.sleep(2)  # Wait for data to load
+            if page.evaluate("document.body.scrollHeight") == last_height:
+                break
                 
         print(f"Collected {len(holders)} holders for {collection_name}")
         return holders[:self.holder_limit]  # Ensure we don't exceed the limit
@@ -121,9 +134,7 @@ class StarkScanHoldersScraper:
             
             for collection_name, collection_info in collections.items():
                 try:
-                    # Generate URL based on collection type
-                    contract_type = "nft-contract" if collection_info["type"] == "nft" else "token"
-                    url = f"https://starkscan.co/{contract_type}/{collection_info['address']}#holders"
+                    url = self._collection_url(collection_info)
                     print(f"\nScraping collection: {collection_name}")
                     
                     # Navigate to the contract page
@@ -148,6 +159,12 @@ class StarkScanHoldersScraper:
             
         return all_holders
     
+    @staticmethod
+    def _collection_url(collection_info: Dict[str, str]) -> str:
+        """Generate URL based on collection type"""
+        contract_type = "nft-contract" if collection_info["type"] == "nft" else "token"
+        return f"https://starkscan.co/{contract_type}/{collection_info['address']}#holders"
+
     def _export_to_csv(self, holders: List[NFTHolder], filename: str = "nft_holders.csv"):
         """Export holders data to CSV"""
         future_date = datetime.now() + timedelta(days=10)
@@ -163,57 +180,171 @@ class StarkScanHoldersScraper:
         df.to_csv(filename, index=False)
         print(f"Data exported to {filename}")
 
+class AsyncStarkScanHoldersScraper(StarkScanHoldersScraper):
+    """
+    Async scraper running several browser contexts in parallel, one collection per
+    context. Images, fonts, media and analytics requests are blocked, and scrolling
+    waits for new table rows (or network idle) instead of sleeping.
+    """
+    
+    def __init__(
+        self,
+        headless: bool = True,
+        holder_limit: int = 3000,
+        parallel: int = 4,
+        scroll_timeout: float = 10.0
+    ):
+        """
+        Initialize the scraper
+        
+        Args:
+            headless: Whether to run browser in headless mode
+            holder_limit: Maximum number of holders to collect per collection
+            parallel: Number of collections scraped at the same time
+            scroll_timeout: Seconds to wait for new rows after a scroll
+        """
+        super().__init__(headless=headless, holder_limit=holder_limit)
+        self.parallel = parallel
+        self.scroll_timeout = scroll_timeout
+    
+    @staticmethod
+    async def _block_resources(route):
+        """Abort requests that are not needed to render the holders table"""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+            host in request.url for host in BLOCKED_HOSTS
+        ):
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def _wait_for_new_rows(self, page, rows_seen: int) -> bool:
+        """Wait until the table has more than rows_seen rows; False if nothing was loaded"""
+        try:
+            await page.wait_for_function(
+                "(n) => document.querySelectorAll('table tbody tr').length > n",
+                arg=rows_seen,
+                timeout=self.scroll_timeout * 1000
+            )
+            return True
+        except PlaywrightTimeoutError:
+            pass
+        
+        # Rows may still be in flight: give the network a chance to settle once
+        try:
+            await page.wait_for_load_state("networkidle", timeout=self.scroll_timeout * 1000)
+        except PlaywrightTimeoutError:
+            pass
+        row_count = await page.evaluate("document.querySelectorAll('table tbody tr').length")
+        return row_count > rows_seen
+    
+    async def _extract_holders_from_page(self, page, collection_name: str) -> List[NFTHolder]:
+        """Extract holders data from current page until limit is reached"""
+        holders = []
+        seen_addresses = set()
+        # High-water mark: number of table rows already extracted
+        rows_seen = 0
+        
+        await page.wait_for_selector("table tbody tr", timeout=30000)
+        
+        while len(holders) < self.holder_limit:
+            rows_seen, new_rows = await page.evaluate(EXTRACT_NEW_ROWS_JS, rows_seen)
+            
+            for row in new_rows:
+                if row is None or row[0] in seen_addresses:
+                    continue
+                seen_addresses.add(row[0])
+                holders.append(NFTHolder(
+                    address=row[0],
+                    quantity=row[1],
+                    collection=collection_name
+                ))
+                if len(holders) >= self.holder_limit:
+                    print(f"{collection_name}: reached holder limit of {self.holder_limit}")
+                    break
+            
+            if len(holders) >= self.holder_limit:
+                break
+            
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            if not await self._wait_for_new_rows(page, rows_seen):
+                break
+        
+        print(f"Collected {len(holders)} holders for {collection_name}")
+        return holders[:self.holder_limit]
+    
+    async def _scrape_collection(self, browser, semaphore, collection_name: str, collection_info: Dict[str, str]) -> List[NFTHolder]:
+        async with semaphore:
+            context = await browser.new_context()
+            try:
+                await context.route("**/*", self._block_resources)
+                page = await context.new_page()
+                print(f"\nScraping collection: {collection_name}")
+                await page.goto(self._collection_url(collection_info), wait_until="domcontentloaded")
+                await page.wait_for_selector("table", timeout=10000)
+                return await self._extract_holders_from_page(page, collection_name)
+            except Exception as e:
+                print(f"Error scraping collection {collection_name}: {e}")
+                return []
+            finally:
+                await context.close()
+    
+    async def get_all_holders_async(
+        self,
+        collections: Dict[str, Dict[str, str]],
+        export_csv: bool = False
+    ) -> List[NFTHolder]:
+        """
+        Get the list of all holders for multiple collections, `parallel` at a time
+        
+        Args:
+            collections: Dictionary mapping collection names to contract addresses
+            export_csv: Whether to export results to CSV
+            
+        Returns:
+            List of NFTHolder objects, in collection order
+        """
+        semaphore = asyncio.Semaphore(self.parallel)
+        
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.headless)
+            try:
+                results = await asyncio.gather(*(
+                    self._scrape_collection(browser, semaphore, name, info)
+                    for name, info in collections.items()
+                ))
+            finally:
+                await browser.close()
+        
+        all_holders = [holder for holders in results for holder in holders]
+        if export_csv and all_holders:
+            self._export_to_csv(all_holders)
+        
+        return all_holders
+    
+    def get_all_holders(
+        self,
+        collections: Dict[str, Dict[str, str]],
+        export_csv: bool = False
+    ) -> List[NFTHolder]:
+        """Synchronous entry point, same signature as StarkScanHoldersScraper.get_all_holders"""
+        return asyncio.run(self.get_all_holders_async(collections, export_csv))
+
 # Example usage
 if __name__ == "__main__":
-    # Dictionary mapping collection names to contract addresses
-    COLLECTIONS = {
-    #"realms": {
-    #    "address": "0x07ae27a31bb6526e3de9cf02f081f6ce0615ac12a6d7b85ee58b8ad7947a2809",
-    #    "type": "nft"
-    #},
-    #"ducks" : {
-    #    "address": "0x04fa864a706e3403fd17ac8df307f22eafa21b778b73353abf69a622e47a2003",
-    #    "type": "nft"
-    #},
-    #"slinks": {
-    #    "address": "0x013ff4e86fa3e7286cc5c64b62f4099cf41e7918d727d22a5109ecfd00274d19",
-    #    "type": "token"
-    #},
-    #"brother": {
-    #    "address": "0x03b405a98c9e795d427fe82cdeeeed803f221b52471e3a757574a2b4180793ee",
-    #    "type": "token"
-    #},
-    "alf": {
-        "address": "0x04718f5a0fc34cc1af16a1cdee98ffb20c31f5cd61d6ab07201858f4287c938d",
-        "type": "token"
-    }
-    # "influence": {
-    #     "address": "0x0241b9c4ce12c06f49fee2ec7c16337386fa5185168f538a7631aacecdf3df74",
-    #     "type": "nft"
-    # },
-    # "loot-survivor": {
-    #     "address": "0x018108b32cea514a78ef1b0e4a0753e855cdf620bc0565202c02456f618c4dc4",
-    #     "type": "nft"
-    # },
-    #"pain-au-lait": {
-    #     "address": "0x049201f03a0f0a9e70e28dcd74cbf44931174dbe3cc4b2ff488898339959e559",
-    #     "type": "token"
-    #},
-    # "blobert": {
-    #     "address": "0x00539f522b29ae9251dbf7443c7a950cf260372e69efab3710a11bf17a9599f1",
-    #     "type": "nft"
-    # },
-    # "everai" : {
-    #     "address": "0x02acee8c430f62333cf0e0e7a94b2347b5513b4c25f699461dd8d7b23c072478",
-    #     "type": "nft"
-    # }
-    #"lords": {
-    #    "address": "0x0124aeb495b947201f5fac96fd1138e326ad86195b98df6dec9009158a533b49",
-    #    "type": "token"
-    #}
-    }
+    parser = argparse.ArgumentParser(description="Scrape StarkScan holders of the registry collections")
+    parser.add_argument("collections", nargs="*", help="Collection names (default: the whole registry)")
+    parser.add_argument("--parallel", type=int, default=4, help="Collections scraped at once (0: legacy sync scraper)")
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args()
+    
+    # Collections come from the shared registry (collections.json)
+    COLLECTIONS = load_registry(names=args.collections)
     
-    scraper = StarkScanHoldersScraper(headless=False)
+    if args.parallel > 0:
+        scraper = AsyncStarkScanHoldersScraper(headless=args.headless, parallel=args.parallel)
+    else:
+        scraper = StarkScanHoldersScraper(headless=args.headless)
     
     holders = scraper.get_all_holders(
         collections=COLLECTIONS,
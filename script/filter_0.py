@@ -1,45 +1,108 @@
-import pandas as pd
+import argparse
+import os
 from pathlib import Path
 
-def remove_addresses(input_folder):
+import pandas as pd
+
+from exclusions import ExclusionList
+from parallel import map_files
+from snapshot_format import read_frame, snapshot_files, to_table, write_snapshot
+
+def filter_file(file, exclusions, keep_removed=False):
     """
-    Remove addresses that are exactly '0x0' and '0x1' from all CSVs in the folder
+    Remove excluded and malformed addresses from one snapshot file, in place
+    
+    Returns:
+    tuple: (original rows, rows kept, {reason: rows removed}, removed rows with
+    their reason when keep_removed, else None)
     """
+    # Read snapshot
+    df = read_frame(file)
+    
+    # Count original rows
+    original_count = len(df)
+    
+    # Reason of every row (NaN = kept): malformed, or the list its canonical address is on
+    reasons = exclusions.classify(df['address'])
+    removed = ~pd.isna(reasons)
+    reason_counts = {reason: int(count) for reason, count in pd.Series(reasons[removed]).value_counts().items() if count}
+    removed_rows = None
+    if keep_removed:
+        removed_rows = pd.DataFrame({
+            'file': file.name,
+            'address': df['address'][removed].to_numpy(),
+            'reason': reasons[removed].astype(str),
+        })
+    df = df[~removed]
+    
+    # Save back with original name and format
+    if file.suffix == '.parquet':
+        write_snapshot(to_table(df), file)
+    else:
+        df.to_csv(file, index=False)
+    return original_count, len(df), reason_counts, removed_rows
+
+def remove_addresses(
+    input_folder,
+    blocklists=(),
+    allowlists=(),
+    report_file=None,
+    bloom_error=0.01,
+    max_workers=None,
+    memory_budget=None,
+):
+    """
+    Remove the 0x0 and 0x1 addresses (in any padding), the addresses of the
+    blocklist files (minus the allowlists, see exclusions.py) and malformed
+    addresses from all snapshot files (Parquet or CSV) in the folder, one file
+    per worker process. `report_file` gets every removed row with its reason.
+    """
+    exclusions = ExclusionList.from_files(blocklists, allowlists, bloom_error=bloom_error)
     folder = Path(input_folder)
-    csv_files = list(folder.glob('*.csv'))
+    files = snapshot_files(folder)
     
-    if not csv_files:
-        print(f"No CSV files found in {input_folder}")
+    if not files:
+        print(f"No snapshot files found in {input_folder}")
         return
         
-    for file in csv_files:
-        try:
-            # Read CSV
-            df = pd.read_csv(file)
-            
-            # Count original rows
-            original_count = len(df)
-            
-            # Remove exact matches for '0x0' or '0x1'
-            df = df[~df['address'].isin(['0x0', '0x1'])]
-            
-            # Count removed rows
-            removed_count = original_count - len(df)
-            
-            # Save back to CSV with original name
-            df.to_csv(file, index=False)
-            
-            print(f"\nProcessed {file.name}")
-            print(f"Original rows: {original_count}")
-            print(f"Rows after removal: {len(df)}")
-            print(f"Removed {removed_count} addresses")
-            
-        except Exception as e:
-            print(f"Error processing {file.name}: {str(e)}")
+    report = map_files(
+        filter_file, files, exclusions, report_file is not None, max_workers=max_workers, memory_budget=memory_budget
+    )
+    for file, (original_count, kept_count, reason_counts, _) in report.results.items():
+        print(f"\nProcessed {file.name}")
+        print(f"Original rows: {original_count}")
+        print(f"Rows after removal: {kept_count}")
+        print(f"Removed {original_count - kept_count} addresses")
+        for reason, count in sorted(reason_counts.items(), key=lambda item: -item[1]):
+            print(f"- {reason}: {count}")
+    
+    if report_file is not None:
+        removed = [rows for *_, rows in report.results.values()]
+        removed = pd.concat(removed, ignore_index=True) if removed else pd.DataFrame(columns=['file', 'address', 'reason'])
+        tmp_file = Path(report_file).with_name(f".{Path(report_file).name}.tmp")
+        removed.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, report_file)
+        print(f"\n{len(removed)} removed rows written to {report_file}")
     
-    print(f"\nProcessed {len(csv_files)} files")
+    report.print_summary()
+    return report
 
 # Example usage
 if __name__ == "__main__":
-    input_folder = "./distribution/controllers/"  # Replace with your folder path
-    remove_addresses(input_folder)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Remove excluded and malformed addresses from snapshot files")
+    parser.add_argument("folder", nargs="?", default="./distribution/controllers/")
+    parser.add_argument("--blocklist", action="append", default=[], help="CSV/TXT/Parquet list of addresses to remove")
+    parser.add_argument("--allowlist", action="append", default=[], help="Addresses never removed")
+    parser.add_argument("--report", default=None, help="CSV of every removed row and its reason")
+    parser.add_argument("--no-bloom", action="store_true", help="Disable the Bloom prefilter")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    remove_addresses(
+        args.folder,
+        args.blocklist,
+        args.allowlist,
+        args.report,
+        bloom_error=None if args.no_bloom else 0.01,
+        max_workers=args.workers,
+    )
\ No newline at end of file
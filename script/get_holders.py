@@ -1,9 +1,20 @@
-from starknet_py.net.full_node_client import FullNodeClient
-from starknet_py.contract import Contract
+import argparse
 import asyncio
 import json
 import logging
-from typing import Set
+import os
+import time
+from collections import Counter
+from typing import List, Sequence, Tuple
+
+from clients import client_session, load_contract, make_client, make_rpc
+from holder_sink import (
+    OwnerSink, TokenIdSet, aggregate_holders, completed_ids, finish_scan, read_sink, resume_block
+)
+from metrics import REGISTRY, export_metrics, profiled, progress
+from rpc_engine import is_throttle_error
+from starknet_rpc import StarknetRpc, is_nonexistent_token, u256_calldata
+from transfer_events import get_token_owners
 
 # Configuration du logging
 logging.basicConfig(
@@ -13,80 +24,204 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-RPC_URL = "https://starknet-mainnet.public.blastapi.io/"
+RPC_URL = os.environ.get("RPC_URL", "https://starknet-mainnet.public.blastapi.io/")
 CONTRACT_ADDRESS = "0x07ae27a31bb6526e3de9cf02f081f6ce0615ac12a6d7b85ee58b8ad7947a2809"
+# "calls" (défaut) : un appel ownerOf par token. "events" (optionnel) : reconstruit les
+# propriétaires depuis les events Transfer, sans reprise sur crash ni suivi de progression
+SNAPSHOT_MODE = os.environ.get("SNAPSHOT_MODE", "calls")
+# Nombre d'ids par passe du scan (résultats écrits entre deux passes)
+SCAN_CHUNK_SIZE = 5000
 
-async def get_owner_of(contract: Contract, token_id: int) -> str | None:
+async def get_owners_of(
+    rpc: StarknetRpc, contract_address: str, token_ids: Sequence[int], block_id="latest"
+) -> List[str | None | Exception]:
     """
-    Essaie de récupérer le propriétaire d'un token
+    Essaie de récupérer le propriétaire de chaque token au bloc `block_id` (None seulement
+    si le contrat répond que le token n'existe pas, l'exception pour toute autre erreur)
     """
-    try:
-        result = await contract.functions["owner_of"].call(token_id)
-        return hex(result[0])
-    except Exception as e:
-        # logger.debug(f"Token {token_id} n'existe pas ou erreur: {str(e)}")
-        return None
+    results = await rpc.call_many(
+        contract_address, "owner_of", [u256_calldata(token_id) for token_id in token_ids], block_id
+    )
+    owners = []
+    for token_id, result in zip(token_ids, results):
+        if isinstance(result, Exception):
+            if is_nonexistent_token(result):
+                rpc.metrics.inc("token_errors_total", kind="missing")
+                owners.append(None)
+                continue
+            # Erreur du node (throttling, 5xx, erreur interne...) : le token n'est pas perdu,
+            # compté (et résumé périodiquement) plutôt que journalisé token par token
+            rpc.metrics.inc("token_errors_total", kind="throttled" if is_throttle_error(result) else "failed")
+            logger.debug("Token %s en échec: %s", token_id, result)
+            owners.append(result)
+        else:
+            owners.append(hex(int(result[0], 16)))
+    return owners
+
+async def has_live_token(
+    rpc: StarknetRpc, contract_address: str, start: int, width: int, block_id="latest"
+) -> bool:
+    """
+    Vrai si au moins un token existe dans [start, start + width) (une seule requête batch).
+    Une fenêtre sans token vivant mais avec des erreurs lève l'erreur plutôt que de
+    tronquer la plage d'ids.
+    """
+    owners = await get_owners_of(rpc, contract_address, range(start, start + width), block_id)
+    if any(isinstance(owner, str) for owner in owners):
+        return True
+    errors = [owner for owner in owners if isinstance(owner, Exception)]
+    if errors:
+        raise errors[0]
+    return False
+
+async def find_token_id_range(
+    rpc: StarknetRpc, contract_address: str, gap_tolerance: int = 64, block_id="latest"
+) -> int:
+    """
+    Trouve la borne supérieure (exclue) des ids de tokens par recherche exponentielle
+    puis dichotomique. Une fenêtre de `gap_tolerance` ids est sondée à chaque étape,
+    donc les trous plus courts que cette fenêtre ne coupent pas la recherche.
+    """
+    if not await has_live_token(rpc, contract_address, 0, gap_tolerance, block_id):
+        return 0
+
+    # Recherche exponentielle : lo est vivant, hi ne l'est pas
+    lo, hi = 0, gap_tolerance
+    while await has_live_token(rpc, contract_address, hi, gap_tolerance, block_id):
+        lo, hi = hi, hi * 2
+
+    # Recherche dichotomique entre lo et hi
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if await has_live_token(rpc, contract_address, mid, gap_tolerance, block_id):
+            lo = mid
+        else:
+            hi = mid
+
+    return lo + gap_tolerance
+
+def find_gaps(live: TokenIdSet, end: int) -> List[Tuple[int, int]]:
+    """
+    Retourne les plages [début, fin] d'ids sans propriétaire dans [0, end)
+    """
+    gaps = []
+    gap_start = None
+    for token_id in range(end):
+        if token_id not in live:
+            if gap_start is None:
+                gap_start = token_id
+        elif gap_start is not None:
+            gaps.append((gap_start, token_id - 1))
+            gap_start = None
+    if gap_start is not None:
+        gaps.append((gap_start, end - 1))
+    return gaps
 
-async def get_nft_holders(contract: Contract) -> Set[str]:
+async def get_nft_holders(
+    rpc: StarknetRpc,
+    contract_address: str,
+    gap_tolerance: int = 64,
+    sink_path: str | None = None,
+    block: int | None = None,
+    fresh: bool = False,
+) -> Counter:
     """
-    Récupère tous les holders uniques de la collection NFT
+    Récupère tous les holders de la collection NFT avec leur nombre de tokens, au bloc
+    `block` (par défaut la tête de chaîne). Chaque résultat est écrit dans un fichier
+    NDJSON dès réception : après un crash, un scan inachevé reprend au même bloc après
+    les ids déjà écrits. Un scan terminé n'est jamais repris (fichier renommé en
+    .done.ndjson), `fresh` ignore le fichier existant.
     """
-    holders = set()
-    consecutive_failures = 0
-    max_consecutive_failures = 100  # Arrête après 100 échecs consécutifs
-    batch_size = 10
-    current_token_id = 0
+    sink_path = sink_path or f"owners_{contract_address}.ndjson"
     
     try:
-        while consecutive_failures < max_consecutive_failures:
-            tasks = []
-            
-            # Créer un batch de requêtes
-            for i in range(batch_size):
-                token_id = current_token_id + i
-                tasks.append(get_owner_of(contract, token_id))
-            
-            # Exécuter le batch
-            results = await asyncio.gather(*tasks)
-            
-            # Traiter les résultats
-            found_valid_token = False
-            for i, owner in enumerate(results):
-                if owner is not None:
-                    found_valid_token = True
-                    consecutive_failures = 0
-                    holders.add(owner)
-                    logger.info(f"Token {current_token_id + i} appartient à {owner}")
-            
-            if not found_valid_token:
-                consecutive_failures += 1
-                logger.info(f"Aucun token valide trouvé dans la plage {current_token_id}-{current_token_id + batch_size - 1}")
-            
-            current_token_id += batch_size
-            
-            # Petit délai entre les batches
-            await asyncio.sleep(0.5)
-            
-            # Log de progression
-            if len(holders) > 0 and current_token_id % 50 == 0:
-                logger.info(f"Progression: {len(holders)} holders uniques trouvés jusqu'à présent")
-
-        logger.info(f"Recherche terminée après avoir vérifié jusqu'au token {current_token_id}")
+        # Reprise uniquement d'un scan inachevé du même bloc, sinon nouveau scan épinglé à la tête
+        scan_block = resume_block(sink_path, block, fresh)
+        if scan_block is not None:
+            logger.info(f"Reprise du scan inachevé au bloc {scan_block} ({sink_path})")
+        else:
+            scan_block = block if block is not None else await rpc.block_number()
+            logger.info(f"Nouveau scan au bloc {scan_block}")
+        block_id = {"block_number": scan_block}
+
+        # Découverte de la plage d'ids, puis scan concurrent de cette plage uniquement
+        end = await find_token_id_range(rpc, contract_address, gap_tolerance, block_id)
+        logger.info(f"Plage d'ids découverte: {end} ids à scanner, {rpc.http_requests} requêtes HTTP")
+
+        done = completed_ids(sink_path)
+        failed = 0
+        # Un résumé périodique (débit, latences, erreurs) plutôt qu'une ligne par passe
+        with OwnerSink(sink_path, scan_block) as sink:
+            async with progress(rpc.metrics, total=end):
+                for chunk_start in range(0, end, SCAN_CHUNK_SIZE):
+                    token_ids = [
+                        token_id for token_id in range(chunk_start, min(end, chunk_start + SCAN_CHUNK_SIZE))
+                        if token_id not in done
+                    ]
+                    if not token_ids:
+                        continue
+                    owners = await get_owners_of(rpc, contract_address, token_ids, block_id)
+                    for token_id, owner in zip(token_ids, owners):
+                        # Les échecs ne sont pas écrits : ils seront retentés au prochain lancement
+                        if isinstance(owner, Exception):
+                            failed += 1
+                        else:
+                            sink.write(token_id, owner)
+                    rpc.metrics.inc("tokens_processed_total", len(token_ids))
+            if not failed:
+                sink.complete()
+
+        # Agrégats calculés depuis le flux, la fin de la fenêtre de sondage n'est pas un trou
+        live = TokenIdSet()
+        last_live = -1
+        for token_id, owner in read_sink(sink_path):
+            if owner is not None:
+                live.add(token_id)
+                last_live = max(last_live, token_id)
+        end = last_live + 1
+        holders = aggregate_holders(sink_path)
+
+        # Les trous proches de la tolérance peuvent cacher des tokens au-delà de la borne
+        gaps = find_gaps(live, end)
+        for gap_start, gap_end in gaps:
+            if gap_end - gap_start + 1 >= gap_tolerance // 2:
+                logger.warning(
+                    f"Trou de {gap_end - gap_start + 1} ids ({gap_start}-{gap_end}), "
+                    f"augmenter gap_tolerance ({gap_tolerance}) si des tokens manquent"
+                )
+        missing = sum(gap_end - gap_start + 1 for gap_start, gap_end in gaps)
+        logger.info(
+            f"Recherche terminée: {end - missing} tokens vivants sur {end} ids, "
+            f"{len(gaps)} trous, {rpc.http_requests} requêtes HTTP"
+        )
+        if failed:
+            logger.warning(f"{failed} tokens en échec : relancer pour reprendre le scan au bloc {scan_block}")
+        else:
+            logger.info(f"Scan complet au bloc {scan_block}, flux archivé dans {finish_scan(sink_path)}")
         return holders
 
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des holders: {str(e)}")
-        return holders
+        return aggregate_holders(sink_path)
+
+async def get_nft_holders_from_events(rpc: StarknetRpc, contract_address: str) -> Counter:
+    """
+    Récupère les holders en rejouant les events Transfer (coût proportionnel au nombre de transferts)
+    """
+    owners = await get_token_owners(rpc, contract_address)
+    logger.info(f"{len(owners)} tokens reconstruits depuis les events en {rpc.http_requests} requêtes HTTP")
+    return Counter(owners.values())
 
-async def save_holders(holders: Set[str], contract_address: str):
+async def save_holders(holders: Counter, contract_address: str):
     """
-    Sauvegarde les holders dans un fichier JSON
+    Sauvegarde les holders (et leur nombre de tokens) dans un fichier JSON
     """
     output_file = 'nft_holders.json'
     data = {
         "contract_address": contract_address,
         "holders": list(holders),
-        "total_holders": len(holders)
+        "total_holders": len(holders),
+        "quantities": dict(holders)
     }
     
     with open(output_file, 'w') as f:
@@ -95,27 +230,31 @@ async def save_holders(holders: Set[str], contract_address: str):
     logger.info(f"Données sauvegardées dans {output_file}")
     logger.info(f"Nombre total de holders uniques: {len(holders)}")
 
-async def main():
+async def main(block: int | None = None, fresh: bool = False):
     try:
-        # Initialiser le client
-        client = FullNodeClient(node_url=RPC_URL)
-        logger.info("Client initialisé")
-
-        # Initialiser le contrat
-        contract = await Contract.from_address(
-            address=CONTRACT_ADDRESS,
-            provider=client
-        )
-        logger.info("Contrat initialisé")
+        start = time.perf_counter()
+        # Une seule session keep-alive pour le client starknet_py et les appels batch
+        async with client_session() as session:
+            # Initialiser le client
+            client = make_client(RPC_URL, session)
+            logger.info("Client initialisé")
 
-        # Afficher les fonctions disponibles
-        logger.info("Fonctions disponibles dans le contrat:")
-        for func in contract.data.abi:
-            if func.get('type') == 'function':
-                logger.info(f"- {func.get('name')}")
+            # Initialiser le contrat (ABI en cache après le premier lancement)
+            contract = await load_contract(client, CONTRACT_ADDRESS)
+            logger.info(f"Contrat initialisé en {time.perf_counter() - start:.3f}s")
 
-        # Récupérer les holders
-        holders = await get_nft_holders(contract)
+            # Afficher les fonctions disponibles
+            logger.debug("Fonctions disponibles dans le contrat:")
+            for func in contract.data.abi:
+                if func.get('type') == 'function':
+                    logger.debug(f"- {func.get('name')}")
+
+            # Récupérer les holders
+            rpc = make_rpc(RPC_URL, session)
+            if SNAPSHOT_MODE == "events":
+                holders = await get_nft_holders_from_events(rpc, CONTRACT_ADDRESS)
+            else:
+                holders = await get_nft_holders(rpc, CONTRACT_ADDRESS, block=block, fresh=fresh)
         
         if holders:
             # Sauvegarder les résultats
@@ -127,4 +266,12 @@ async def main():
         logger.error(f"Erreur dans la fonction principale: {str(e)}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Snapshot des holders de la collection NFT")
+    parser.add_argument("--block", type=int, default=None, help="Bloc du snapshot (défaut : tête de chaîne)")
+    parser.add_argument("--fresh", action="store_true", help="Ignorer un scan inachevé et repartir de zéro")
+    args = parser.parse_args()
+
+    # PROFILE=cprofile|pyinstrument pour profiler, METRICS_FILE=holders.prom|.json pour exporter les métriques
+    with profiled():
+        asyncio.run(main(args.block, args.fresh))
+    export_metrics(REGISTRY, os.environ.get("METRICS_FILE"))
\ No newline at end of file
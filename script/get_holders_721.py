@@ -2,10 +2,21 @@ from starknet_py.net.account.account import Account
 from starknet_py.net.full_node_client import FullNodeClient
 from starknet_py.net.models import StarknetChainId
 from starknet_py.contract import Contract
+import argparse
 import asyncio
 import json
 import logging
-from typing import List, Set
+import os
+import time
+from collections import Counter
+from typing import List
+
+from clients import client_session, load_contract, make_client, make_rpc
+from holder_sink import OwnerSink, aggregate_holders, completed_ids, finish_scan, resume_block
+from metrics import REGISTRY, export_metrics, profiled, progress
+from rpc_engine import is_throttle_error
+from starknet_rpc import StarknetRpc, is_nonexistent_token, u256_calldata
+from transfer_events import get_token_owners
 
 # Configuration du logging
 logging.basicConfig(
@@ -15,98 +26,125 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-RPC_URL = "https://starknet-mainnet.public.blastapi.io/" 
+RPC_URL = os.environ.get("RPC_URL", "https://starknet-mainnet.public.blastapi.io/")
 CONTRACT_ADDRESS = "0x07ae27a31bb6526e3de9cf02f081f6ce0615ac12a6d7b85ee58b8ad7947a2809"
+# "calls" (défaut) : un appel ownerOf par token. "events" (optionnel) : reconstruit les
+# propriétaires depuis les events Transfer, sans reprise sur crash ni suivi de progression
+SNAPSHOT_MODE = os.environ.get("SNAPSHOT_MODE", "calls")
+# Nombre d'ids par passe du scan (résultats écrits entre deux passes)
+SCAN_CHUNK_SIZE = 5000
 
 async def get_contract(client: FullNodeClient, contract_address: str) -> Contract:
     """
-    Initialise le contrat avec l'ABI ERC721 minimal nécessaire
+    Initialise le contrat (ABI récupérée une fois puis servie par le cache disque)
     """
-    # ABI minimal pour les fonctions ERC721 nécessaires
-    minimal_abi = [
-        {
-            "name": "balanceOf",
-            "type": "function",
-            "inputs": [{"name": "owner", "type": "felt"}],
-            "outputs": [{"name": "balance", "type": "Uint256"}],
-        },
-        {
-            "name": "totalSupply",
-            "type": "function",
-            "inputs": [],
-            "outputs": [{"name": "totalSupply", "type": "Uint256"}],
-        },
-        {
-            "name": "ownerOf",
-            "type": "function",
-            "inputs": [{"name": "tokenId", "type": "Uint256"}],
-            "outputs": [{"name": "owner", "type": "felt"}],
-        }
-    ]
-
-    contract = await Contract.from_address(
-        address=contract_address,
-        provider=client,
-    )
-
-    return contract
-
-async def get_nft_holders(client: FullNodeClient, contract: Contract) -> Set[str]:
+    return await load_contract(client, contract_address)
+
+async def get_nft_holders(
+    rpc: StarknetRpc,
+    contract: Contract,
+    sink_path: str | None = None,
+    block: int | None = None,
+    fresh: bool = False,
+) -> Counter:
     """
-    Récupère tous les holders uniques de la collection NFT
+    Récupère tous les holders de la collection NFT avec leur nombre de tokens, au bloc
+    `block` (par défaut la tête de chaîne). Chaque résultat est écrit dans un fichier
+    NDJSON dès réception : après un crash, un scan inachevé reprend au même bloc après
+    les ids déjà écrits. Un scan terminé n'est jamais repris (fichier renommé en
+    .done.ndjson), `fresh` ignore le fichier existant.
     """
-    holders = set()
+    contract_address = hex(contract.address)
+    sink_path = sink_path or f"owners_{contract_address}.ndjson"
     
     try:
+        # Reprise uniquement d'un scan inachevé du même bloc, sinon nouveau scan épinglé à la tête
+        scan_block = resume_block(sink_path, block, fresh)
+        if scan_block is not None:
+            logger.info(f"Reprise du scan inachevé au bloc {scan_block} ({sink_path})")
+        else:
+            scan_block = block if block is not None else await rpc.block_number()
+            logger.info(f"Nouveau scan au bloc {scan_block}")
+
         # Récupérer le total supply
-        total_supply_call = await contract.functions["totalSupply"].call()
+        total_supply_call = await contract.functions["totalSupply"].call(block_number=scan_block)
         total_supply = total_supply_call[0]  # Modification ici pour accéder au résultat
         logger.info(f"Total supply: {total_supply}")
 
-        # Traitement par lots de 10 tokens
-        batch_size = 10
-        for i in range(0, total_supply, batch_size):
-            batch_end = min(i + batch_size, total_supply)
-            tasks = []
-            
-            # Créer les tâches pour le batch
-            for token_id in range(i, batch_end):
-                tasks.append(contract.functions["ownerOf"].call(token_id))
-            
-            # Exécuter les tâches en parallèle
-            try:
-                responses = await asyncio.gather(*tasks, return_exceptions=True)
-                for j, response in enumerate(responses):
-                    if not isinstance(response, Exception):
-                        owner_address = hex(response[0])  # Modification ici pour accéder au résultat
-                        holders.add(owner_address)
-                    else:
-                        logger.warning(f"Erreur pour le token {i+j}: {str(response)}")
-                
-                logger.info(f"Processed tokens {i} to {batch_end-1} / {total_supply}")
-                
-                # Petit délai entre les batches pour éviter la surcharge
-                await asyncio.sleep(0.5)
-                
-            except Exception as e:
-                logger.error(f"Erreur lors du traitement du batch {i}-{batch_end}: {str(e)}")
-                continue
+        done = completed_ids(sink_path)
+        failed = 0
+        # Un résumé périodique (débit, latences, erreurs) plutôt qu'une ligne par token
+        with OwnerSink(sink_path, scan_block) as sink:
+            async with progress(rpc.metrics, total=total_supply):
+                for chunk_start in range(0, total_supply, SCAN_CHUNK_SIZE):
+                    token_ids = [
+                        token_id for token_id in range(chunk_start, min(total_supply, chunk_start + SCAN_CHUNK_SIZE))
+                        if token_id not in done
+                    ]
+                    if not token_ids:
+                        continue
+
+                    # Appels ownerOf regroupés en batchs JSON-RPC, envoyés via le moteur partagé
+                    responses = await rpc.call_many(
+                        contract_address,
+                        "ownerOf",
+                        [u256_calldata(token_id) for token_id in token_ids],
+                        {"block_number": scan_block},
+                    )
+                    for token_id, response in zip(token_ids, responses):
+                        if not isinstance(response, Exception):
+                            sink.write(token_id, hex(int(response[0], 16)))
+                            continue
+                        # Token inexistant (revert du contrat) : noté comme vérifié. Toute autre
+                        # erreur (throttling, 5xx...) n'est pas écrite et sera retentée au prochain lancement
+                        logger.debug("Erreur pour le token %s: %s", token_id, response)
+                        if is_nonexistent_token(response):
+                            rpc.metrics.inc("token_errors_total", kind="missing")
+                            sink.write(token_id, None)
+                        else:
+                            kind = "throttled" if is_throttle_error(response) else "failed"
+                            rpc.metrics.inc("token_errors_total", kind=kind)
+                            failed += 1
+                    rpc.metrics.inc("tokens_processed_total", len(token_ids))
+            if not failed:
+                sink.complete()
+
+        engine = rpc.engine
+        logger.info(
+            f"Processed {total_supply} tokens en {rpc.http_requests} requêtes HTTP "
+            f"({engine.retries} retries, fenêtre finale {engine.window.size})"
+        )
 
+        # Agrégat holder -> quantité calculé depuis le flux
+        holders = aggregate_holders(sink_path)
+        if failed:
+            logger.warning(f"{failed} tokens en échec : relancer pour reprendre le scan au bloc {scan_block}")
+        else:
+            logger.info(f"Scan complet au bloc {scan_block}, flux archivé dans {finish_scan(sink_path)}")
         return holders
 
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des holders: {str(e)}")
-        return set()
+        return aggregate_holders(sink_path)
 
-async def save_holders(holders: Set[str], contract_address: str):
+async def get_nft_holders_from_events(rpc: StarknetRpc, contract_address: str) -> Counter:
+    """
+    Récupère les holders en rejouant les events Transfer (coût proportionnel au nombre de transferts)
     """
-    Sauvegarde les holders dans un fichier JSON
+    owners = await get_token_owners(rpc, contract_address)
+    logger.info(f"{len(owners)} tokens reconstruits depuis les events en {rpc.http_requests} requêtes HTTP")
+    return Counter(owners.values())
+
+async def save_holders(holders: Counter, contract_address: str):
+    """
+    Sauvegarde les holders (et leur nombre de tokens) dans un fichier JSON
     """
     output_file = 'nft_holders.json'
     data = {
         "contract_address": contract_address,
         "holders": list(holders),
-        "total_holders": len(holders)
+        "total_holders": len(holders),
+        "quantities": dict(holders)
     }
     
     with open(output_file, 'w') as f:
@@ -115,18 +153,25 @@ async def save_holders(holders: Set[str], contract_address: str):
     logger.info(f"Données sauvegardées dans {output_file}")
     logger.info(f"Nombre total de holders uniques: {len(holders)}")
 
-async def main():
+async def main(block: int | None = None, fresh: bool = False):
     try:
-        # Initialiser le client
-        client = FullNodeClient(node_url=RPC_URL)
-        logger.info("Client initialisé")
+        start = time.perf_counter()
+        # Une seule session keep-alive pour le client starknet_py et les appels batch
+        async with client_session() as session:
+            # Initialiser le client
+            client = make_client(RPC_URL, session)
+            logger.info("Client initialisé")
 
-        # Initialiser le contrat
-        contract = await get_contract(client, CONTRACT_ADDRESS)
-        logger.info("Contrat initialisé")
+            # Initialiser le contrat
+            contract = await get_contract(client, CONTRACT_ADDRESS)
+            logger.info(f"Contrat initialisé en {time.perf_counter() - start:.3f}s")
 
-        # Récupérer les holders
-        holders = await get_nft_holders(client, contract)
+            # Récupérer les holders
+            rpc = make_rpc(RPC_URL, session)
+            if SNAPSHOT_MODE == "events":
+                holders = await get_nft_holders_from_events(rpc, CONTRACT_ADDRESS)
+            else:
+                holders = await get_nft_holders(rpc, contract, block=block, fresh=fresh)
         
         if holders:
             # Sauvegarder les résultats
@@ -138,4 +183,12 @@ async def main():
         logger.error(f"Erreur dans la fonction principale: {str(e)}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Snapshot des holders de la collection NFT")
+    parser.add_argument("--block", type=int, default=None, help="Bloc du snapshot (défaut : tête de chaîne)")
+    parser.add_argument("--fresh", action="store_true", help="Ignorer un scan inachevé et repartir de zéro")
+    args = parser.parse_args()
+
+    # PROFILE=cprofile|pyinstrument pour profiler, METRICS_FILE=holders.prom|.json pour exporter les métriques
+    with profiled():
+        asyncio.run(main(args.block, args.fresh))
+    export_metrics(REGISTRY, os.environ.get("METRICS_FILE"))
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import os
+import time
+from collections import Counter
+from typing import Iterator, Optional, Tuple
+
+
+class OwnerSink:
+    """
+    Append-only NDJSON log of fetched `token_id -> owner` results.
+
+    Every record is written as soon as it arrives and the file is fsynced at most
+    every `fsync_interval` seconds, so a crash loses at most that window. A null
+    owner records a token id that was checked and does not exist.
+
+    A new sink starts with a header recording the block the scan is pinned to,
+    and complete() appends a marker once every id was checked, so a sink is only
+    ever resumed by an unfinished scan of the same block (see resume_block).
+    """
+
+    def __init__(self, path: str, block: Optional[int] = None, fsync_interval: float = 2.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._truncate_partial_line()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._last_sync = time.monotonic()
+        self.written = 0
+        if new and block is not None:
+            self._file.write(json.dumps({"scan_block": block, "started_at": int(time.time())}) + "\n")
+            self.sync()
+
+    def _truncate_partial_line(self):
+        """Drop a record cut in half by a crash so appends start on a fresh line"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Walk back to the last complete line
+            position = size - 1
+            while position > 0:
+                step = min(4096, position)
+                f.seek(position - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    f.truncate(position - step + newline + 1)
+                    return
+                position -= step
+            f.truncate(0)
+
+    def write(self, token_id: int, owner: Optional[str]):
+        self._file.write(json.dumps({"token_id": token_id, "owner": owner}) + "\n")
+        self.written += 1
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def complete(self):
+        """Marks the scan as finished: the sink will not be resumed any more"""
+        self._file.write(json.dumps({"complete": True, "finished_at": int(time.time())}) + "\n")
+        self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "OwnerSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _records(path: str) -> Iterator[dict]:
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def read_sink(path: str) -> Iterator[Tuple[int, Optional[str]]]:
+    """Streams (token_id, owner) records, skipping the header, marker and a truncated trailing line"""
+    for record in _records(path):
+        if "token_id" in record:
+            yield record["token_id"], record["owner"]
+
+
+def sink_status(path: str) -> Tuple[Optional[int], bool]:
+    """(block the scan was pinned to or None, whether it completed)"""
+    block, complete = None, False
+    for record in _records(path):
+        if "scan_block" in record:
+            block = record["scan_block"]
+        elif record.get("complete"):
+            complete = True
+    return block, complete
+
+
+def resume_block(path: str, block: Optional[int] = None, fresh: bool = False) -> Optional[int]:
+    """
+    Block of an unfinished scan to resume from the sink at `path`, or None to
+    start a new scan. A sink that completed, records no block, is pinned to
+    another block than the requested `block`, or any sink when `fresh`, is
+    deleted first, so its results are never reused.
+    """
+    if not os.path.exists(path):
+        return None
+    sink_block, complete = sink_status(path)
+    if fresh or complete or sink_block is None or (block is not None and block != sink_block):
+        os.remove(path)
+        return None
+    return sink_block
+
+
+def finish_scan(path: str) -> str:
+    """Rotates a completed sink to <name>.done.ndjson (the previous one is replaced)"""
+    done_path = f"{os.path.splitext(path)[0]}.done.ndjson"
+    os.replace(path, done_path)
+    return done_path
+
+
+class TokenIdSet:
+    """Bitmap of token ids (one bit per id) used to resume a scan in constant-ish memory"""
+
+    def __init__(self):
+        self._bits = bytearray()
+
+    def add(self, token_id: int):
+        byte = token_id >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte - len(self._bits) + 1))
+        self._bits[byte] |= 1 << (token_id & 7)
+
+    def __contains__(self, token_id: int) -> bool:
+        byte = token_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (token_id & 7)))
+
+
+def completed_ids(path: str) -> TokenIdSet:
+    """Token ids already present in the sink, to be skipped on restart"""
+    done = TokenIdSet()
+    for token_id, _ in read_sink(path):
+        done.add(token_id)
+    return done
+
+
+def aggregate_holders(path: str) -> Counter:
+    """Owner -> number of tokens held, computed by streaming the sink"""
+    quantities = Counter()
+    for _, owner in read_sink(path):
+        if owner is not None:
+            quantities[owner] += 1
+    return quantities
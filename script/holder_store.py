@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import os
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+
+from rpc_engine import RequestEngine
+from starknet_rpc import StarknetRpc
+from transfer_events import Transfer, fetch_transfers, fold_balances, fold_owners
+
+# Blocks below the head that are considered final
+CONFIRMATIONS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    contract TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    from_address TEXT NOT NULL,
+    to_address TEXT NOT NULL,
+    value TEXT NOT NULL,
+    transaction_hash TEXT NOT NULL,
+    PRIMARY KEY (contract, seq)
+);
+CREATE INDEX IF NOT EXISTS transfers_by_block ON transfers (contract, block_number);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    contract TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+"""
+
+
+class HolderStore:
+    """
+    On-disk (SQLite) log of every Transfer of the tracked contracts, keyed by block.
+
+    A refresh only fetches blocks after the contract's checkpoint, and holders or
+    balances as of any stored block are answered locally. Amounts and token ids are
+    u256, so they are stored as hex text and summed in Python.
+    """
+
+    def __init__(self, path: str = "holders.db"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def checkpoint(self, contract: str) -> Optional[int]:
+        row = self.db.execute(
+            "SELECT block_number FROM checkpoints WHERE contract = ?", (contract,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def kind(self, contract: str) -> Optional[str]:
+        row = self.db.execute("SELECT kind FROM checkpoints WHERE contract = ?", (contract,)).fetchone()
+        return row[0] if row else None
+
+    def append(self, contract: str, kind: str, transfers: list, to_block: int):
+        """Appends transfers (in chain order) and moves the checkpoint in one transaction"""
+        next_seq = self.db.execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM transfers WHERE contract = ?", (contract,)
+        ).fetchone()[0]
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO transfers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (contract, next_seq + i, t.block_number, t.from_address, t.to_address,
+                     hex(t.value), t.transaction_hash)
+                    for i, t in enumerate(transfers)
+                ),
+            )
+            self.db.execute(
+                "INSERT INTO checkpoints VALUES (?, ?, ?) "
+                "ON CONFLICT(contract) DO UPDATE SET block_number = excluded.block_number",
+                (contract, kind, to_block),
+            )
+
+    async def refresh(
+        self,
+        rpc: StarknetRpc,
+        contract: str,
+        kind: str = "nft",
+        start_block: int = 0,
+        confirmations: int = CONFIRMATIONS,
+        to_block: Optional[int] = None,
+    ) -> int:
+        """
+        Fetches the Transfer events emitted since the last checkpoint up to
+        `to_block` (default: the head), never closer than `confirmations` blocks
+        to the head so stored history is not reorged.
+        Returns the number of new transfers.
+        """
+        contract = hex(int(contract, 16))
+        checkpoint = self.checkpoint(contract)
+        from_block = start_block if checkpoint is None else checkpoint + 1
+        safe_block = await rpc.block_number() - confirmations
+        to_block = safe_block if to_block is None else min(to_block, safe_block)
+        if to_block < from_block:
+            return 0
+
+        transfers = await fetch_transfers(rpc, contract, from_block, to_block)
+        self.append(contract, kind, transfers, to_block)
+        return len(transfers)
+
+    def _transfers(self, contract: str, block: Optional[int]):
+        query = "SELECT block_number, from_address, to_address, value, transaction_hash FROM transfers WHERE contract = ?"
+        params = [contract]
+        if block is not None:
+            query += " AND block_number <= ?"
+            params.append(block)
+        for block_number, sender, receiver, value, tx_hash in self.db.execute(query + " ORDER BY seq", params):
+            yield Transfer(block_number, sender, receiver, int(value, 16), tx_hash)
+
+    def owners_at(self, contract: str, block: Optional[int] = None) -> Dict[int, str]:
+        """Token id -> owner of an ERC721 as of `block` (latest stored block when None)"""
+        return fold_owners(self._transfers(hex(int(contract, 16)), block))
+
+    def balances_at(self, contract: str, block: Optional[int] = None) -> Dict[str, int]:
+        """Address -> balance (base units) of an ERC20 as of `block`, zero balances dropped"""
+        return fold_balances(self._transfers(hex(int(contract, 16)), block))
+
+    def holders_at(self, contract: str, block: Optional[int] = None) -> Dict[str, int]:
+        """Address -> quantity held: number of tokens for an NFT, balance for an ERC20"""
+        contract = hex(int(contract, 16))
+        if self.kind(contract) == "token":
+            return self.balances_at(contract, block)
+        return dict(Counter(self.owners_at(contract, block).values()))
+
+    def export_csv(self, contract: str, collection: str, filename: str, block: Optional[int] = None):
+        """Writes a snapshot in the same address,quantity,collection,expiration_timestamp shape as the scrapers"""
+        future_timestamp = int((datetime.now() + timedelta(days=10)).timestamp())
+        holders = self.holders_at(contract, block)
+        df = pd.DataFrame({
+            'address': list(holders.keys()),
+            'quantity': [str(quantity) for quantity in holders.values()],
+            'collection': collection,
+            'expiration_timestamp': future_timestamp
+        })
+        df.to_csv(filename, index=False)
+        print(f"Exported {len(df)} holders of {collection} to {filename}")
+
+
+async def refresh(store: HolderStore, url: str, contract: str, kind: str, start_block: int):
+    async with StarknetRpc(url, engine=RequestEngine()) as rpc:
+        added = await store.refresh(rpc, contract, kind, start_block)
+    print(f"{contract}: {added} new transfers, checkpoint at block {store.checkpoint(hex(int(contract, 16)))}")
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Block-indexed holder store")
+    parser.add_argument("--db", default="holders.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = commands.add_parser("refresh", help="Fetch transfers since the last checkpoint")
+    refresh_parser.add_argument("address")
+    refresh_parser.add_argument("--kind", choices=["nft", "token"], default="nft")
+    refresh_parser.add_argument("--start-block", type=int, default=0)
+    refresh_parser.add_argument("--rpc-url", default=os.environ.get("RPC_URL", "https://starknet-mainnet.public.blastapi.io/"))
+
+    snapshot_parser = commands.add_parser("snapshot", help="Export holders as of a block, without network access")
+    snapshot_parser.add_argument("address")
+    snapshot_parser.add_argument("collection")
+    snapshot_parser.add_argument("--block", type=int, default=None)
+    snapshot_parser.add_argument("--output", default=None)
+
+    args = parser.parse_args()
+    store = HolderStore(args.db)
+    try:
+        if args.command == "refresh":
+            asyncio.run(refresh(store, args.rpc_url, args.address, args.kind, args.start_block))
+        else:
+            store.export_csv(args.address, args.collection, args.output or f"{args.collection}.csv", args.block)
+    finally:
+        store.close()
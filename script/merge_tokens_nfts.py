@@ -1,15 +1,86 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
-def merge_csvs(input_folder):
+from address import factorize_addresses, format_addresses, parse_addresses
+from allocation import allocate
+from snapshot_format import read_frame, snapshot_files
+
+AGGREGATES = ('sum', 'max', 'capped-sum')
+
+def aggregate_recipients(df, aggregate='sum', cap=None, budget=None, min_quantity=1):
+    """
+    Collapse rows to one row per canonical address in one vectorized group-by.
+
+    Args:
+    df (DataFrame): address, quantity (integers), collection, expiration_timestamp rows
+    aggregate (str): 'sum', 'max' or 'capped-sum' (sum limited to `cap`) across collections
+    cap (int): Per-address maximum (required for 'capped-sum', also enforced under a budget)
+    budget (int): Global total; when exceeded, quantities are scaled down exactly with
+        largest-remainder apportionment, keeping at least `min_quantity` each
+
+    Returns:
+    DataFrame: address, quantity, collection ('merged'), expiration_timestamp (earliest)
+    and collections (';'-joined provenance, commas would break the upload parser)
+    """
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate {aggregate!r} (expected one of {AGGREGATES})")
+    if aggregate == 'capped-sum' and cap is None:
+        raise ValueError("capped-sum needs a cap")
+
+    addresses, codes = factorize_addresses(parse_addresses(df['address']))
+    recipients = len(addresses)
+    quantities = df['quantity'].to_numpy(dtype=np.int64)
+
+    # Integer accumulation: bincount weights are float64, inexact above 2**53
+    totals = np.zeros(recipients, dtype=np.int64)
+    if aggregate == 'max':
+        np.maximum.at(totals, codes, quantities)
+    else:
+        np.add.at(totals, codes, quantities)
+    if cap is not None:
+        totals = np.minimum(totals, cap)
+
+    if budget is not None and totals.sum() > budget:
+        totals = allocate(totals, budget, min_quantity, cap)
+
+    expirations = np.full(recipients, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(expirations, codes, df['expiration_timestamp'].to_numpy(dtype=np.int64))
+
+    # Provenance: one bit per collection, then one label per distinct bitmask
+    collection_codes, collection_names = pd.factorize(df['collection'].astype(str), sort=True)
+    masks = np.zeros((recipients, max(1, (len(collection_names) + 63) // 64)), dtype=np.uint64)
+    np.bitwise_or.at(
+        masks,
+        (codes, collection_codes >> 6),
+        np.left_shift(np.uint64(1), (collection_codes & 63).astype(np.uint64)),
+    )
+    combos, combo_ids = np.unique(masks, axis=0, return_inverse=True)
+    bits = np.arange(len(collection_names))
+    members = (combos[:, bits >> 6] >> (bits & 63).astype(np.uint64)) & np.uint64(1)
+    labels = np.array([';'.join(collection_names[row.astype(bool)]) for row in members], dtype=object)
+
+    return pd.DataFrame({
+        'address': format_addresses(addresses),
+        'quantity': totals,
+        'collection': 'merged',
+        'expiration_timestamp': expirations,
+        'collections': labels[combo_ids.reshape(-1)],
+    })
+
+def merge_csvs(input_folder, aggregate=None, cap=None, budget=None, quantity=2):
     """
     Merge multiple CSVs and standardize the format:
     - Set quantity to 2
     - Keep original collection
     - Set fixed expiration timestamp
+    
+    With `aggregate` ('sum', 'max' or 'capped-sum'), the rows are collapsed to
+    one row per recipient instead (see aggregate_recipients), so an address that
+    holds several collections gets a single add_free_mint entry.
     """
-    # Get all CSV files in the folder
-    csv_files = list(Path(input_folder).glob('*.csv'))
+    # Get all snapshot files (Parquet or CSV) in the folder
+    csv_files = snapshot_files(input_folder)
     
     if not csv_files:
         print(f"No CSV files found in {input_folder}")
@@ -21,12 +92,12 @@ def merge_csvs(input_folder):
     for file in csv_files:
         try:
             # Read CSV
-            df = pd.read_csv(file)
+            df = read_frame(file, ['address', 'collection'])
             
             # Standardize the dataframe
             new_df = pd.DataFrame({
                 'address': df['address'],
-                'quantity': 2,  # Fixed quantity
+                'quantity': quantity,  # Fixed quantity
                 'collection': df['collection'],  # Keep original collection
                 'expiration_timestamp': 1733656248  # Fixed timestamp
             })
@@ -41,12 +112,23 @@ def merge_csvs(input_folder):
         # Concatenate all dataframes
         final_df = pd.concat(all_dfs, ignore_index=True)
         
+        if aggregate is not None:
+            rows = len(final_df)
+            final_df = aggregate_recipients(final_df, aggregate, cap, budget)
+            print(f"\nAggregated {rows} rows into {len(final_df)} recipients ({aggregate})")
+            print(f"Total quantity: {final_df['quantity'].sum()}")
+        
         # Save merged result
         output_filename = 'merged_distribution.csv'
         final_df.to_csv(output_filename, index=False)
         
         print(f"\nCreated {output_filename}")
         print(f"Total addresses processed: {len(final_df)}")
+        if aggregate is not None:
+            print("\nRecipients by collection combination:")
+            for combination, count in final_df['collections'].value_counts().items():
+                print(f"- {combination}: {count} addresses")
+            return
         print("\nUnique collections:")
         for collection in final_df['collection'].unique():
             count = len(final_df[final_df['collection'] == collection])
@@ -0,0 +1,282 @@
+"""
+Lightweight metrics for the holder fetchers: counters, gauges and latency
+histograms (labelled, e.g. by RPC method), periodic progress summaries instead
+of per-token log lines, Prometheus textfile / JSON export and an optional
+profiler hook.
+
+    REGISTRY.inc("tokens_processed_total", 200)
+    REGISTRY.observe("rpc_latency_seconds", 0.042, method="starknet_call")
+    async with progress(REGISTRY, total=10_000):
+        ...                                       # one summary line every 10 s
+    REGISTRY.write_prometheus("holders.prom")     # node_exporter textfile collector
+
+Every StarknetRpc / RequestEngine records into REGISTRY unless given another one.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets, +Inf implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus layout) with quantile estimates"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Registry of named, labelled counters, gauges and histograms"""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels):
+        """Observes the duration of the block in histogram `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def total(self, name: str) -> float:
+        """Sum of a counter over all its labels"""
+        return sum(self.counters.get(name, {}).values())
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    # Export
+
+    def to_dict(self) -> dict:
+        def series(values):
+            return [{"labels": dict(key), "value": value} for key, value in values.items()]
+
+        return {
+            "started": self.started,
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": {name: series(values) for name, values in self.counters.items()},
+            "gauges": {name: series(values) for name, values in self.gauges.items()},
+            "histograms": {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 6),
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99),
+                    }
+                    for key, histogram in values.items()
+                ]
+                for name, values in self.histograms.items()
+            },
+        }
+
+    def to_prometheus(self, prefix: str = "holders_") -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+            for name, values in sorted(metrics.items()):
+                lines.append(f"# TYPE {prefix}{name} {kind}")
+                lines.extend(f"{prefix}{name}{_format_labels(key)} {value}" for key, value in sorted(values.items()))
+        for name, values in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for key, histogram in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                    lines.append(f"{prefix}{name}_bucket{_format_labels(key, le)} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix: str = "holders_"):
+        """Atomic write, so a textfile collector never reads a partial file"""
+        _write_atomic(Path(path), self.to_prometheus(prefix))
+
+    def write_json(self, path):
+        _write_atomic(Path(path), json.dumps(self.to_dict(), indent=2))
+
+    def summary(self, total: Optional[int] = None, elapsed: Optional[float] = None) -> str:
+        """One-line progress summary: tokens, rate, requests, errors, retries, latency"""
+        elapsed = elapsed if elapsed is not None else time.time() - self.started
+        tokens = self.total("tokens_processed_total")
+        parts = [f"tokens {int(tokens)}" + (f"/{total}" if total else "")]
+        if elapsed > 0:
+            parts.append(f"{tokens / elapsed:.0f} tokens/s")
+        parts.append(f"{int(self.total('rpc_requests_total'))} requests")
+        parts.append(f"{int(self.total('rpc_errors_total'))} errors")
+        parts.append(f"{int(self.total('rpc_retries_total'))} retries")
+        in_flight = self.gauges.get("rpc_in_flight", {})
+        if in_flight:
+            parts.append(f"{int(sum(in_flight.values()))} in flight")
+        for key, histogram in sorted(self.histograms.get("rpc_latency_seconds", {}).items()):
+            method = dict(key).get("method", "all")
+            parts.append(f"{method} p50 {histogram.quantile(0.5)}s p95 {histogram.quantile(0.95)}s")
+        return ", ".join(parts)
+
+
+def _write_atomic(path: Path, text: str):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+REGISTRY = Metrics()
+
+
+def export_metrics(metrics: Metrics = REGISTRY, path: Optional[str] = None):
+    """Writes `path` as a Prometheus textfile (.prom) or JSON (anything else); no-op without a path"""
+    if not path:
+        return
+    if str(path).endswith(".prom"):
+        metrics.write_prometheus(path)
+    else:
+        metrics.write_json(path)
+    logger.info(f"Metrics written to {path}")
+
+
+@contextlib.asynccontextmanager
+async def progress(
+    metrics: Metrics = REGISTRY,
+    total: Optional[int] = None,
+    interval: float = 10.0,
+    prometheus_file: Optional[str] = None,
+):
+    """
+    Logs metrics.summary() every `interval` seconds (and once at the end), and
+    refreshes `prometheus_file` each time when given.
+    """
+    start = time.time()
+
+    def report():
+        logger.info(metrics.summary(total, time.time() - start))
+        if prometheus_file:
+            metrics.write_prometheus(prometheus_file)
+
+    async def loop():
+        while True:
+            await asyncio.sleep(interval)
+            report()
+
+    task = asyncio.create_task(loop())
+    try:
+        yield metrics
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        report()
+
+
+@contextlib.contextmanager
+def profiled(mode: Optional[str] = None, output: Optional[str] = None, top: int = 25):
+    """
+    Profiles the block with cProfile or pyinstrument (optional dependency).
+    `mode` defaults to the PROFILE environment variable; without it this is a
+    no-op, so any run can be profiled with PROFILE=cprofile python ....
+    cProfile stats go to `output` (default profile.pstats), pyinstrument writes
+    an HTML report (default profile.html).
+    """
+    mode = mode or os.environ.get("PROFILE")
+    if not mode:
+        yield
+        return
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output or "profile.pstats")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+    elif mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise ImportError("PROFILE=pyinstrument needs `pip3 install pyinstrument`") from e
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            Path(output or "profile.html").write_text(profiler.output_html())
+            print(profiler.output_text(unicode=True, color=False))
+    else:
+        raise ValueError(f"Unknown profiler {mode!r} (expected cprofile or pyinstrument)")
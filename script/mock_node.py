@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import random
+from typing import List, Optional, Set
+
+from aiohttp import web
+from starknet_py.hash.selector import get_selector_from_name
+
+# Local stand-in for a Starknet JSON-RPC node, used to exercise the fetchers offline.
+# It serves one ERC721-like contract (any address) with configurable latency,
+# rate limiting (HTTP 429) and missing token ids. Holder addresses are accounts
+# (SRC6), except the ones listed as contracts (pools) or as not deployed.
+
+CONTRACT_NOT_FOUND = 20
+CONTRACT_ERROR = 40
+ERC721_CLASS_HASH = 0x721
+ACCOUNT_CLASS_HASH = 0xACC
+POOL_CLASS_HASH = 0x9001
+ISRC6_ID = 0x2CECCEF7F994940B3962A6C67E0BA4FCD37DF7D131417C604F91E03CAECC1CD
+
+ERC721_FUNCTIONS = [
+    *[
+        {
+            "type": "function",
+            "name": name,
+            "inputs": [{"name": "token_id", "type": "core::integer::u256"}],
+            "outputs": [{"type": "core::starknet::contract_address::ContractAddress"}],
+            "state_mutability": "view",
+        }
+        for name in ("owner_of", "ownerOf")
+    ],
+    *[
+        {
+            "type": "function",
+            "name": name,
+            "inputs": [],
+            "outputs": [{"type": "core::integer::u256"}],
+            "state_mutability": "view",
+        }
+        for name in ("total_supply", "totalSupply")
+    ],
+]
+
+ERC721_ABI = [
+    {"type": "impl", "name": "ERC721Impl", "interface_name": "IERC721"},
+    {
+        "type": "struct",
+        "name": "core::integer::u256",
+        "members": [
+            {"name": "low", "type": "core::integer::u128"},
+            {"name": "high", "type": "core::integer::u128"},
+        ],
+    },
+    {"type": "interface", "name": "IERC721", "items": ERC721_FUNCTIONS},
+]
+
+OWNER_OF = {get_selector_from_name("owner_of"), get_selector_from_name("ownerOf")}
+TOTAL_SUPPLY = {get_selector_from_name("total_supply"), get_selector_from_name("totalSupply")}
+TRANSFER = get_selector_from_name("Transfer")
+SUPPORTS_INTERFACE = {get_selector_from_name("supports_interface"), get_selector_from_name("supportsInterface")}
+
+
+class MockStarknetNode:
+    """
+    Minimal JSON-RPC server answering the calls made by the holder fetchers.
+
+    Args:
+        supply: Number of minted token ids (0 .. supply - 1)
+        holders: Number of distinct owners the tokens are spread across
+        latency: Base response time in seconds
+        latency_per_request: Extra latency per request already in flight (simulates saturation)
+        latency_per_call: Extra latency per JSON-RPC call inside a batch array
+        supports_batch: Whether JSON-RPC batch arrays are accepted
+        max_concurrency: Requests in flight above this are answered with HTTP 429
+        rate_limit_probability: Probability of answering any request with HTTP 429
+        missing: Token ids that were burnt / never minted
+        blocks: Chain height; the Transfer history is spread over blocks 0 .. blocks
+        contracts: Holder addresses deployed with a non-account (pool) class
+        undeployed: Holder addresses with no contract deployed
+    """
+
+    def __init__(
+        self,
+        supply: int = 1000,
+        holders: int = 100,
+        latency: float = 0.02,
+        latency_per_request: float = 0.0,
+        latency_per_call: float = 0.0,
+        supports_batch: bool = True,
+        max_concurrency: Optional[int] = None,
+        rate_limit_probability: float = 0.0,
+        missing: Optional[Set[int]] = None,
+        blocks: int = 10_000,
+        contracts: Optional[Set[int]] = None,
+        undeployed: Optional[Set[int]] = None,
+        seed: int = 0,
+    ):
+        self.supply = supply
+        self.holders = holders
+        self.latency = latency
+        self.latency_per_request = latency_per_request
+        self.latency_per_call = latency_per_call
+        self.supports_batch = supports_batch
+        self.max_concurrency = max_concurrency
+        self.rate_limit_probability = rate_limit_probability
+        self.missing = missing or set()
+        self.blocks = blocks
+        self.contracts = contracts or set()
+        self.undeployed = undeployed or set()
+        self._events: Optional[List[dict]] = None
+        self.random = random.Random(seed)
+        self.in_flight = 0
+        self.http_requests = 0
+        self.rpc_calls = 0
+        self.rate_limited = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    def owner_of(self, token_id: int) -> Optional[int]:
+        if token_id < 0 or token_id >= self.supply or token_id in self.missing:
+            return None
+        return 0x1000 + (token_id * 7919) % self.holders
+
+    def class_hash_at(self, address: int) -> Optional[int]:
+        if address in self.undeployed:
+            return None
+        if 0x1000 <= address < 0x1000 + self.holders or address in self.contracts:
+            return POOL_CLASS_HASH if address in self.contracts else ACCOUNT_CLASS_HASH
+        return ERC721_CLASS_HASH
+
+    @property
+    def events(self) -> List[dict]:
+        """
+        Transfer history consistent with owner_of(): every token is minted, a third
+        of them change hands later on and missing ids are burnt.
+        """
+        if self._events is None:
+            events = []
+            for token_id in range(self.supply):
+                mint_block = token_id * self.blocks // (2 * max(1, self.supply))
+                final_owner = self.owner_of(token_id)
+                first_owner = final_owner
+                if final_owner is None or token_id % 3 == 0:
+                    first_owner = 0x1000 + (token_id * 31) % self.holders
+                events.append((mint_block, 0, first_owner, token_id))
+                if first_owner != final_owner:
+                    transfer_block = mint_block + self.blocks // 2
+                    events.append((transfer_block, first_owner, final_owner or 0, token_id))
+            events.sort(key=lambda event: event[0])
+            self._events = [
+                {
+                    "from_address": "0x123",
+                    "keys": [hex(TRANSFER), hex(sender), hex(receiver), hex(token_id), "0x0"],
+                    "data": [],
+                    "block_number": block,
+                    "block_hash": hex(block),
+                    "transaction_hash": hex((block << 32) + index),
+                }
+                for index, (block, sender, receiver, token_id) in enumerate(events)
+            ]
+        return self._events
+
+    def get_events(self, event_filter: dict) -> dict:
+        from_block = event_filter.get("from_block", {}).get("block_number", 0)
+        to_block = event_filter.get("to_block", {}).get("block_number", self.blocks)
+        keys = event_filter.get("keys") or [[]]
+        chunk_size = event_filter.get("chunk_size", 1000)
+        offset = int(event_filter.get("continuation_token") or 0)
+
+        matching = [
+            event for event in self.events
+            if from_block <= event["block_number"] <= to_block
+            and (not keys[0] or event["keys"][0] in keys[0])
+        ]
+        page = {"events": matching[offset:offset + chunk_size]}
+        if offset + chunk_size < len(matching):
+            page["continuation_token"] = str(offset + chunk_size)
+        return page
+
+    def handle_call(self, request: dict) -> dict:
+        self.rpc_calls += 1
+        method = request.get("method")
+        params = request.get("params") or {}
+        result = None
+        error = None
+
+        if method == "starknet_specVersion":
+            result = "0.10.2"
+        elif method == "starknet_chainId":
+            result = hex(0x534E5F5345504F4C4941)
+        elif method == "starknet_blockNumber":
+            result = self.blocks
+        elif method == "starknet_getEvents":
+            result = self.get_events(params["filter"] if isinstance(params, dict) else params[0])
+        elif method == "starknet_getClassHashAt":
+            address = params["contract_address"] if isinstance(params, dict) else params[1]
+            class_hash = self.class_hash_at(int(address, 16))
+            if class_hash is None:
+                error = {"code": CONTRACT_NOT_FOUND, "message": "Contract not found"}
+            else:
+                result = hex(class_hash)
+        elif method in ("starknet_getClassAt", "starknet_getClass"):
+            result = {
+                "sierra_program": [],
+                "contract_class_version": "0.1.0",
+                "entry_points_by_type": {"CONSTRUCTOR": [], "EXTERNAL": [], "L1_HANDLER": []},
+                "abi": json.dumps(ERC721_ABI),
+            }
+        elif method == "starknet_call":
+            call = params["request"] if isinstance(params, dict) else params[0]
+            selector = int(call["entry_point_selector"], 16)
+            calldata = [int(x, 16) for x in call["calldata"]]
+            if selector in OWNER_OF:
+                owner = self.owner_of(calldata[0] + (calldata[1] << 128))
+                if owner is None:
+                    error = {"code": CONTRACT_ERROR, "message": "Contract error",
+                             "data": {"revert_error": "ERC721: invalid token ID"}}
+                else:
+                    result = [hex(owner)]
+            elif selector in TOTAL_SUPPLY:
+                result = [hex(self.supply), "0x0"]
+            elif selector in SUPPORTS_INTERFACE and self.class_hash_at(int(call["contract_address"], 16)) != POOL_CLASS_HASH:
+                account = self.class_hash_at(int(call["contract_address"], 16)) == ACCOUNT_CLASS_HASH
+                result = [hex(int(account and calldata[0] == ISRC6_ID))]
+            else:
+                error = {"code": CONTRACT_ERROR, "message": "Contract error",
+                         "data": {"revert_error": "Entry point not found"}}
+        else:
+            error = {"code": -32601, "message": f"Method not found: {method}"}
+
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        if error is not None:
+            response["error"] = error
+        else:
+            response["result"] = result
+        return response
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        self.in_flight += 1
+        try:
+            if (
+                (self.max_concurrency is not None and self.in_flight > self.max_concurrency)
+                or self.random.random() < self.rate_limit_probability
+            ):
+                self.rate_limited += 1
+                return web.Response(status=429, text="Too Many Requests")
+
+            payload = await request.json()
+            calls = len(payload) if isinstance(payload, list) else 1
+            await asyncio.sleep(
+                self.latency
+                + self.latency_per_request * (self.in_flight - 1)
+                + self.latency_per_call * calls
+            )
+            if not isinstance(payload, list):
+                return web.json_response(self.handle_call(payload))
+            if not self.supports_batch:
+                return web.json_response(
+                    {"jsonrpc": "2.0", "id": None,
+                     "error": {"code": -32600, "message": "Batch requests are not supported"}}
+                )
+            return web.json_response([self.handle_call(call) for call in payload])
+        finally:
+            self.in_flight -= 1
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}/"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(node: MockStarknetNode, host: str, port: int):
+    url = await node.start(host, port)
+    print(f"Mock Starknet node listening on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await node.stop()
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock Starknet JSON-RPC node")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--supply", type=int, default=10000)
+    parser.add_argument("--holders", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-request", type=float, default=0.0)
+    parser.add_argument("--latency-per-call", type=float, default=0.0)
+    parser.add_argument("--no-batch", action="store_true", help="Reject JSON-RPC batch arrays")
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    args = parser.parse_args()
+
+    node = MockStarknetNode(
+        supply=args.supply,
+        holders=args.holders,
+        latency=args.latency,
+        latency_per_request=args.latency_per_request,
+        latency_per_call=args.latency_per_call,
+        supports_batch=not args.no_batch,
+        max_concurrency=args.max_concurrency,
+        rate_limit_probability=args.rate_limit_probability,
+    )
+    asyncio.run(serve(node, args.host, args.port))
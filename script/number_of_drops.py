@@ -1,63 +1,127 @@
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
 
-def analyze_airdrops(input_folder):
+from address import parse_addresses
+from distinct import distinct_counter
+from parallel import map_files
+from snapshot_format import address_values, snapshot_files
+
+CHUNK_ROWS = 1_000_000
+
+def read_chunks(file, chunk_size=CHUNK_ROWS):
+    """
+    Yield (S32 addresses, token sum, collection names) for fixed-size chunks of
+    a snapshot file, so memory does not grow with the file
+    """
+    if file.suffix == '.parquet':
+        columns = ['address', 'quantity', 'collection']
+        # Without pre-buffering, only the current row group's column chunks are held in memory
+        for batch in pq.ParquetFile(file, pre_buffer=False).iter_batches(batch_size=chunk_size, columns=columns):
+            collections = batch.column('collection').cast('string').to_numpy(zero_copy_only=False)
+            yield address_values(batch.column('address')), batch.column('quantity'), collections
+        return
+    for df in pd.read_csv(file, usecols=['address', 'quantity', 'collection'], chunksize=chunk_size):
+        yield parse_addresses(df['address']), df['quantity'].to_numpy(), df['collection'].astype(str).to_numpy()
+
+def _token_sum(quantities, mask=None):
+    # Parquet chunks keep exact decimal128 quantities, CSV chunks numpy ones
+    if hasattr(quantities, 'type'):
+        if mask is not None:
+            quantities = pc.filter(quantities, mask)
+        return int(pc.sum(quantities).as_py() or 0)
+    return int(quantities.sum() if mask is None else quantities[mask].sum())
+
+def file_stats(file, chunk_size=CHUNK_ROWS, distinct='exact', error=0.01):
     """
-    Analyze all airdrop CSV files in a folder to display total tokens and unique addresses
+    Per-file part of analyze_airdrops, run in a worker process on streamed chunks
+    
+    Returns:
+    dict: tokens, rows, distinct address counter (AddressSet or HyperLogLog),
+    and per collection (tokens, distinct address counter)
+    """
+    stats = {'tokens': 0, 'rows': 0, 'addresses': distinct_counter(distinct, error), 'collections': {}}
+    for addresses, quantities, collections in read_chunks(file, chunk_size):
+        stats['tokens'] += _token_sum(quantities)
+        stats['rows'] += len(addresses)
+        stats['addresses'].add(addresses)
+        codes, names = pd.factorize(collections)
+        for i, collection in enumerate(names):
+            in_collection = codes == i
+            tokens, counter = stats['collections'].setdefault(collection, (0, distinct_counter(distinct, error)))
+            counter.add(addresses[in_collection])
+            stats['collections'][collection] = (tokens + _token_sum(quantities, in_collection), counter)
+    return stats
+
+def analyze_airdrops(input_folder, max_workers=None, memory_budget=None, chunk_size=CHUNK_ROWS, distinct='exact',
+                     error=0.01):
+    """
+    Analyze all airdrop files (Parquet or CSV) in a folder to display total tokens and unique addresses
+    
+    Files are streamed in chunks of chunk_size rows by parallel worker processes
+    (file_stats), keeping running token sums and distinct address counters that
+    are merged in one reduce step. With distinct='exact' the counters are compact
+    hash sets of canonical addresses; with distinct='hll' they are HyperLogLog
+    sketches of relative error `error`, so memory stays constant at any row count.
     """
     folder = Path(input_folder)
-    csv_files = list(folder.glob('*.csv'))
+    files = snapshot_files(folder)
     
-    if not csv_files:
-        print(f"No CSV files found in {input_folder}")
+    if not files:
+        print(f"No snapshot files found in {input_folder}")
         return
         
-    # List to store all dataframes
-    all_dfs = []
+    report = map_files(
+        file_stats, files, chunk_size, distinct, error, max_workers=max_workers, memory_budget=memory_budget
+    )
+    approx = "~" if distinct == 'hll' else ""
     
-    # Process each CSV file
+    # Print each file
     print("\nProcessing individual files:")
     print("-" * 50)
-    for file in csv_files:
-        try:
-            df = pd.read_csv(file)
-            print(f"\nFile: {file.name}")
-            print(f"Tokens: {df['quantity'].sum():,}")
-            print(f"Addresses: {len(df):,}")
-            print(f"Unique addresses: {df['address'].nunique():,}")
-            all_dfs.append(df)
-        except Exception as e:
-            print(f"Error processing {file.name}: {str(e)}")
+    for file, stats in report.results.items():
+        print(f"\nFile: {file.name}")
+        print(f"Tokens: {stats['tokens']:,}")
+        print(f"Addresses: {stats['rows']:,}")
+        print(f"Unique addresses: {approx}{len(stats['addresses']):,}")
     
-    if all_dfs:
-        # Combine all dataframes
-        combined_df = pd.concat(all_dfs, ignore_index=True)
-        
-        # Calculate overall totals
-        total_tokens = combined_df['quantity'].sum()
-        total_addresses = len(combined_df)
-        unique_addresses = combined_df['address'].nunique()
+    if report.results:
+        results = list(report.results.values())
         
-        # Get distribution by collection
-        collection_stats = combined_df.groupby('collection').agg({
-            'quantity': 'sum',
-            'address': 'nunique'
-        }).reset_index()
+        # Reduce: merge the running sums and distinct counters, overall and per collection
+        total_tokens = sum(stats['tokens'] for stats in results)
+        total_addresses = sum(stats['rows'] for stats in results)
+        # (the first file's counters are reused rather than copied)
+        unique_addresses = results[0]['addresses']
+        collections = dict(results[0]['collections'])
+        for stats in results[1:]:
+            unique_addresses.update(stats['addresses'])
+            for collection, (tokens, counter) in stats['collections'].items():
+                if collection not in collections:
+                    collections[collection] = (tokens, counter)
+                    continue
+                total, merged = collections[collection]
+                merged.update(counter)
+                collections[collection] = (total + tokens, merged)
         
         # Print overall summary
         print("\nOVERALL SUMMARY")
         print("-" * 50)
-        print(f"Total CSV files processed: {len(csv_files)}")
+        print(f"Total files processed: {len(report.results)}")
         print(f"Total tokens airdropped: {total_tokens:,}")
         print(f"Total address entries: {total_addresses:,}")
-        print(f"Total unique addresses: {unique_addresses:,}")
+        print(f"Total unique addresses: {approx}{len(unique_addresses):,}")
         
         print("\nBreakdown by collection:")
         print("-" * 50)
-        for _, row in collection_stats.iterrows():
-            print(f"\nCollection: {row['collection']}")
-            print(f"Tokens: {row['quantity']:,}")
-            print(f"Unique addresses: {row['address']:,}")
+        for collection, (tokens, counter) in sorted(collections.items()):
+            print(f"\nCollection: {collection}")
+            print(f"Tokens: {tokens:,}")
+            print(f"Unique addresses: {approx}{len(counter):,}")
+    
+    report.print_summary()
+    return report
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,281 @@
+"""
+Packs a distribution file into ready-to-submit add_free_mint batches.
+
+FreeMintManager sends every 500 rows as one multicall of add_free_mint calls,
+so a single bad row fails the whole transaction. Here every row is validated
+first with the UI rules (integer quantity and timestamp) plus the contract
+types (ContractAddress, u32, u64), rejected rows go to rejected.csv with a
+reason, and the valid rows are packed into batches that fit an estimated
+calldata and step budget:
+
+    batches/
+        batch_0001.csv ... batch_NNNN.csv   FreeMintManager upload format
+        rejected.csv                        row, address, quantity, expiration_timestamp, reason
+        manifest.json                       limits, per-batch rows/costs/totals/sha256
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from address import ADDRESS_DTYPE, parse_addresses, valid_addresses
+from snapshot_format import read_frame
+
+# Starknet invoke transaction limits (versioned constants) and the share of
+# them a batch may use, since the step cost is only an estimate
+MAX_CALLDATA_FELTS = 5000
+MAX_STEPS = 10_000_000
+SAFETY_MARGIN = 0.8
+
+# __execute__(Array<Call>): array length, then per call to, selector, calldata
+# length and the 3 add_free_mint arguments (to, number, expiration_timestamp)
+CALLDATA_HEADER_FELTS = 1
+FELTS_PER_ENTRY = 6
+# Account validation + multicall dispatch, and one add_free_mint system call
+BASE_STEPS = 50_000
+STEPS_PER_ENTRY = 12_000
+
+MAX_U32 = 2 ** 32 - 1
+MAX_U64 = 2 ** 64 - 1
+UPLOAD_COLUMNS = ['address', 'quantity', 'collection', 'expiration_timestamp']
+# FreeMintManager re-splits an uploaded file into groups of this many rows
+# (BATCH_SIZE), so larger batches would be sent as several transactions anyway
+UI_BATCH_SIZE = 500
+
+
+def _unsigned(values: pd.Series, maximum: int):
+    """(integer values as object array, mask of rows that are plain integers in [0, maximum])"""
+    text = values.astype('string').str.strip()
+    digits = text.str.fullmatch(r"\d+").fillna(False).to_numpy(dtype=bool)
+    digits &= (text.str.lstrip('0').str.len() <= len(str(maximum))).fillna(False).to_numpy(dtype=bool)
+    ints = np.array([int(t) if ok else -1 for t, ok in zip(text.tolist(), digits)], dtype=object)
+    return ints, digits & (ints <= maximum)
+
+
+def validate_rows(df: pd.DataFrame, not_before: Optional[int] = None, allow_duplicates: bool = False) -> pd.Series:
+    """
+    Rejection reason of every row, None for rows safe to submit.
+
+    Args:
+    df (DataFrame): address, quantity, expiration_timestamp (as text or integers)
+    not_before (int): Also reject expiration timestamps at or before this one
+    allow_duplicates (bool): Keep repeated addresses (rejected by default, merge them
+        with merge_tokens_nfts.aggregate_recipients instead)
+
+    Returns:
+    Series: reason per row (the first failing rule), None when valid
+    """
+    reasons = pd.Series(None, index=df.index, dtype=object)
+
+    def reject(mask, reason):
+        reasons[mask & reasons.isna().to_numpy()] = reason
+
+    valid_address = valid_addresses(df['address'])
+    reject(~valid_address, "invalid address")
+    addresses = np.zeros(len(df), dtype=ADDRESS_DTYPE)
+    addresses[valid_address] = parse_addresses(df['address'][valid_address])
+    # ContractAddress is a felt below 2**251, and 0 is not an account
+    high_byte = addresses.view(np.uint8).reshape(-1, 32)[:, 0] if len(df) else np.empty(0, dtype=np.uint8)
+    reject(high_byte >= 0x08, "address out of range")
+    reject(addresses == np.zeros(1, dtype=ADDRESS_DTYPE)[0], "zero address")
+
+    quantities, valid_quantity = _unsigned(df['quantity'], MAX_U32)
+    reject(~valid_quantity, "quantity is not a u32 integer")
+    reject(valid_quantity & (quantities == 0), "zero quantity")
+
+    timestamps, valid_timestamp = _unsigned(df['expiration_timestamp'], MAX_U64)
+    reject(~valid_timestamp, "expiration_timestamp is not a u64 integer")
+    if not_before is not None:
+        reject(valid_timestamp & (timestamps <= not_before), "already expired")
+
+    if not allow_duplicates:
+        ok = reasons.isna().to_numpy()
+        repeated = np.zeros(len(df), dtype=bool)
+        repeated[ok] = pd.Series(addresses[ok]).duplicated().to_numpy()
+        reject(repeated, "duplicate address")
+    return reasons
+
+
+def entry_costs(count: int, felts_per_entry: int = FELTS_PER_ENTRY, steps_per_entry: int = STEPS_PER_ENTRY):
+    """(calldata felts, estimated steps) of each entry"""
+    return np.full(count, felts_per_entry, dtype=np.int64), np.full(count, steps_per_entry, dtype=np.int64)
+
+
+def pack(
+    felts: np.ndarray,
+    steps: np.ndarray,
+    max_calldata: int = MAX_CALLDATA_FELTS,
+    max_steps: int = MAX_STEPS,
+    margin: float = SAFETY_MARGIN,
+    max_entries: Optional[int] = UI_BATCH_SIZE,
+) -> np.ndarray:
+    """
+    Greedy packing in row order: each batch takes as many of the next entries as
+    fit both budgets (times `margin`). Returns the start index of every batch.
+    """
+    calldata_budget = int(max_calldata * margin) - CALLDATA_HEADER_FELTS
+    step_budget = int(max_steps * margin) - BASE_STEPS
+    if felts.max(initial=0) > calldata_budget or steps.max(initial=0) > step_budget:
+        raise ValueError("A single entry exceeds the transaction budget")
+
+    felt_sums = np.concatenate([[0], np.cumsum(felts)])
+    step_sums = np.concatenate([[0], np.cumsum(steps)])
+    starts = []
+    start = 0
+    while start < len(felts):
+        end = min(
+            np.searchsorted(felt_sums, felt_sums[start] + calldata_budget, side='right') - 1,
+            np.searchsorted(step_sums, step_sums[start] + step_budget, side='right') - 1,
+        )
+        if max_entries is not None:
+            end = min(end, start + max_entries)
+        starts.append(start)
+        start = end
+    return np.array(starts, dtype=np.int64)
+
+
+def _write_atomic(path: Path, write):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_distribution(file: Path) -> pd.DataFrame:
+    # Text columns, so validation sees exactly what the UI would parse
+    if file.suffix == '.parquet':
+        return read_frame(file).astype({'quantity': str, 'expiration_timestamp': str})
+    df = pd.read_csv(file, dtype=str, keep_default_na=False, skipinitialspace=True)
+    df.columns = [col.strip().lower() for col in df.columns]
+    return df
+
+
+def pack_batches(
+    distribution_file,
+    output_dir=None,
+    max_calldata: int = MAX_CALLDATA_FELTS,
+    max_steps: int = MAX_STEPS,
+    steps_per_entry: int = STEPS_PER_ENTRY,
+    margin: float = SAFETY_MARGIN,
+    max_entries: Optional[int] = UI_BATCH_SIZE,
+    not_before: Optional[int] = None,
+    allow_duplicates: bool = False,
+) -> dict:
+    """
+    Validate a distribution file and write numbered batch files plus a manifest.
+
+    Args:
+    distribution_file (str): CSV or Parquet with address, quantity, expiration_timestamp
+    output_dir (str): Where to write the batches (default: <file stem>_batches next to it)
+    max_calldata / max_steps (int): Transaction limits, `margin` of which a batch may use
+    steps_per_entry (int): Estimated steps of one add_free_mint call
+    max_entries (int): Hard cap on entries per batch (default: the UI batch size, None for no cap)
+
+    Returns:
+    dict: the manifest
+    """
+    distribution_file = Path(distribution_file)
+    output_dir = Path(output_dir) if output_dir else distribution_file.with_name(f"{distribution_file.stem}_batches")
+    df = _read_distribution(distribution_file)
+    missing = {'address', 'quantity', 'expiration_timestamp'} - set(df.columns)
+    if missing:
+        raise ValueError(f"{distribution_file.name} is missing required columns: {sorted(missing)}")
+    if 'collection' not in df.columns:
+        df['collection'] = distribution_file.stem
+
+    reasons = validate_rows(df, not_before, allow_duplicates)
+    valid = reasons.isna().to_numpy()
+    rejected = df[~valid].assign(row=np.flatnonzero(~valid) + 2, reason=reasons[~valid])  # 1-based file line
+    entries = df[valid].reset_index(drop=True)
+    entries['address'] = entries['address'].str.strip()
+    entries['quantity'] = entries['quantity'].str.strip().astype(np.int64)
+    entries['expiration_timestamp'] = entries['expiration_timestamp'].str.strip().map(int)
+
+    felts, steps = entry_costs(len(entries), steps_per_entry=steps_per_entry)
+    starts = pack(felts, steps, max_calldata, max_steps, margin, max_entries)
+    ends = np.append(starts[1:], len(entries))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for old_file in output_dir.glob('batch_*.csv'):
+        old_file.unlink()
+    width = max(4, len(str(len(starts))))
+    batches = []
+    for number, (start, end) in enumerate(zip(starts, ends), start=1):
+        batch = entries.iloc[start:end].reindex(columns=UPLOAD_COLUMNS)
+        # No trailing newline: the UI splits on "\n" and fails on the empty last row
+        content = batch.to_csv(index=False).rstrip('\n').encode()
+        batch_file = output_dir / f"batch_{number:0{width}d}.csv"
+        _write_atomic(batch_file, lambda path: path.write_bytes(content))
+        batches.append({
+            'file': batch_file.name,
+            'entries': int(end - start),
+            'calldata_felts': int(CALLDATA_HEADER_FELTS + felts[start:end].sum()),
+            'estimated_steps': int(BASE_STEPS + steps[start:end].sum()),
+            'total_quantity': int(batch['quantity'].sum()),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        })
+
+    rejected_file = output_dir / 'rejected.csv'
+    rejected_columns = ['row', 'address', 'quantity', 'expiration_timestamp', 'reason']
+    _write_atomic(rejected_file, lambda path: rejected.reindex(columns=rejected_columns).to_csv(path, index=False))
+
+    manifest = {
+        'source': str(distribution_file),
+        'source_sha256': hashlib.sha256(distribution_file.read_bytes()).hexdigest(),
+        'created_at': int(time.time()),
+        'limits': {
+            'max_calldata_felts': max_calldata,
+            'max_steps': max_steps,
+            'margin': margin,
+            'felts_per_entry': FELTS_PER_ENTRY,
+            'steps_per_entry': steps_per_entry,
+            'max_entries': max_entries,
+        },
+        'rows': len(df),
+        'entries': len(entries),
+        'rejected': len(rejected),
+        'rejected_file': rejected_file.name,
+        'total_quantity': int(entries['quantity'].sum()),
+        'batches': batches,
+    }
+    _write_atomic(output_dir / 'manifest.json', lambda path: path.write_text(json.dumps(manifest, indent=2)))
+
+    print(f"{distribution_file.name}: {len(entries)}/{len(df)} valid rows in {len(batches)} batches -> {output_dir}")
+    if len(rejected):
+        print(f"Rejected {len(rejected)} rows (see {rejected_file}):")
+        for reason, count in rejected['reason'].value_counts().items():
+            print(f"- {reason}: {count}")
+    return manifest
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate a distribution and pack it into add_free_mint batches")
+    parser.add_argument("distribution", help="CSV or Parquet distribution file")
+    parser.add_argument("--output", default=None, help="Output folder (default: <stem>_batches)")
+    parser.add_argument("--max-calldata", type=int, default=MAX_CALLDATA_FELTS)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--steps-per-entry", type=int, default=STEPS_PER_ENTRY)
+    parser.add_argument("--margin", type=float, default=SAFETY_MARGIN)
+    parser.add_argument("--max-entries", type=int, default=UI_BATCH_SIZE)
+    parser.add_argument("--reject-expired", action="store_true", help="Reject timestamps that are already past")
+    parser.add_argument("--allow-duplicates", action="store_true")
+    args = parser.parse_args()
+
+    pack_batches(
+        args.distribution,
+        args.output,
+        max_calldata=args.max_calldata,
+        max_steps=args.max_steps,
+        steps_per_entry=args.steps_per_entry,
+        margin=args.margin,
+        max_entries=args.max_entries,
+        not_before=int(time.time()) if args.reject_expired else None,
+        allow_duplicates=args.allow_duplicates,
+    )
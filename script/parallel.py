@@ -0,0 +1,142 @@
+"""
+Shared executor for the per-file CSV tools.
+
+`map_files` runs a top-level function on every file in a process pool, with a
+bounded number of workers and an optional memory budget: a file is only
+started while the estimated memory of the running files fits the budget (one
+file always runs, however large). Results come back in file order for the
+caller's reduce step, and failures are collected in a RunReport instead of
+being printed (and lost) one file at a time.
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# In-memory size of a parsed file relative to its size on disk
+MEMORY_FACTORS = {'.csv': 4, '.parquet': 12}
+
+
+@dataclass
+class FileError:
+    file: str
+    error_type: str
+    message: str
+    traceback: str = ""
+
+    def __str__(self):
+        return f"{self.file}: {self.error_type}: {self.message}"
+
+
+@dataclass
+class RunReport:
+    """Per-file results (in file order) and errors of one map_files run"""
+    results: Dict[Path, Any] = field(default_factory=dict)
+    errors: List[FileError] = field(default_factory=list)
+    seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def print_summary(self, title: str = "files"):
+        print(f"\n{len(self.results)} {title} processed in {self.seconds:.2f}s with {self.workers} worker(s)")
+        if self.errors:
+            print(f"{len(self.errors)} failed:")
+            for error in self.errors:
+                print(f"- {error}")
+
+    def to_dict(self) -> dict:
+        return {
+            'files': [str(file) for file in self.results],
+            'errors': [vars(error) for error in self.errors],
+            'seconds': round(self.seconds, 3),
+            'workers': self.workers,
+        }
+
+
+def estimate_memory(file: Path) -> int:
+    """Rough peak memory (bytes) of loading one file"""
+    return Path(file).stat().st_size * MEMORY_FACTORS.get(Path(file).suffix, 4)
+
+
+def _call(func: Callable, file: Path, args: tuple):
+    # Runs in the worker: errors are returned as data, so any exception type
+    # (even an unpicklable one) reaches the report with its traceback
+    try:
+        return True, func(file, *args)
+    except Exception as e:
+        return False, FileError(file.name, type(e).__name__, str(e), traceback.format_exc())
+
+
+def map_files(
+    func: Callable,
+    files: Sequence,
+    *args,
+    max_workers: Optional[int] = None,
+    memory_budget: Optional[int] = None,
+) -> RunReport:
+    """
+    Run func(file, *args) for every file on a process pool.
+
+    Args:
+    func: Module-level function (it is pickled to the workers)
+    files: Files to process
+    max_workers (int): Pool size (default: one per CPU, never more than files)
+    memory_budget (int): Bytes the running files may use together (see estimate_memory)
+
+    Returns:
+    RunReport: results keyed by file in the order of `files`, and the errors
+    """
+    start = time.perf_counter()
+    files = [Path(file) for file in files]
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(files) or 1))
+    report = RunReport(workers=workers)
+    outcomes = {}
+
+    if workers == 1:
+        # No pool for one worker: same results without the process start-up cost
+        for file in files:
+            outcomes[file] = _call(func, file, args)
+    else:
+        pending = list(files)
+        running = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                while pending or running:
+                    used = sum(size for _, size in running.values())
+                    while pending and len(running) < workers:
+                        size = estimate_memory(pending[0])
+                        if running and memory_budget is not None and used + size > memory_budget:
+                            break
+                        file = pending.pop(0)
+                        running[executor.submit(_call, func, file, args)] = (file, size)
+                        used += size
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file, _ = running[future]
+                        try:
+                            outcomes[file] = future.result()
+                        except Exception as e:
+                            # The worker died (BrokenProcessPool) or its result could not be unpickled
+                            outcomes[file] = (False, FileError(file.name, type(e).__name__, str(e)))
+                        del running[future]
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory) before submit: every unfinished file failed
+                for file in pending + [file for file, _ in running.values()]:
+                    outcomes[file] = (False, FileError(file.name, type(e).__name__, str(e)))
+
+    for file in files:
+        succeeded, value = outcomes[file]
+        if succeeded:
+            report.results[file] = value
+        else:
+            report.errors.append(value)
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,399 @@
+"""
+Declarative airdrop pipeline.
+
+One TOML spec replaces the filter_0 -> update_expiration_timestamp ->
+merge_tokens_nfts/controllers -> sepolia.transform_csv_files chain. Every source
+is read once, in chunks, streamed through the stages and written once. Sources
+are independent and run in parallel. Outputs go to temporary files that only
+replace their targets after every source succeeded, so a failed run never leaves
+a partially rewritten folder.
+
+    [[sources]]
+    path = "./output/all/all_controller/controllers.csv"   # file, folder or glob, relative to the working directory
+    collection = "controller"                              # default: file stem
+
+    [[stages]]
+    type = "normalize"                 # canonical addresses, standard columns
+
+    [[stages]]
+    type = "filter"
+    exclude = ["0x0", "0x1"]
+    blocklists = ["./lists/exchanges.csv"]   # optional: address[,reason] CSV, TXT or Parquet
+    allowlists = []
+
+    [[stages]]
+    type = "classify"                  # optional: drop contracts (pools, vaults...)
+    rpc_url = "http://127.0.0.1:5050/"
+    cache = "holder_classes.db"
+
+    [[stages]]
+    type = "allocate"
+    quantity = 2                       # or: total_tokens = 350, min_tokens = 2
+
+    [[stages]]
+    type = "set_timestamp"
+    days = 10                          # or: value = 1733656248
+
+    [merge]                            # optional: one output file for every source
+    dedupe = true                      # or: aggregate = "capped-sum", cap = 6, budget = 15000
+
+    [output]
+    path = "controller_distribution.csv"   # with [merge]; otherwise dir + prefix
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from address import format_addresses, parse_addresses, valid_addresses
+from allocation import allocate, weights_from_points
+from classify_holders import DEFAULT_CACHE, classify
+from exclusions import ExclusionList
+from merge_tokens_nfts import aggregate_recipients
+from metrics import profiled
+from snapshot_format import snapshot_files, to_frame
+
+OUTPUT_COLUMNS = ['address', 'quantity', 'collection', 'expiration_timestamp']
+
+Stage = Callable[[Iterator[pd.DataFrame], str], Iterator[pd.DataFrame]]
+
+
+# Load
+
+def source_files(source: dict, base_dir: Path) -> List[Path]:
+    """Files matched by a source `path`: a snapshot file, a folder of snapshots or a glob"""
+    path = base_dir / source['path']
+    if path.is_dir():
+        return snapshot_files(path)
+    if path.exists():
+        return [path]
+    return sorted(path.parent.glob(path.name))
+
+
+def load(file: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Reads a snapshot in chunks: memory-mapped row batches for Parquet, text
+    chunks (addresses and quantities kept as strings) for CSV.
+    """
+    if file.suffix == '.parquet':
+        for batch in pq.ParquetFile(file, memory_map=True).iter_batches(batch_size=chunk_size):
+            chunk = to_frame(pa.Table.from_batches([batch]))
+            chunk['collection'] = chunk['collection'].astype(str)
+            yield chunk.assign(quantity=chunk['quantity'].astype(str))
+        return
+    reader = pd.read_csv(file, chunksize=chunk_size, dtype=str, skipinitialspace=True)
+    for chunk in reader:
+        chunk.columns = [col.strip().lower() for col in chunk.columns]
+        yield chunk
+
+
+# Stages
+
+def normalize_stage(options: dict) -> Stage:
+    """Canonical 0x + 64 hex addresses, malformed rows dropped, standard columns"""
+    def run(chunks, collection):
+        for chunk in chunks:
+            chunk = chunk[valid_addresses(chunk['address'])].copy()
+            chunk['address'] = format_addresses(parse_addresses(chunk['address']))
+            if 'collection' not in chunk.columns or options.get('override_collection', True):
+                chunk['collection'] = collection
+            yield chunk
+    return run
+
+
+def filter_stage(options: dict) -> Stage:
+    """
+    Drops malformed and excluded addresses (inline `exclude`, plus `blocklists`
+    files minus `allowlists` files, see exclusions.py) and, optionally, rows
+    below `min_quantity`. Prints the removed rows per reason for each source.
+    """
+    exclusions = ExclusionList.from_files(
+        options.get('blocklists', []),
+        options.get('allowlists', []),
+        extra={'excluded': options.get('exclude', ['0x0', '0x1'])},
+        bloom_error=options.get('bloom_error', 0.01),
+    )
+    min_quantity = options.get('min_quantity')
+
+    def run(chunks, collection):
+        removed = {}
+        for chunk in chunks:
+            reasons = exclusions.classify(chunk['address'])
+            for reason, count in pd.Series(reasons).value_counts().items():
+                removed[reason] = removed.get(reason, 0) + int(count)
+            chunk = chunk[pd.isna(reasons)]
+            if min_quantity is not None and 'quantity' in chunk.columns:
+                below = ~(pd.to_numeric(chunk['quantity']) >= min_quantity)
+                removed['below min_quantity'] = removed.get('below min_quantity', 0) + int(below.sum())
+                chunk = chunk[~below]
+            yield chunk
+        removed = {reason: count for reason, count in removed.items() if count}
+        if removed:
+            print(f"Filtered {collection}: " + ", ".join(f"{count} {reason}" for reason, count in removed.items()))
+    return run
+
+
+def classify_stage(options: dict) -> Stage:
+    """
+    Drops holders that are not player accounts (see classify_holders): kind
+    `contract` by default, or the kinds listed in `drop`. Class hashes are cached
+    in `cache`, so only addresses never seen before are looked up on `rpc_url`.
+    The distinct addresses of a whole source are classified in one call (one
+    connection pool, one cache connection), so this stage buffers the source.
+    """
+    rpc_url = options.get('rpc_url', os.environ.get('RPC_URL', 'https://starknet-mainnet.public.blastapi.io/'))
+    cache_path = options.get('cache', DEFAULT_CACHE)
+    drop = list(options.get('drop', ['contract']))
+
+    def run(chunks, collection):
+        chunks = list(chunks)
+        valid = [valid_addresses(chunk['address']) for chunk in chunks]
+        addresses = [format_addresses(parse_addresses(chunk['address'][ok])) for chunk, ok in zip(chunks, valid)]
+        distinct = pd.unique(np.concatenate(addresses)) if addresses else []
+        classes = asyncio.run(classify(list(distinct), rpc_url, cache_path)) if len(distinct) else None
+        kind_of = pd.Series(classes['kind'].to_numpy(), index=classes['address']) if classes is not None else None
+        removed = {}
+        for chunk, ok, chunk_addresses in zip(chunks, valid, addresses):
+            if kind_of is None:
+                yield chunk
+                continue
+            kinds = kind_of.reindex(chunk_addresses)
+            dropped = np.zeros(len(chunk), dtype=bool)
+            dropped[ok] = kinds.isin(drop).to_numpy()
+            for kind, count in kinds[dropped[ok]].value_counts().items():
+                removed[kind] = removed.get(kind, 0) + int(count)
+            yield chunk[~dropped]
+        if removed:
+            print(f"Classified {collection}: dropped " + ", ".join(f"{count} {kind}" for kind, count in removed.items()))
+    return run
+
+
+def set_timestamp_stage(options: dict) -> Stage:
+    """Sets expiration_timestamp to a fixed `value` or to now + `days`"""
+    if 'value' in options:
+        timestamp = int(options['value'])
+    else:
+        timestamp = int((datetime.now() + timedelta(days=options.get('days', 10))).timestamp())
+
+    def run(chunks, collection):
+        for chunk in chunks:
+            yield chunk.assign(expiration_timestamp=timestamp)
+    return run
+
+
+def allocate_stage(options: dict) -> Stage:
+    """
+    Sets quantities: a fixed `quantity` (streamed), or exactly `total_tokens`
+    apportioned by points between `min_tokens` and `max_tokens` (see
+    allocation.allocate; `weighting` and `tiers` as in weights_from_points). Pro rata needs the points total, so that mode
+    buffers the whole source before emitting it.
+    Without options, existing quantities are kept.
+    """
+    def run(chunks, collection):
+        if 'quantity' in options:
+            for chunk in chunks:
+                yield chunk.assign(quantity=str(options['quantity']))
+        elif 'total_tokens' in options:
+            frame = pd.concat(list(chunks), ignore_index=True)
+            weights = weights_from_points(
+                pd.to_numeric(frame['points']), options.get('weighting', 'linear'), options.get('tiers')
+            )
+            quantities = allocate(
+                weights, options['total_tokens'], options.get('min_tokens', 2), options.get('max_tokens')
+            )
+            yield frame.assign(quantity=quantities.astype(str))
+        else:
+            yield from chunks
+    return run
+
+
+STAGES: Dict[str, Callable[[dict], Stage]] = {
+    'normalize': normalize_stage,
+    'filter': filter_stage,
+    'classify': classify_stage,
+    'set_timestamp': set_timestamp_stage,
+    'allocate': allocate_stage,
+}
+
+
+# Merge / write
+
+class AtomicCsvWriter:
+    """
+    Appends chunks to a temporary file next to `path`; commit() renames it over
+    the target, abort() deletes it. Thread safe, so parallel sources can share one.
+    """
+
+    def __init__(self, path: Path, dedupe: bool = False):
+        self.path = path
+        self.tmp_path = path.with_name(f".{path.name}.tmp")
+        self.dedupe = dedupe
+        self.rows = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, chunk: pd.DataFrame):
+        chunk = chunk.reindex(columns=OUTPUT_COLUMNS)
+        with self._lock:
+            if self.dedupe:
+                keys = list(zip(chunk['address'], chunk['collection']))
+                keep = [key not in self._seen and not self._seen.add(key) for key in keys]
+                chunk = chunk[keep]
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.tmp_path, 'w', newline='')
+                self._file.write(','.join(OUTPUT_COLUMNS) + '\n')
+            chunk.to_csv(self._file, header=False, index=False)
+            self.rows += len(chunk)
+
+    def commit(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self.tmp_path.unlink(missing_ok=True)
+
+
+class AggregatingCsvWriter(AtomicCsvWriter):
+    """
+    Merge writer with one row per recipient: chunks are buffered and collapsed
+    by canonical address at commit (see merge_tokens_nfts.aggregate_recipients).
+    """
+
+    def __init__(self, path: Path, aggregate: str, cap: Optional[int] = None, budget: Optional[int] = None):
+        super().__init__(path)
+        self.options = (aggregate, cap, budget)
+        self._chunks = []
+
+    def write(self, chunk: pd.DataFrame):
+        with self._lock:
+            self._chunks.append(chunk.reindex(columns=OUTPUT_COLUMNS))
+
+    def commit(self):
+        if not self._chunks:
+            return
+        frame = pd.concat(self._chunks, ignore_index=True)
+        frame['quantity'] = pd.to_numeric(frame['quantity'])
+        recipients = aggregate_recipients(frame, *self.options)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        recipients.to_csv(self.tmp_path, index=False)
+        self.rows = len(recipients)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._chunks = []
+
+
+# Runner
+
+def build_stages(spec: dict) -> List[Stage]:
+    stages = []
+    for options in spec.get('stages', []):
+        if options['type'] not in STAGES:
+            raise ValueError(f"Unknown stage type {options['type']!r} (expected one of {sorted(STAGES)})")
+        stages.append(STAGES[options['type']](options))
+    return stages
+
+
+def run_source(file: Path, collection: str, stages: List[Stage], writer: AtomicCsvWriter, chunk_size: int) -> int:
+    chunks: Iterable[pd.DataFrame] = load(file, chunk_size)
+    for stage in stages:
+        chunks = stage(chunks, collection)
+    rows = 0
+    for chunk in chunks:
+        writer.write(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def run_pipeline(spec: dict, base_dir: Path = Path('.'), max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Runs a pipeline spec. Returns collection name -> number of rows written.
+    Nothing is replaced on disk unless every source succeeds.
+    """
+    start = time.perf_counter()
+    stages = build_stages(spec)
+    chunk_size = spec.get('chunk_size', 100_000)
+    output = spec['output']
+    merge = spec.get('merge')
+
+    jobs = []
+    for source in spec['sources']:
+        for file in source_files(source, base_dir):
+            jobs.append((file, source.get('collection', file.stem)))
+    if not jobs:
+        print("No input files matched the pipeline sources")
+        return {}
+
+    if merge is not None:
+        if 'aggregate' in merge:
+            merged = AggregatingCsvWriter(
+                base_dir / output['path'], merge['aggregate'], merge.get('cap'), merge.get('budget')
+            )
+        else:
+            merged = AtomicCsvWriter(base_dir / output['path'], dedupe=merge.get('dedupe', False))
+        writers = {file: merged for file, _ in jobs}
+    else:
+        output_dir = base_dir / output.get('dir', '.')
+        prefix = output.get('prefix', '')
+        writers = {file: AtomicCsvWriter(output_dir / f"{prefix}{collection}.csv") for file, collection in jobs}
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as executor:
+            futures = {
+                executor.submit(run_source, file, collection, stages, writers[file], chunk_size): (file, collection)
+                for file, collection in jobs
+            }
+            for future, (file, collection) in futures.items():
+                results[collection] = results.get(collection, 0) + future.result()
+                print(f"Processed {file.name} - {results[collection]} rows for {collection}")
+    except Exception:
+        for writer in set(writers.values()):
+            writer.abort()
+        raise
+
+    for writer in set(writers.values()):
+        writer.commit()
+        print(f"Wrote {writer.rows} rows to {writer.path}")
+    print(f"\nPipeline finished in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+def load_spec(path: str) -> dict:
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a declarative airdrop pipeline")
+    parser.add_argument("spec", help="Pipeline TOML file")
+    parser.add_argument("--workers", type=int, default=None, help="Sources processed in parallel")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], default=None)
+    args = parser.parse_args()
+
+    try:
+        with profiled(args.profile):
+            run_pipeline(load_spec(args.spec), max_workers=args.workers)
+    except Exception as e:
+        print(f"Pipeline failed, no output was replaced: {str(e)}")
@@ -0,0 +1,214 @@
+"""
+Reconciles FreeMintManager runs against a distribution.
+
+After each run the UI downloads successful_addresses_*.csv and
+failed_addresses_*.csv (address, amount, timestamp, error_timestamp). `record`
+appends them to a persistent ledger (Parquet, one row per submitted entry), and
+`delta` joins the ledger with a distribution to write exactly the rows that
+still have to be submitted:
+
+    python reconcile.py record ledger.parquet ~/Downloads/*_addresses_*.csv
+    python reconcile.py delta ledger.parquet distribution.csv --output remaining.csv
+
+An (address, expiration_timestamp) entry counts as minted once the ledger has a
+successful entry for it, so resubmitting the delta never mints twice. Entries
+whose minted amount differs from the distribution are written to a conflicts
+file instead of the delta, and rows the UI would fail on to a rejected file.
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from address import factorize_addresses, format_addresses, parse_addresses, valid_addresses
+from snapshot_format import address_array, address_values, read_frame
+
+LEDGER_SCHEMA = pa.schema([
+    pa.field('address', pa.binary(32), nullable=False),
+    pa.field('amount', pa.int64(), nullable=False),
+    pa.field('expiration_timestamp', pa.int64(), nullable=False),
+    pa.field('status', pa.dictionary(pa.int8(), pa.string()), nullable=False),
+    pa.field('source', pa.dictionary(pa.int32(), pa.string()), nullable=False),
+    pa.field('recorded_at', pa.int64(), nullable=False),
+])
+
+RESULT_STATUSES = {'successful_': 'success', 'failed_': 'failed'}
+
+
+def result_status(file: Path) -> str:
+    """'success' or 'failed', from the FreeMintManager download name"""
+    for prefix, status in RESULT_STATUSES.items():
+        if file.name.startswith(prefix):
+            return status
+    raise ValueError(f"{file.name} is not a FreeMintManager result file (successful_*/failed_*)")
+
+
+def read_result(file: Path, status: Optional[str] = None) -> pa.Table:
+    """Ledger rows of one result CSV"""
+    df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    df.columns = [col.strip().lower() for col in df.columns]
+    return pa.table({
+        'address': address_array(parse_addresses(df['address'])),
+        'amount': pa.array(df['amount'].astype('int64'), type=pa.int64()),
+        'expiration_timestamp': pa.array(df['timestamp'].astype('int64'), type=pa.int64()),
+        'status': pa.array([status or result_status(file)] * len(df), type=pa.string()),
+        'source': pa.array([file.name] * len(df), type=pa.string()),
+        'recorded_at': pa.array(np.full(len(df), int(time.time()), dtype=np.int64)),
+    }).cast(LEDGER_SCHEMA)
+
+
+class SubmissionLedger:
+    """
+    Append-only record of every submitted add_free_mint entry and its outcome,
+    stored as one Parquet file that is rewritten atomically on each change.
+    A result file is only recorded once (by file name).
+    """
+
+    def __init__(self, path: str = "ledger.parquet"):
+        self.path = Path(path)
+        if self.path.exists():
+            self.table = pq.read_table(self.path, memory_map=True).cast(LEDGER_SCHEMA)
+        else:
+            self.table = LEDGER_SCHEMA.empty_table()
+
+    def sources(self) -> set:
+        return set(pc.unique(self.table.column('source').combine_chunks().dictionary_decode()).to_pylist())
+
+    def record(self, files: Iterable, status: Optional[str] = None) -> int:
+        """Appends the result files not seen before; returns the number of new rows"""
+        known = self.sources()
+        tables = []
+        for file in map(Path, files):
+            if file.name in known:
+                print(f"Skipped {file.name} (already recorded)")
+                continue
+            table = read_result(file, status)
+            tables.append(table)
+            known.add(file.name)
+            print(f"Recorded {file.name} - {table.num_rows} {table.column('status')[0] if table.num_rows else ''} entries")
+        if tables:
+            self.table = pa.concat_tables([self.table, *tables]).unify_dictionaries().combine_chunks()
+            self.save()
+        return sum(table.num_rows for table in tables)
+
+    def save(self):
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        pq.write_table(self.table, tmp_path, compression='zstd')
+        os.replace(tmp_path, self.path)
+
+    def minted(self):
+        """(addresses, amounts, expiration timestamps) of the successful entries"""
+        success = self.table.filter(pc.equal(self.table.column('status').cast(pa.string()), 'success'))
+        return (
+            address_values(success.column('address')),
+            success.column('amount').to_numpy(),
+            success.column('expiration_timestamp').to_numpy(),
+        )
+
+    def delta(self, distribution: pd.DataFrame):
+        """
+        Split a distribution against the ledger with one hash join on
+        (address, expiration_timestamp), so a new distribution to an address
+        already minted in an earlier one is still submitted.
+
+        Returns:
+        (DataFrame of rows still to submit, DataFrame of conflicts: address,
+        expiration_timestamp, expected, minted, DataFrame of rejected rows with a
+        reason) for keys with no successful entry, respectively a minted total that
+        differs from the distribution total, and rows that cannot be submitted.
+        """
+        quantities = pd.to_numeric(distribution['quantity'], errors='coerce')
+        timestamps = pd.to_numeric(distribution['expiration_timestamp'], errors='coerce')
+        reasons = pd.Series(None, index=distribution.index, dtype=object)
+        reasons[~valid_addresses(distribution['address'])] = "invalid address"
+        reasons[reasons.isna() & (quantities.isna() | (quantities % 1 != 0))] = "quantity is not an integer"
+        reasons[reasons.isna() & (timestamps.isna() | (timestamps % 1 != 0))] = "expiration_timestamp is not an integer"
+        valid = reasons.isna().to_numpy()
+        rows = distribution[valid]
+        minted_addresses, minted_amounts, minted_timestamps = self.minted()
+
+        addresses, address_codes = factorize_addresses(
+            np.concatenate([minted_addresses, parse_addresses(rows['address'])])
+        )
+        all_timestamps = np.concatenate([minted_timestamps, timestamps[valid].to_numpy(dtype=np.int64)])
+        codes, keys = pd.factorize(pd.MultiIndex.from_arrays([address_codes, all_timestamps]))
+        minted_codes, row_codes = codes[:len(minted_addresses)], codes[len(minted_addresses):]
+        # Integer accumulation: bincount weights are float64, inexact above 2**53
+        minted = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(minted, minted_codes, minted_amounts.astype(np.int64))
+        expected = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(expected, row_codes, quantities[valid].to_numpy(dtype=np.int64))
+
+        remaining = np.zeros(len(distribution), dtype=bool)
+        remaining[valid] = minted[row_codes] == 0
+        in_distribution = np.bincount(row_codes, minlength=len(keys)) > 0
+        conflict = in_distribution & (minted > 0) & (minted != expected)
+        conflicts = pd.DataFrame({
+            'address': format_addresses(addresses[keys.get_level_values(0)[conflict]]),
+            'expiration_timestamp': keys.get_level_values(1)[conflict],
+            'expected': expected[conflict],
+            'minted': minted[conflict],
+        })
+        rejected = distribution[~valid].assign(reason=reasons[~valid])
+        return distribution[remaining], conflicts, rejected
+
+
+def write_delta(ledger_file, distribution_file, output_file=None) -> Path:
+    """
+    Writes the rows of `distribution_file` that are not minted yet (and a
+    <output>_conflicts.csv when some minted amounts differ, a <output>_rejected.csv
+    when some rows cannot be submitted).
+    """
+    distribution_file = Path(distribution_file)
+    output_file = Path(output_file) if output_file else distribution_file.with_name(
+        f"{distribution_file.stem}_remaining.csv"
+    )
+    distribution = read_frame(distribution_file)
+    remaining, conflicts, rejected = SubmissionLedger(ledger_file).delta(distribution)
+
+    tmp_file = output_file.with_name(f".{output_file.name}.tmp")
+    # No trailing newline: the UI splits on "\n" and fails on the empty last row
+    tmp_file.write_text(remaining.to_csv(index=False).rstrip('\n'))
+    os.replace(tmp_file, output_file)
+    print(f"{distribution_file.name}: {len(distribution) - len(remaining) - len(rejected)} minted, "
+          f"{len(remaining)} remaining -> {output_file}")
+    if len(conflicts):
+        conflicts_file = output_file.with_name(f"{output_file.stem}_conflicts.csv")
+        conflicts.to_csv(conflicts_file, index=False)
+        print(f"{len(conflicts)} entries minted with a different amount (see {conflicts_file})")
+    if len(rejected):
+        rejected_file = output_file.with_name(f"{output_file.stem}_rejected.csv")
+        rejected.to_csv(rejected_file, index=False)
+        print(f"Rejected {len(rejected)} rows (see {rejected_file})")
+    return output_file
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile FreeMintManager results with a distribution")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Add result CSVs to the ledger")
+    record_parser.add_argument("ledger")
+    record_parser.add_argument("results", nargs="+", help="successful_addresses_*.csv / failed_addresses_*.csv")
+
+    delta_parser = commands.add_parser("delta", help="Rows of a distribution that are not minted yet")
+    delta_parser.add_argument("ledger")
+    delta_parser.add_argument("distribution")
+    delta_parser.add_argument("--output", default=None)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        ledger = SubmissionLedger(args.ledger)
+        new_rows = ledger.record(args.results)
+        print(f"\n{new_rows} new entries, {ledger.table.num_rows} in {args.ledger}")
+    else:
+        write_delta(args.ledger, args.distribution, args.output)
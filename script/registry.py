@@ -0,0 +1,25 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+DEFAULT_REGISTRY = Path(__file__).parent / "collections.json"
+
+
+def load_registry(path=DEFAULT_REGISTRY, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Load the collection registry: collection name -> {"address", "type"} where
+    type is "nft" or "token", optionally restricted to some collection names.
+    """
+    with open(path) as f:
+        collections = json.load(f)
+
+    for name, info in collections.items():
+        if info.get("type") not in ("nft", "token") or "address" not in info:
+            raise ValueError(f"Invalid registry entry for {name}: {info}")
+
+    if names:
+        unknown = set(names) - set(collections)
+        if unknown:
+            raise ValueError(f"Unknown collections: {', '.join(sorted(unknown))}")
+        collections = {name: collections[name] for name in names}
+    return collections
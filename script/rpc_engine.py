@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+import aiohttp
+
+from metrics import REGISTRY, Metrics
+
+
+class RequestBudgetExceeded(Exception):
+    """Raised when an engine has already sent its maximum number of requests"""
+
+
+class AimdWindow:
+    """
+    Bounded in-flight window sized with AIMD (additive increase, multiplicative decrease).
+
+    The window grows by `increase` after every `limit` successful calls as long as
+    latency stays within `latency_tolerance` of the best latency seen so far, and
+    is multiplied by `decrease` on throttling (429, timeouts).
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 256,
+        increase: int = 1,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.base_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def size(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.size)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify(max(1, self.size - self.in_flight))
+
+    def on_success(self, latency: float):
+        if self.base_latency is None or latency < self.base_latency:
+            self.base_latency = latency
+        if latency <= self.base_latency * self.latency_tolerance:
+            # +increase per full window of successes
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def on_throttle(self):
+        # A burst of 429s from one window only counts as one congestion signal
+        now = time.monotonic()
+        if now - self._last_decrease < (self.base_latency or 0.1):
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """
+    Returns True for errors that mean "slow down / try again" rather than "this
+    call is invalid": timeouts, dropped connections, HTTP 429/502/503/504 and
+    rate-limit messages from the node.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, aiohttp.ClientConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status", None)
+    if str(code) in ("429", "502", "503", "504"):
+        return True
+    message = str(error).lower()
+    return "too many requests" in message or "rate limit" in message
+
+
+class RequestEngine:
+    """
+    Shared async request engine: every call goes through one AIMD window and is
+    retried with exponential backoff (plus jitter) on throttling errors.
+    Other errors are raised to the caller straight away. `max_calls` optionally
+    caps the total number of requests sent (retries included). Retries,
+    throttling and the in-flight count are recorded in `metrics`.
+    """
+
+    def __init__(
+        self,
+        window: Optional[AimdWindow] = None,
+        timeout: float = 30.0,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_calls: Optional[int] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.window = window or AimdWindow()
+        self.metrics = metrics or REGISTRY
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_calls = max_calls
+        self.calls = 0
+        self.retries = 0
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            await self.window.acquire()
+            self.metrics.set("rpc_in_flight", self.window.in_flight)
+            start = time.monotonic()
+            try:
+                if self.max_calls is not None and self.calls >= self.max_calls:
+                    raise RequestBudgetExceeded(f"Request budget of {self.max_calls} calls exhausted")
+                self.calls += 1
+                result = await asyncio.wait_for(func(*args, **kwargs), self.timeout)
+            except Exception as e:
+                if not is_throttle_error(e) or attempt >= self.max_retries:
+                    raise
+                self.metrics.inc("rpc_throttled_total")
+                self.window.on_throttle()
+            else:
+                self.window.on_success(time.monotonic() - start)
+                return result
+            finally:
+                await self.window.release()
+                self.metrics.set("rpc_in_flight", self.window.in_flight)
+                self.metrics.set("rpc_window_size", self.window.size)
+
+            attempt += 1
+            self.retries += 1
+            self.metrics.inc("rpc_retries_total")
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def map(
+        self,
+        func: Callable[[Any], Awaitable[Any]],
+        items: Iterable[Any],
+        return_exceptions: bool = True,
+    ) -> List[Any]:
+        """
+        Runs func(item) for every item with at most `window.size` calls in flight.
+        Results are returned in input order; failed calls yield their exception
+        when return_exceptions is True.
+        """
+        items = list(items)
+        results: List[Any] = [None] * len(items)
+        # Caps the number of pending tasks so huge scans don't allocate one coroutine per item up front
+        pending = asyncio.Semaphore(self.window.maximum * 2)
+
+        async def run(index: int, item: Any):
+            try:
+                results[index] = await self.call(func, item)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[index] = e
+            finally:
+                pending.release()
+
+        tasks = []
+        for index, item in enumerate(items):
+            await pending.acquire()
+            tasks.append(asyncio.create_task(run(index, item)))
+        await asyncio.gather(*tasks)
+        return results
@@ -4,99 +4,124 @@ import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
 
-def transform_csv_files(input_folder, total_tokens=500, min_tokens=2):
+from allocation import allocate, weights_from_points
+from parallel import map_files
+
+def transform_file(file, total_tokens, min_tokens, max_tokens, weighting, tiers, future_timestamp):
+    """
+    Transform one CSV file (see transform_csv_files) into transformed_<collection>.csv
+    
+    Returns:
+    dict: columns found, mode ('quantity', 'points' or None when skipped), the
+    allocation warning if any, and the distribution stats
+    """
+    # Read input CSV
+    df = pd.read_csv(file)
+    collection_name = file.stem
+    result = {'columns': df.columns.tolist(), 'mode': None, 'warning': None}
+    
+    # More robust column check
+    has_quantity = any(col.strip().lower() == 'quantity' for col in df.columns)
+    has_points = any(col.strip().lower() == 'points' for col in df.columns)
+    
+    if has_quantity:
+        result['mode'] = 'quantity'
+        
+        # Get the actual quantity column name (preserving original case)
+        quantity_col = next(col for col in df.columns if col.strip().lower() == 'quantity')
+        
+        # Keep original structure, just ensure all required columns exist
+        new_df = pd.DataFrame({
+            'address': df['address'],
+            'quantity': df[quantity_col],  # Use the original column name
+            'collection': collection_name,
+            'expiration_timestamp': future_timestamp
+        })
+        
+    elif has_points:
+        result['mode'] = 'points'
+        
+        # Exact apportionment: quantities always add up to total_tokens
+        weights = weights_from_points(df['points'], weighting, tiers)
+        try:
+            quantities = allocate(weights, total_tokens, min_tokens, max_tokens)
+        except ValueError as e:
+            result['warning'] = f"{str(e)}. Setting all to minimum ({min_tokens})"
+            quantities = np.full(len(df), min_tokens, dtype=int)
+        
+        new_df = pd.DataFrame({
+            'address': df['address'],
+            'quantity': quantities,
+            'collection': collection_name,
+            'expiration_timestamp': future_timestamp
+        })
+    else:
+        return result
+    
+    # Final safety check to ensure no negative values
+    new_df['quantity'] = new_df['quantity'].clip(lower=min_tokens)
+    
+    # Save to CSV
+    output_filename = f"transformed_{collection_name}.csv"
+    new_df.to_csv(output_filename, index=False)
+    result.update({
+        'output': output_filename,
+        'addresses': len(new_df),
+        'total': new_df['quantity'].sum(),
+        'mean': new_df['quantity'].mean(),
+        'max': new_df['quantity'].max(),
+        'min': new_df['quantity'].min(),
+    })
+    return result
+
+def transform_csv_files(input_folder, total_tokens=500, min_tokens=2, max_tokens=None, weighting="linear", tiers=None,
+                        max_workers=None, memory_budget=None):
     """
     Transform CSV files:
     - If file has 'quantity' column: preserve those values
-    - If file has 'points' column: calculate new quantities with minimum 2
-    Ensures no negative values in output
+    - If file has 'points' column: split exactly total_tokens by points with
+      largest-remainder apportionment, between min_tokens and max_tokens each
+      (weighting "linear", "sqrt" or "log", or tiers [(min_points, weight), ...])
+    Ensures no negative values in output. Files are transformed in parallel
+    worker processes (at most max_workers, within memory_budget bytes).
     """
     folder = Path(input_folder)
     future_date = datetime.now() + timedelta(days=10)
     future_timestamp = int(future_date.timestamp())
     
     # Process each CSV file
-    for file in folder.glob('*.csv'):
-        try:
-            # Read input CSV
-            df = pd.read_csv(file)
-            collection_name = file.stem
-            
-            # Print columns for debugging
-            print(f"\nColumns in {file.name}:", df.columns.tolist())
-            
-            # More robust column check
-            has_quantity = any(col.strip().lower() == 'quantity' for col in df.columns)
-            has_points = any(col.strip().lower() == 'points' for col in df.columns)
-            
-            print(f"Has quantity column: {has_quantity}")
-            print(f"Has points column: {has_points}")
-            
-            if has_quantity:
-                print(f"\nProcessing {file.name} (preserving existing quantities)")
-                
-                # Get the actual quantity column name (preserving original case)
-                quantity_col = next(col for col in df.columns if col.strip().lower() == 'quantity')
-                
-                # Keep original structure, just ensure all required columns exist
-                new_df = pd.DataFrame({
-                    'address': df['address'],
-                    'quantity': df[quantity_col],  # Use the original column name
-                    'collection': collection_name,
-                    'expiration_timestamp': future_timestamp
-                })
-                
-            elif has_points:
-                print(f"\nProcessing {file.name} (calculating quantities from points)")
-                
-                # Ensure points are non-negative
-                df['points'] = df['points'].clip(lower=0)
-                total_points = df['points'].sum()
-                
-                if total_points > 0:
-                    # Calculate proportional distribution
-                    num_addresses = len(df)
-                    available_tokens = total_tokens - (num_addresses * min_tokens)
-                    
-                    if available_tokens < 0:
-                        print(f"Warning: Not enough tokens to distribute. Setting all to minimum ({min_tokens})")
-                        quantities = np.full(len(df), min_tokens, dtype=int)
-                    else:
-                        # Calculate proportional quantities and round to integers
-                        extra_quantities = (df['points'] / total_points * available_tokens).round().astype(int)
-                        quantities = extra_quantities + min_tokens
-                else:
-                    print("Warning: Total points is 0. Setting all quantities to minimum.")
-                    quantities = np.full(len(df), min_tokens, dtype=int)
-                
-                new_df = pd.DataFrame({
-                    'address': df['address'],
-                    'quantity': quantities,
-                    'collection': collection_name,
-                    'expiration_timestamp': future_timestamp
-                })
-            else:
-                print(f"Warning: {file.name} has neither 'quantity' nor 'points' columns. Skipping.")
-                continue
-            
-            # Final safety check to ensure no negative values
-            new_df['quantity'] = new_df['quantity'].clip(lower=min_tokens)
-            
-            # Print statistics
-            print(f"Distribution stats for {collection_name}:")
-            print(f"Total addresses: {len(new_df)}")
-            print(f"Total tokens distributed: {new_df['quantity'].sum()}")
-            print(f"Average tokens per address: {new_df['quantity'].mean():.1f}")
-            print(f"Max tokens: {new_df['quantity'].max()}")
-            print(f"Min tokens: {new_df['quantity'].min()}")
-            
-            # Save to CSV
-            output_filename = f"transformed_{collection_name}.csv"
-            new_df.to_csv(output_filename, index=False)
-            print(f"Created {output_filename}")
-            
-        except Exception as e:
-            print(f"Error processing {file.name}: {str(e)}")
+    report = map_files(
+        transform_file, list(folder.glob('*.csv')),
+        total_tokens, min_tokens, max_tokens, weighting, tiers, future_timestamp,
+        max_workers=max_workers, memory_budget=memory_budget,
+    )
+    for file, result in report.results.items():
+        collection_name = file.stem
+        
+        # Print columns for debugging
+        print(f"\nColumns in {file.name}:", result['columns'])
+        
+        if result['mode'] is None:
+            print(f"Warning: {file.name} has neither 'quantity' nor 'points' columns. Skipping.")
+            continue
+        if result['mode'] == 'quantity':
+            print(f"\nProcessing {file.name} (preserving existing quantities)")
+        else:
+            print(f"\nProcessing {file.name} (calculating quantities from points)")
+        if result['warning']:
+            print(f"Warning: {result['warning']}")
+        
+        # Print statistics
+        print(f"Distribution stats for {collection_name}:")
+        print(f"Total addresses: {result['addresses']}")
+        print(f"Total tokens distributed: {result['total']}")
+        print(f"Average tokens per address: {result['mean']:.1f}")
+        print(f"Max tokens: {result['max']}")
+        print(f"Min tokens: {result['min']}")
+        print(f"Created {result['output']}")
+    
+    report.print_summary()
+    return report
 
 # Example usage
 if __name__ == "__main__":
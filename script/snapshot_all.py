@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+import snapshot_format
+from clients import client_session, make_rpc
+from holder_store import CONFIRMATIONS, HolderStore
+from metrics import REGISTRY, export_metrics, profiled
+from registry import DEFAULT_REGISTRY, load_registry
+from rpc_engine import AimdWindow, RequestEngine
+from starknet_rpc import StarknetRpc
+from transfer_events import fetch_transfers, fold_balances, fold_owners
+
+
+async def snapshot_collection(
+    rpc: StarknetRpc,
+    name: str,
+    info: Dict[str, str],
+    to_block: int,
+    store: Optional[HolderStore] = None,
+) -> Dict[str, int]:
+    """
+    Address -> quantity for one collection: number of NFTs held, or ERC20 balance
+    in base units. With a store, only the blocks after its checkpoint are fetched.
+    """
+    address = info["address"]
+    if store is not None:
+        await store.refresh(rpc, address, info["type"], int(info.get("start_block", 0)), to_block=to_block)
+        return store.holders_at(address, to_block)
+
+    transfers = await fetch_transfers(rpc, address, int(info.get("start_block", 0)), to_block)
+    if info["type"] == "token":
+        return fold_balances(transfers)
+    return dict(Counter(fold_owners(transfers).values()))
+
+
+def write_snapshot(holders: Dict[str, int], name: str, output_dir: Path, expiration_timestamp: int) -> Path:
+    """Writes a typed Parquet snapshot (exact base-unit quantities, see snapshot_format)"""
+    df = pd.DataFrame({
+        'address': list(holders.keys()),
+        'quantity': list(holders.values()),
+        'collection': name,
+        'expiration_timestamp': expiration_timestamp
+    })
+    output_file = output_dir / f"{name}.parquet"
+    snapshot_format.write_snapshot(snapshot_format.to_table(df), output_file)
+    return output_file
+
+
+async def snapshot_all(
+    collections: Dict[str, Dict[str, str]],
+    rpc_url: str,
+    output_dir: str,
+    max_in_flight: int = 64,
+    max_requests: Optional[int] = None,
+    store_path: Optional[str] = None,
+) -> Dict[str, Optional[int]]:
+    """
+    Snapshot every collection concurrently on one event loop. All collections share
+    one keep-alive connection pool and one request engine, so `max_in_flight` and
+    `max_requests` are global limits rather than per-collection ones.
+    Returns collection name -> number of holders (None when the collection failed).
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    expiration_timestamp = int((datetime.now() + timedelta(days=10)).timestamp())
+    store = HolderStore(store_path) if store_path else None
+
+    engine = RequestEngine(window=AimdWindow(maximum=max_in_flight), max_calls=max_requests)
+    results: Dict[str, Optional[int]] = {}
+
+    async with client_session(max_connections=max_in_flight) as session:
+        rpc = make_rpc(rpc_url, session, engine)
+        # Same head block for every collection so the snapshots are consistent (with a
+        # store, the last final block, since stored history must not be reorged)
+        to_block = await rpc.block_number()
+        if store is not None:
+            to_block -= CONFIRMATIONS
+
+        async def run(name: str, info: Dict[str, str]):
+            start = time.perf_counter()
+            try:
+                holders = await snapshot_collection(rpc, name, info, to_block, store)
+                output_file = write_snapshot(holders, name, output_path, expiration_timestamp)
+                results[name] = len(holders)
+                print(f"{name}: {len(holders)} holders in {time.perf_counter() - start:.1f}s -> {output_file}")
+            except Exception as e:
+                results[name] = None
+                print(f"Error snapshotting {name}: {str(e)}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run(name, info) for name, info in collections.items()))
+
+    if store is not None:
+        store.close()
+    print(
+        f"\nSnapshotted {sum(r is not None for r in results.values())}/{len(collections)} collections "
+        f"in {time.perf_counter() - start:.1f}s ({rpc.http_requests} HTTP requests, "
+        f"{engine.retries} retries)"
+    )
+    return results
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot every collection of the registry concurrently")
+    parser.add_argument("collections", nargs="*", help="Collection names (default: the whole registry)")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY)
+    parser.add_argument("--rpc-url", default=os.environ.get("RPC_URL", "https://starknet-mainnet.public.blastapi.io/"))
+    parser.add_argument("--output-dir", default="./output/snapshots")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--max-requests", type=int, default=None)
+    parser.add_argument("--store", default=None, help="Holder store database for incremental refreshes")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], default=None)
+    parser.add_argument("--metrics", default=os.environ.get("METRICS_FILE"), help="Write metrics to a .prom or .json file")
+    args = parser.parse_args()
+
+    with profiled(args.profile):
+        asyncio.run(snapshot_all(
+            load_registry(args.registry, args.collections),
+            args.rpc_url,
+            args.output_dir,
+            args.max_in_flight,
+            args.max_requests,
+            args.store,
+        ))
+    export_metrics(REGISTRY, args.metrics)
@@ -0,0 +1,217 @@
+"""
+Typed columnar (Parquet) format for holder snapshots and distributions.
+
+    address               fixed_size_binary(32)   canonical felt, big endian
+    quantity              decimal128(38, 0)       exact integer amount in base units
+    collection            dictionary<string>      one copy of each name per row group
+    expiration_timestamp  int64
+
+Rows are sorted by (collection, address), so row-group statistics let filters on
+either column skip data. Reads are memory mapped and only decode the projected
+columns. CSV is only produced by `export_csv`, for the FreeMintManager upload.
+"""
+
+import argparse
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from address import ADDRESS_DTYPE, format_addresses, parse_addresses
+from balances import collection_decimals, parse_balances
+
+QUANTITY_TYPE = pa.decimal128(38, 0)
+
+SCHEMA = pa.schema([
+    pa.field('address', pa.binary(32), nullable=False),
+    pa.field('quantity', QUANTITY_TYPE, nullable=False),
+    pa.field('collection', pa.dictionary(pa.int32(), pa.string()), nullable=False),
+    pa.field('expiration_timestamp', pa.int64(), nullable=False),
+])
+
+SNAPSHOT_SUFFIXES = ('.parquet', '.csv')
+
+
+def address_array(addresses: np.ndarray) -> pa.FixedSizeBinaryArray:
+    """Zero-copy view of an S32 array as an Arrow fixed_size_binary(32) array"""
+    addresses = np.ascontiguousarray(addresses, dtype=ADDRESS_DTYPE)
+    return pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(32), len(addresses), [None, pa.py_buffer(addresses)]
+    )
+
+
+def address_values(column) -> np.ndarray:
+    """S32 array of an Arrow fixed_size_binary(32) column, without hex round trips"""
+    array = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if len(array) == 0:
+        return np.empty(0, dtype=ADDRESS_DTYPE)
+    data = np.frombuffer(array.buffers()[1], dtype=ADDRESS_DTYPE)
+    return data[array.offset:array.offset + len(array)]
+
+
+def to_table(df: pd.DataFrame, decimals: int = 0, unit: Optional[str] = None) -> pa.Table:
+    """
+    Snapshot DataFrame (address, quantity, collection, expiration_timestamp) to a
+    typed table. Quantities may be integers or formatted balances such as
+    "4,654,563.40 LORDS" (token with `decimals` decimals); malformed ones raise ValueError.
+    """
+    addresses = parse_addresses(df['address'])
+    quantities, valid = parse_balances(df['quantity'], decimals, unit)
+    if not valid.all():
+        bad = np.flatnonzero(~valid)
+        examples = ", ".join(f"row {i}: {df['quantity'].iloc[i]!r}" for i in bad[:5])
+        raise ValueError(f"{len(bad)} invalid quantities ({examples})")
+    table = pa.table({
+        'address': address_array(addresses),
+        'quantity': quantities,
+        'collection': pa.array(df['collection'].astype(str), type=pa.string()),
+        'expiration_timestamp': pa.array(df['expiration_timestamp'].astype('int64'), type=pa.int64()),
+    })
+    # Sort on the plain strings, then dictionary encode the collection
+    table = table.sort_by([('collection', 'ascending'), ('address', 'ascending')])
+    return table.cast(SCHEMA)
+
+
+def to_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    Typed table to a DataFrame: canonical address strings, Python int quantities
+    (exact at any size) and a categorical collection. Only the columns present
+    in the table are converted.
+    """
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name == 'address':
+            columns[name] = format_addresses(address_values(column))
+        elif name == 'quantity':
+            columns[name] = pd.Series([int(q) for q in column.to_pylist()], dtype=object)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns)
+
+
+def write_snapshot(table: pa.Table, path, row_group_size: int = 1 << 17):
+    """Atomically writes a snapshot: temporary file, then rename over `path`"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    pq.write_table(
+        table.cast(SCHEMA),
+        tmp_path,
+        row_group_size=row_group_size,
+        compression='zstd',
+        write_statistics=True,
+    )
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(
+    path,
+    columns: Optional[Sequence[str]] = None,
+    filters=None,
+    memory_map: bool = True,
+) -> pa.Table:
+    """
+    Memory-mapped read of a snapshot file or folder of snapshot files.
+
+    Only `columns` are decoded, and `filters` (pyarrow DNF, e.g.
+    [('collection', '=', 'lords')]) are pushed down to skip whole row groups.
+    """
+    path = Path(path)
+    source = sorted(str(f) for f in path.glob('*.parquet')) if path.is_dir() else str(path)
+    return pq.read_table(source, columns=columns, filters=filters, memory_map=memory_map)
+
+
+def snapshot_files(folder) -> List[Path]:
+    """
+    Snapshot files of a folder, Parquet and CSV, one per stem: after convert_csv
+    the Parquet copy is read instead of the CSV it was made from, never both.
+    """
+    folder = Path(folder)
+    files = {}
+    for suffix in SNAPSHOT_SUFFIXES:  # Parquet first
+        for file in folder.glob(f'*{suffix}'):
+            if file.stem not in files:
+                files[file.stem] = file
+            elif file.stat().st_mtime > files[file.stem].stat().st_mtime:
+                print(f"Warning: {file.name} is newer than {files[file.stem].name}, which is used instead "
+                      f"(re-run convert_csv)")
+    return sorted(files.values())
+
+
+def read_frame(file, columns: Optional[Sequence[str]] = None, filters=None) -> pd.DataFrame:
+    """
+    DataFrame of a snapshot file in either format, so every tool accepts both.
+    Parquet reads use projection and predicate pushdown; CSV reads only parse `columns`.
+    """
+    file = Path(file)
+    if file.suffix == '.parquet':
+        return to_frame(read_snapshot(file, columns=columns, filters=filters))
+    return pd.read_csv(file, usecols=columns)
+
+
+def read_addresses(file) -> np.ndarray:
+    """S32 addresses of a snapshot file; Parquet files skip hex parsing entirely"""
+    file = Path(file)
+    if file.suffix == '.parquet':
+        return address_values(read_snapshot(file, columns=['address']).column('address'))
+    return parse_addresses(pd.read_csv(file, usecols=['address'])['address'])
+
+
+def convert_csv(csv_file, output_file=None, decimals: Optional[int] = None) -> Path:
+    """
+    Converts a CSV snapshot to Parquet next to it (or to `output_file`). Token
+    decimals and symbol come from the collection registry unless `decimals` is given.
+    """
+    csv_file = Path(csv_file)
+    output_file = Path(output_file) if output_file else csv_file.with_suffix('.parquet')
+    df = pd.read_csv(csv_file, dtype={'address': str, 'quantity': str})
+    unit = None
+    if decimals is None:
+        decimals, unit = collection_decimals(df['collection'].iloc[0]) if len(df) else (0, None)
+    write_snapshot(to_table(df, decimals, unit), output_file)
+    print(f"Converted {csv_file.name}: {len(df)} rows -> {output_file}")
+    return output_file
+
+
+def export_csv(snapshot_file, csv_file=None, filters=None) -> Path:
+    """CSV in the FreeMintManager upload format (integer quantities)"""
+    snapshot_file = Path(snapshot_file)
+    csv_file = Path(csv_file) if csv_file else snapshot_file.with_suffix('.csv')
+    df = to_frame(read_snapshot(snapshot_file, filters=filters))
+    tmp_file = csv_file.with_name(f".{csv_file.name}.tmp")
+    # No trailing newline: the UI splits on "\n" and fails on the empty last row
+    tmp_file.write_text(df.to_csv(index=False).rstrip('\n'))
+    os.replace(tmp_file, csv_file)
+    print(f"Exported {len(df)} rows to {csv_file}")
+    return csv_file
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar snapshot files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="CSV snapshot(s) to Parquet")
+    convert_parser.add_argument("paths", nargs="+", help="CSV files or folders")
+    convert_parser.add_argument("--decimals", type=int, default=None, help="Default: from the collection registry")
+
+    export_parser = commands.add_parser("export", help="Parquet snapshot to a FreeMintManager CSV")
+    export_parser.add_argument("snapshot")
+    export_parser.add_argument("--output", default=None)
+    export_parser.add_argument("--collection", default=None, help="Only export this collection")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        for path in map(Path, args.paths):
+            for csv_file in sorted(path.glob('*.csv')) if path.is_dir() else [path]:
+                try:
+                    convert_csv(csv_file, decimals=args.decimals)
+                except Exception as e:
+                    print(f"Error converting {csv_file.name}: {str(e)}")
+    else:
+        filters = [('collection', '=', args.collection)] if args.collection else None
+        export_csv(args.snapshot, args.output, filters)
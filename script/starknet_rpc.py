@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+
+from aiohttp import ClientSession
+from starknet_py.hash.selector import get_selector_from_name
+from starknet_py.net.client_errors import ClientError
+
+from metrics import Metrics
+from rpc_engine import RequestEngine
+
+
+class BatchNotSupported(Exception):
+    """Raised when the endpoint answers a JSON-RPC batch array with anything but an array"""
+
+
+# HTTP statuses that mean the endpoint refuses batch arrays (bad request, method not allowed, too large)
+BATCH_REJECTED_STATUSES = ("400", "405", "413")
+
+
+# JSON-RPC CONTRACT_ERROR, and the ownerOf reverts (OpenZeppelin ERC721, Cairo 1 and
+# Cairo 0) of an id that was never minted or was burnt
+CONTRACT_ERROR = 40
+NONEXISTENT_TOKEN_REVERTS = ("ERC721: invalid token ID", "ERC721: owner query for nonexistent token")
+
+
+def is_nonexistent_token(error: BaseException) -> bool:
+    """
+    True only for the contract's nonexistent-token revert. Any other error (HTTP
+    5xx, internal error, missing batch slot, throttling...) may be transient, so
+    it never means the token is gone. The revert reason may come as text or as
+    the hex encoding of the short string.
+    """
+    if not isinstance(error, ClientError) or str(error.code) != str(CONTRACT_ERROR):
+        return False
+    text = f"{error.message} {error.data}".lower()
+    return any(
+        reason.lower() in text or reason.encode().hex() in text for reason in NONEXISTENT_TOKEN_REVERTS
+    )
+
+
+def u256_calldata(value: int) -> List[str]:
+    """Serializes a Uint256 / u256 argument as [low, high] felts"""
+    return [hex(value & ((1 << 128) - 1)), hex(value >> 128)]
+
+
+class StarknetRpc:
+    """
+    Thin JSON-RPC client for the raw calls starknet_py does not expose: batched
+    `starknet_call`s and event paging. Every HTTP request goes through the shared
+    RequestEngine so batches are throttled and retried like single calls.
+    Requests, errors and latency are recorded per JSON-RPC method in the
+    engine's metrics registry.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: Optional[ClientSession] = None,
+        engine: Optional[RequestEngine] = None,
+        batch_size: int = 200,
+    ):
+        self.url = url
+        self.engine = engine or RequestEngine()
+        self.batch_size = batch_size
+        self.batch_supported = True
+        self.http_requests = 0
+        self.metrics: Metrics = self.engine.metrics
+        self._session = session
+        self._owns_session = session is None
+        self._ids = itertools.count()
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None:
+            self._session = ClientSession()
+        return self._session
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "StarknetRpc":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _post(self, payload: Any) -> Any:
+        self.http_requests += 1
+        batch = isinstance(payload, list)
+        method = (payload[0] if batch and payload else payload)["method"] if payload else "empty"
+        labels = {"method": method, "batch": str(batch).lower()}
+        self.metrics.inc("rpc_requests_total", **labels)
+        self.metrics.inc("rpc_calls_total", len(payload) if batch else 1, method=method)
+        start = time.perf_counter()
+        try:
+            async with self.session.post(self.url, json=payload) as response:
+                if response.status >= 300:
+                    raise ClientError(code=str(response.status), message=await response.text())
+                return await response.json(content_type=None)
+        except Exception as e:
+            self.metrics.inc("rpc_errors_total", code=str(getattr(e, "code", None) or type(e).__name__), **labels)
+            raise
+        finally:
+            self.metrics.observe("rpc_latency_seconds", time.perf_counter() - start, **labels)
+
+    def _payload(self, method: str, params: Any) -> dict:
+        return {"jsonrpc": "2.0", "method": method, "params": params, "id": next(self._ids)}
+
+    @staticmethod
+    def _unwrap(response: dict) -> Any:
+        if "error" in response:
+            error = response["error"]
+            return ClientError(
+                code=error.get("code"), message=error.get("message", ""), data=error.get("data")
+            )
+        return response["result"]
+
+    async def _request(self, method: str, params: Any) -> Any:
+        result = self._unwrap(await self._post(self._payload(method, params)))
+        if isinstance(result, ClientError):
+            raise result
+        return result
+
+    async def request(self, method: str, params: Any) -> Any:
+        """Single JSON-RPC call, throttled and retried by the engine"""
+        return await self.engine.call(self._request, method, params)
+
+    async def _batch(self, calls: Sequence[Tuple[str, Any]]) -> List[Any]:
+        payloads = [self._payload(method, params) for method, params in calls]
+        try:
+            responses = await self._post(payloads)
+        except ClientError as e:
+            # Only a rejection of the request itself disables batching; throttling and
+            # 5xx errors go back to the engine (retried when transient)
+            if str(e.code) not in BATCH_REJECTED_STATUSES:
+                raise
+            raise BatchNotSupported(str(e)) from e
+        if not isinstance(responses, list):
+            raise BatchNotSupported(str(responses))
+
+        # Responses may come back in any order, match them on id
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for payload in payloads:
+            response = by_id.get(payload["id"])
+            if response is None:
+                results.append(ClientError(message=f"Missing response for request {payload['id']}"))
+            else:
+                results.append(self._unwrap(response))
+        return results
+
+    async def _send_chunk(self, chunk: Sequence[Tuple[str, Any]]) -> List[Any]:
+        if self.batch_supported:
+            try:
+                return await self.engine.call(self._batch, chunk)
+            except BatchNotSupported:
+                self.batch_supported = False
+        return await asyncio.gather(
+            *(self.engine.call(self._request, *call) for call in chunk), return_exceptions=True
+        )
+
+    async def batch(self, calls: Sequence[Tuple[str, Any]]) -> List[Any]:
+        """
+        Sends (method, params) pairs as JSON-RPC batch arrays of at most `batch_size`,
+        with as many batches in flight as the engine window allows. Per-call errors
+        are returned in place as exceptions, and so is the error of a whole batch
+        that failed (retries exhausted, connection lost) for each of its calls.
+        Falls back to single calls for good if the endpoint rejects batches.
+        """
+        chunks = [calls[start:start + self.batch_size] for start in range(0, len(calls), self.batch_size)]
+        results = await asyncio.gather(*(self._send_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        return [
+            result
+            for chunk, chunk_results in zip(chunks, results)
+            for result in ([chunk_results] * len(chunk) if isinstance(chunk_results, Exception) else chunk_results)
+        ]
+
+    async def call_many(
+        self,
+        contract_address: str,
+        function_name: str,
+        calldata: Sequence[List[str]],
+        block_id: str = "latest",
+    ) -> List[Any]:
+        """
+        Calls one view function with many calldata sets. Returns the raw felt
+        list for each call, or the ClientError it failed with.
+        """
+        selector = hex(get_selector_from_name(function_name))
+        calls = [
+            (
+                "starknet_call",
+                {
+                    "request": {
+                        "contract_address": contract_address,
+                        "entry_point_selector": selector,
+                        "calldata": data,
+                    },
+                    "block_id": block_id,
+                },
+            )
+            for data in calldata
+        ]
+        return await self.batch(calls)
+
+    async def block_number(self) -> int:
+        return await self.request("starknet_blockNumber", [])
+
+    async def get_events(
+        self,
+        contract_address: str,
+        keys: Sequence[Sequence[str]],
+        from_block: int,
+        to_block: int,
+        chunk_size: int = 1000,
+    ) -> List[dict]:
+        """
+        Pages through starknet_getEvents for one contract and block range using
+        continuation tokens. Events are returned in chain order.
+        """
+        events: List[dict] = []
+        continuation_token = None
+        while True:
+            event_filter = {
+                "from_block": {"block_number": from_block},
+                "to_block": {"block_number": to_block},
+                "address": contract_address,
+                "keys": [list(key) for key in keys],
+                "chunk_size": chunk_size,
+            }
+            if continuation_token:
+                event_filter["continuation_token"] = continuation_token
+            page = await self.request("starknet_getEvents", {"filter": event_filter})
+            events.extend(page["events"])
+            continuation_token = page.get("continuation_token")
+            if not continuation_token:
+                return events
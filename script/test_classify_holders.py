@@ -0,0 +1,57 @@
+"""
+Classification of holders against the local mock node: Cartridge controllers
+have no pinned class hash in account_classes.json, so they must be recognised
+as accounts by the SRC6 probe.
+
+    python -m pytest test_classify_holders.py
+"""
+
+import asyncio
+
+from classify_holders import ClassCache, classify_addresses, load_account_classes
+from mock_node import ACCOUNT_CLASS_HASH, MockStarknetNode
+from rpc_engine import RequestEngine
+from starknet_rpc import StarknetRpc
+
+PLAYER = hex(0x1000)
+POOL = hex(0x1001)
+UNDEPLOYED = hex(0x1002)
+
+
+async def _classify(cache_path, account_classes):
+    node = MockStarknetNode(holders=3, latency=0.0, contracts={0x1001}, undeployed={0x1002})
+    url = await node.start()
+    cache = ClassCache(cache_path)
+    try:
+        async with StarknetRpc(url, engine=RequestEngine()) as rpc:
+            classes = await classify_addresses(rpc, [PLAYER, POOL, UNDEPLOYED], cache, account_classes)
+        return classes.set_index('address'), node.rpc_calls
+    finally:
+        cache.close()
+        await node.stop()
+
+
+def test_default_classes_pin_no_controller():
+    assert 'cartridge' not in load_account_classes().values()
+
+
+def test_unpinned_controller_is_an_account_by_probe(tmp_path):
+    classes, _ = asyncio.run(_classify(tmp_path / "classes.db", load_account_classes()))
+    assert classes.loc[PLAYER, 'class_hash'] == hex(ACCOUNT_CLASS_HASH)
+    assert (classes.loc[PLAYER, 'kind'], classes.loc[PLAYER, 'label']) == ("account", "src6")
+    assert classes.loc[POOL, 'kind'] == "contract"
+    assert classes.loc[UNDEPLOYED, 'kind'] == "undeployed"
+
+
+def test_probe_result_is_cached(tmp_path):
+    asyncio.run(_classify(tmp_path / "classes.db", load_account_classes()))
+    classes, rpc_calls = asyncio.run(_classify(tmp_path / "classes.db", load_account_classes()))
+    assert classes.loc[PLAYER, 'kind'] == "account"
+    # Only the undeployed address is looked up again, nothing is probed
+    assert rpc_calls == 1
+
+
+def test_pinned_controller_class_is_labelled(tmp_path):
+    account_classes = {**load_account_classes(), hex(ACCOUNT_CLASS_HASH): "cartridge"}
+    classes, _ = asyncio.run(_classify(tmp_path / "classes.db", account_classes))
+    assert (classes.loc[PLAYER, 'kind'], classes.loc[PLAYER, 'label']) == ("account", "cartridge")
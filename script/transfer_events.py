@@ -0,0 +1,122 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from starknet_py.hash.selector import get_selector_from_name
+
+from starknet_rpc import StarknetRpc
+
+TRANSFER_KEY = hex(get_selector_from_name("Transfer"))
+
+
+class Transfer(NamedTuple):
+    """One ERC20/ERC721 Transfer event; `value` is the token id for NFTs and the amount for ERC20"""
+    block_number: int
+    from_address: str
+    to_address: str
+    value: int
+    transaction_hash: str
+
+
+def parse_transfer(event: dict) -> Optional[Transfer]:
+    """
+    Decodes a Transfer event emitted either Cairo 0 style (from, to, value in data)
+    or Cairo 1 / OpenZeppelin style (indexed from, to, value in keys).
+    Returns None for events that do not carry a (from, to, u256) payload.
+    """
+    fields = [int(felt, 16) for felt in event["keys"][1:] + event["data"]]
+    if len(fields) < 3:
+        return None
+    value = fields[2] + (fields[3] << 128 if len(fields) > 3 else 0)
+    return Transfer(
+        block_number=event.get("block_number", 0),
+        from_address=hex(fields[0]),
+        to_address=hex(fields[1]),
+        value=value,
+        transaction_hash=event.get("transaction_hash", ""),
+    )
+
+
+def split_block_range(from_block: int, to_block: int, parts: int) -> List[Tuple[int, int]]:
+    """Splits [from_block, to_block] into at most `parts` contiguous inclusive ranges"""
+    total = to_block - from_block + 1
+    parts = max(1, min(parts, total))
+    step = -(-total // parts)
+    return [
+        (start, min(start + step - 1, to_block))
+        for start in range(from_block, to_block + 1, step)
+    ]
+
+
+async def fetch_transfers(
+    rpc: StarknetRpc,
+    contract_address: str,
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    parallel_ranges: int = 16,
+    chunk_size: int = 1000,
+) -> List[Transfer]:
+    """
+    Fetches every Transfer event of a contract, paging block ranges in parallel.
+    The result is in chain order whatever order the ranges complete in.
+    """
+    if to_block is None:
+        to_block = await rpc.block_number()
+    if to_block < from_block:
+        return []
+
+    ranges = split_block_range(from_block, to_block, parallel_ranges)
+    pages = await asyncio.gather(
+        *(
+            rpc.get_events(contract_address, [[TRANSFER_KEY]], start, end, chunk_size)
+            for start, end in ranges
+        )
+    )
+    transfers = []
+    for events in pages:
+        for event in events:
+            transfer = parse_transfer(event)
+            if transfer is not None:
+                transfers.append(transfer)
+    return transfers
+
+
+def fold_owners(transfers: Iterable[Transfer], owners: Optional[Dict[int, str]] = None) -> Dict[int, str]:
+    """
+    Replays NFT transfers (in chain order) into a token id -> owner map.
+    Burnt tokens (sent to the zero address) are removed.
+    """
+    owners = {} if owners is None else owners
+    for transfer in transfers:
+        if int(transfer.to_address, 16) == 0:
+            owners.pop(transfer.value, None)
+        else:
+            owners[transfer.value] = transfer.to_address
+    return owners
+
+
+def fold_balances(transfers: Iterable[Transfer], balances: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    Replays ERC20 transfers into an address -> balance map (base units).
+    Mints come from the zero address, so its balance is meaningless and dropped.
+    """
+    balances = defaultdict(int, balances or {})
+    for transfer in transfers:
+        balances[transfer.from_address] -= transfer.value
+        balances[transfer.to_address] += transfer.value
+    return {
+        address: balance for address, balance in balances.items()
+        if balance > 0 and int(address, 16) != 0
+    }
+
+
+async def get_token_owners(
+    rpc: StarknetRpc,
+    contract_address: str,
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    parallel_ranges: int = 16,
+) -> Dict[int, str]:
+    """Token id -> owner map of an ERC721 rebuilt from its Transfer events"""
+    transfers = await fetch_transfers(rpc, contract_address, from_block, to_block, parallel_ranges)
+    return fold_owners(transfers)
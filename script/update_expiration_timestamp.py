@@ -1,13 +1,29 @@
 import pandas as pd
 from pathlib import Path
 
-def update_timestamps(input_folder, new_timestamp):
+from parallel import map_files
+
+def update_file_timestamp(file, new_timestamp):
+    """Set expiration_timestamp in one CSV, in place. Returns the number of rows"""
+    # Read CSV
+    df = pd.read_csv(file)
+    
+    # Update timestamp
+    df['expiration_timestamp'] = new_timestamp
+    
+    # Save back to CSV with original name
+    df.to_csv(file, index=False)
+    return len(df)
+
+def update_timestamps(input_folder, new_timestamp, max_workers=None, memory_budget=None):
     """
-    Update expiration_timestamp in all CSVs in the folder
+    Update expiration_timestamp in all CSVs in the folder, one file per worker process
     
     Args:
     input_folder (str): Path to folder containing CSV files
     new_timestamp (int): New timestamp value to set
+    max_workers (int): Worker processes (default: one per CPU)
+    memory_budget (int): Bytes the files processed at once may use
     """
     folder = Path(input_folder)
     csv_files = list(folder.glob('*.csv'))
@@ -16,22 +32,14 @@ def update_timestamps(input_folder, new_timestamp):
         print(f"No CSV files found in {input_folder}")
         return
         
-    for file in csv_files:
-        try:
-            # Read CSV
-            df = pd.read_csv(file)
-            
-            # Update timestamp
-            df['expiration_timestamp'] = new_timestamp
-            
-            # Save back to CSV with original name
-            df.to_csv(file, index=False)
-            print(f"Updated {file.name}")
-            
-        except Exception as e:
-            print(f"Error processing {file.name}: {str(e)}")
+    report = map_files(
+        update_file_timestamp, csv_files, new_timestamp, max_workers=max_workers, memory_budget=memory_budget
+    )
+    for file in report.results:
+        print(f"Updated {file.name}")
     
-    print(f"\nProcessed {len(csv_files)} files")
+    report.print_summary()
+    return report
 
 # Example usage
 if __name__ == "__main__":